@@ -1,10 +1,7 @@
-import json
 import random
 import time
-import os
-from datetime import datetime
 
-STATUS_PATH = "/Users/psiadmin/clawd/workspace/whitebox-dashboard/frontend/public/status.json"
+from status_client import get_state, mutate
 
 AGENT_NAMES = ["White Box", "Cortex", "COUNCIL", "Pilot", "Correspondent", "Strategist", "Auditor", "Enhancer", "Insight", "Promoter"]
 
@@ -15,11 +12,7 @@ SQUAD_VIBES = [
 
 def generate_chatter():
     try:
-        if not os.path.exists(STATUS_PATH):
-            return
-
-        with open(STATUS_PATH, 'r') as f:
-            data = json.load(f)
+        data = get_state()
 
         tasks = data.get("tasks", [])
         executions = data.get("executions", [])
@@ -27,6 +20,7 @@ def generate_chatter():
         completed_executions = [e for e in executions if e.get("status") == "Success"]
 
         log_entry = None
+        ops = []
         
         # 1. Prioritize Live Task Commentary
         if active_tasks and random.random() < 0.7:
@@ -75,7 +69,7 @@ def generate_chatter():
             if random.random() < 0.5:
                 vibe = random.choice(SQUAD_VIBES)
                 log_entry = f"✨ [VIBE CHECK]: {vibe}"
-                data["head"]["squad_vibe"] = vibe
+                ops.append({"op": "set_head", "fields": {"squad_vibe": vibe}})
             else:
                 facts = [
                     "Fact: Cortex is processing neural maps for the next expansion mission.",
@@ -85,16 +79,9 @@ def generate_chatter():
                 ]
                 log_entry = f"💡 [SQUAD INTEL]: {random.choice(facts)}"
 
-        # Add to history
-        if "workflow" not in data: data["workflow"] = {"history": []}
-        data["workflow"]["history"].insert(0, log_entry)
-        
-        # Keep history manageable
-        data["workflow"]["history"] = data["workflow"]["history"][:25]
-
-        with open(STATUS_PATH + ".tmp", 'w') as f:
-            json.dump(data, f, indent=4)
-        os.rename(STATUS_PATH + ".tmp", STATUS_PATH)
+        # Add to history (the store keeps it to the latest 25 entries)
+        ops.append({"op": "add_history", "entry": log_entry})
+        mutate(*ops)
             
         print(f"Live Event: {log_entry}")
 
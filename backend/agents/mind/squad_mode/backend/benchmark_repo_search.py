@@ -0,0 +1,477 @@
+"""
+Repository Search Benchmark
+
+This script measures the embedding and search pipeline end to end:
+- Generates a synthetic repository of configurable size (deterministic for a
+  given seed), or uses a fixed local corpus
+- Times every stage (loading, chunking, encoding, writing the store and the
+  legacy pickle, index and keyword index builds, engine load) and records the
+  peak RSS of each
+- Measures search, keyword and combined query latency (p50/p95) with caches off
+- Measures recall@k of the index against exact search, for chunks and for the
+  file rankings returned by search()
+- Writes the results as JSON and compares them against a previous run
+
+Usage:
+    python benchmark_repo_search.py [--files=N] [--lines=N] [--corpus=PATH] [--queries=N]
+        [--top-k=N] [--index=TYPE] [--dtype=TYPE] [--seed=N] [--output=FILE]
+        [--compare=BASELINE] [--threshold=RATIO] [--keep]
+"""
+
+import contextlib
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+import numpy as np
+import faiss
+
+from embed_repo import load_repo_files, chunk_files, embed_files, save_embeddings, DEFAULT_MODEL, CHUNK_LINES, CHUNK_OVERLAP
+from repo_store import RepoStore, RepoStoreWriter, chunks_to_array, CHUNK_FILE
+from repo_index import build_store_index, measure_recall, sample_queries, normalize_vectors
+from keyword_index import build_store_keyword_index, tokenize
+from search_repo import RepoSearchEngine
+from query_cache import QueryEmbeddingCache
+from model_registry import get_model
+
+
+# Synthetic repository shape
+DEFAULT_NUM_FILES = 500
+DEFAULT_LINES_PER_FILE = 120
+VOCABULARY_SIZE = 2000
+FILES_PER_DIRECTORY = 25
+
+DEFAULT_NUM_QUERIES = 100
+DEFAULT_TOP_K = 10
+
+# A stage or latency slower than baseline * threshold is reported as a regression
+DEFAULT_REGRESSION_THRESHOLD = 1.2
+
+# Differences below these are timer / allocator noise and never count as regressions
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_MS = 0.5
+MIN_REGRESSION_RSS_MB = 16
+MIN_RECALL_DROP = 0.01
+
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "shi", "zen", "par", "dex", "qua", "bor", "fin", "gal", "hex"]
+
+
+def _make_vocabulary(rng: random.Random, size: int) -> List[str]:
+    """Distinct pronounceable identifiers."""
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def generate_synthetic_repo(root: str, num_files: int = DEFAULT_NUM_FILES,
+                            lines_per_file: int = DEFAULT_LINES_PER_FILE, seed: int = 0) -> List[str]:
+    """
+    Write a synthetic repository of Python, JavaScript and Markdown files.
+    
+    Every file draws from a topic (a small slice of a shared vocabulary), so
+    files have realistic overlap and queries have meaningful nearest neighbours.
+    The output depends only on the arguments.
+    
+    Args:
+        root: Directory to create the repository in
+        num_files: Number of files
+        lines_per_file: Approximate number of lines per file
+        seed: Random seed
+    
+    Returns:
+        The vocabulary the files were written from
+    """
+    rng = random.Random(seed)
+    vocabulary = _make_vocabulary(rng, VOCABULARY_SIZE)
+    topics = [vocabulary[i:i + 40] for i in range(0, len(vocabulary), 40)]
+    
+    for file_idx in range(num_files):
+        topic = topics[file_idx % len(topics)]
+        directory = os.path.join(root, f"pkg_{file_idx // FILES_PER_DIRECTORY:03d}")
+        os.makedirs(directory, exist_ok=True)
+        kind = file_idx % 10
+        
+        lines = []
+        if kind < 6:
+            extension = ".py"
+            while len(lines) < lines_per_file:
+                name, arg = rng.choice(topic), rng.choice(topic)
+                lines.append(f"def {name}_{rng.choice(topic)}({arg}, {rng.choice(topic)}=None):")
+                lines.append(f'    """{" ".join(rng.choice(topic) for _ in range(8))}."""')
+                for _ in range(rng.randint(3, 10)):
+                    lines.append(f"    {rng.choice(topic)} = {arg}.{rng.choice(topic)}({rng.choice(vocabulary)})")
+                lines.append(f"    return {rng.choice(topic)}")
+                lines.append("")
+        elif kind < 9:
+            extension = ".js"
+            while len(lines) < lines_per_file:
+                name = rng.choice(topic)
+                lines.append(f"export function {name}{rng.choice(topic).title()}({rng.choice(topic)}) {{")
+                for _ in range(rng.randint(3, 10)):
+                    lines.append(f"  const {rng.choice(topic)} = await {rng.choice(topic)}.{rng.choice(vocabulary)}();")
+                lines.append(f"  return {rng.choice(topic)};")
+                lines.append("}")
+                lines.append("")
+        else:
+            extension = ".md"
+            while len(lines) < lines_per_file:
+                lines.append(f"## {' '.join(rng.choice(topic) for _ in range(3)).title()}")
+                lines.append("")
+                lines.append(" ".join(rng.choice(topic if rng.random() < 0.8 else vocabulary) for _ in range(30)))
+                lines.append("")
+        
+        with open(os.path.join(directory, f"{rng.choice(topic)}_{file_idx}{extension}"), "w") as f:
+            f.write("\n".join(lines[:lines_per_file]) + "\n")
+    
+    return vocabulary
+
+
+def make_queries(store: RepoStore, num_queries: int, seed: int = 0) -> List[str]:
+    """
+    Sample query strings from the indexed content: short runs of identifiers from random chunks.
+    
+    Args:
+        store: Store to sample from
+        num_queries: Number of queries
+        seed: Random seed
+    
+    Returns:
+        List of query strings
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(num_queries):
+        row = store.chunks[rng.randrange(len(store.chunks))]
+        tokens = [t for t in tokenize(store.get_content(int(row[CHUNK_FILE]))) if len(t) > 3 and not t.isdigit()]
+        if not tokens:
+            continue
+        start = rng.randrange(len(tokens))
+        queries.append(" ".join(tokens[start:start + 4]))
+    return queries
+
+
+def _reset_peak_rss():
+    """Reset the process's peak RSS so the next reading covers one stage only (Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size since the last reset (or since start where resets are unsupported)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+class StageTimer:
+    """Records wall time and peak RSS of named stages."""
+    
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+    
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        _reset_peak_rss()
+        start = time.perf_counter()
+        yield
+        self.stages[name] = {
+            "seconds": round(time.perf_counter() - start, 4),
+            "peak_rss_mb": round(_peak_rss_mb(), 1)
+        }
+        print(f"  {name}: {self.stages[name]['seconds']:.3f}s, peak RSS {self.stages[name]['peak_rss_mb']:.0f} MB",
+              file=sys.stderr)
+
+
+def _latency(fn, queries: List[str]) -> Dict[str, float]:
+    """Run fn on every query and summarize the latencies in milliseconds."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies = np.array(latencies)
+    return {
+        "queries": len(latencies),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "max_ms": round(float(latencies.max()), 3)
+    }
+
+
+def file_recall(engine: RepoSearchEngine, queries: List[str], k: int) -> float:
+    """
+    Measure recall@k of search() file rankings against brute force.
+    
+    The exact ranking scores every chunk of the store and keeps each file's
+    best chunk, which is what search() approximates through the index.
+    
+    Args:
+        engine: Search engine to evaluate
+        queries: Query strings
+        k: Number of files compared
+    
+    Returns:
+        Mean fraction of the exact top-k files returned by search()
+    """
+    embeddings = np.asarray(engine.embeddings, dtype=np.float32)
+    file_ids = engine.chunks[:, CHUNK_FILE]
+    num_files = len(engine.store.files)
+    k = min(k, num_files)
+    
+    query_vectors = engine._encode_queries(queries)
+    if engine.metric == "cosine":
+        query_vectors = normalize_vectors(query_vectors)
+        distances = 1.0 - query_vectors @ embeddings.T
+    else:
+        distances = (
+            (query_vectors ** 2).sum(1)[:, None] - 2 * query_vectors @ embeddings.T + (embeddings ** 2).sum(1)[None, :]
+        )
+    
+    hits = 0
+    for query, row in zip(queries, distances):
+        best = np.full(num_files, np.inf, dtype=np.float32)
+        np.minimum.at(best, file_ids, row)
+        expected = set(np.argsort(best, kind="stable")[:k].tolist())
+        found = {r["file_id"] for r in engine.search(query, k)}
+        hits += len(expected & found)
+    return hits / float(k * len(queries)) if queries else 0.0
+
+
+def run_benchmark(corpus: str = None, num_files: int = DEFAULT_NUM_FILES, lines_per_file: int = DEFAULT_LINES_PER_FILE,
+                  num_queries: int = DEFAULT_NUM_QUERIES, top_k: int = DEFAULT_TOP_K, index_type: str = "auto",
+                  embedding_dtype: str = "float32", seed: int = 0, model_name: str = DEFAULT_MODEL,
+                  keep: bool = False) -> Dict:
+    """
+    Run every stage of the pipeline once and collect timings, memory and recall.
+    
+    Args:
+        corpus: Optional local repository to index instead of a synthetic one
+        num_files: Number of synthetic files
+        lines_per_file: Lines per synthetic file
+        num_queries: Number of queries per search method
+        top_k: Results per query, and the k of recall@k
+        index_type: Index to build (see repo_index.py)
+        embedding_dtype: Storage precision of the embeddings
+        seed: Random seed for the synthetic repository and queries
+        model_name: Embedding model
+        keep: If True, keep the working directory (repository and store)
+    
+    Returns:
+        Results dictionary with 'config', 'environment', 'corpus', 'stages',
+        'search' and 'recall' sections
+    """
+    work_dir = tempfile.mkdtemp(prefix="repo_search_bench_")
+    timer = StageTimer()
+    results = {
+        "config": {
+            "corpus": os.path.abspath(corpus) if corpus else None,
+            "num_files": None if corpus else num_files,
+            "lines_per_file": None if corpus else lines_per_file,
+            "num_queries": num_queries,
+            "top_k": top_k,
+            "index_type": index_type,
+            "embedding_dtype": embedding_dtype,
+            "seed": seed,
+            "model": model_name
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "faiss": getattr(faiss, "__version__", "unknown")
+        }
+    }
+    
+    try:
+        repo_path = corpus
+        if repo_path is None:
+            repo_path = os.path.join(work_dir, "repo")
+            print(f"Generating synthetic repository ({num_files} files) in {repo_path}", file=sys.stderr)
+            generate_synthetic_repo(repo_path, num_files, lines_per_file, seed)
+        store_path = os.path.join(work_dir, "store")
+        
+        # Library progress output goes to stderr so stdout stays valid JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            with timer.stage("model_load"):
+                get_model(model_name)
+            
+            with timer.stage("load_files"):
+                files = load_repo_files(repo_path)
+            
+            with timer.stage("chunk"):
+                chunks = chunk_files(files, CHUNK_LINES, CHUNK_OVERLAP)
+            
+            with timer.stage("embed"):
+                embeddings = embed_files(chunks, model_name, normalize=True)
+            
+            with timer.stage("save_embeddings_pickle"):
+                save_embeddings(files, embeddings, os.path.join(work_dir, "store.pkl"), chunks=chunks)
+            
+            with timer.stage("write_store"):
+                metadata = {"model": model_name, "chunk_lines": CHUNK_LINES, "chunk_overlap": CHUNK_OVERLAP,
+                            "metric": "cosine"}
+                writer = RepoStoreWriter(store_path, metadata, embedding_dtype=embedding_dtype)
+                for file_dict in files:
+                    writer.add_file(file_dict, file_dict["content"])
+                writer.add_chunks(chunks_to_array(chunks), embeddings)
+                writer.commit()
+            
+            results["corpus"] = {
+                "files": len(files),
+                "chunks": len(chunks),
+                "bytes": sum(len(f["content"].encode("utf-8")) for f in files),
+                "dimension": int(embeddings.shape[1])
+            }
+            del files, chunks, embeddings
+            
+            with timer.stage("build_index"):
+                index_report = build_store_index(store_path, index_type, report_recall=False)
+            
+            with timer.stage("build_keyword_index"):
+                store = RepoStore.open(store_path)
+                build_store_keyword_index(store)
+            
+            with timer.stage("engine_load"):
+                engine = RepoSearchEngine(store_path, model_name, query_cache=QueryEmbeddingCache(0),
+                                          result_cache_size=0)
+                engine.keyword_index
+            
+            queries = make_queries(store, num_queries, seed)
+            keywords = [query.split()[0] for query in queries]
+            results["search"] = {
+                "search": _latency(lambda q: engine.search(q, top_k), queries),
+                "search_by_keyword": _latency(lambda q: engine.search_by_keyword(q, top_k), keywords),
+                "search_combined": _latency(
+                    lambda q: engine.search_combined(q, q.split()[0], top_k), queries
+                ),
+                "search_combined_rrf": _latency(
+                    lambda q: engine.search_combined(q, q.split()[0], top_k, fusion="rrf"), queries
+                )
+            }
+            
+            vectors = np.asarray(store.embeddings, dtype=np.float32)
+            results["recall"] = {
+                "index_type": index_report["type"],
+                f"chunk_recall_at_{top_k}": round(
+                    measure_recall(engine.index, vectors, sample_queries(vectors, num_queries), top_k), 4
+                ),
+                f"file_recall_at_{top_k}": round(file_recall(engine, queries, top_k), 4)
+            }
+            store.close()
+        
+        results["stages"] = timer.stages
+        return results
+    finally:
+        if keep:
+            print(f"Kept working directory {work_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float = DEFAULT_REGRESSION_THRESHOLD) -> List[Dict]:
+    """
+    Compare stage times, query latencies and recall against a baseline run.
+    
+    Args:
+        current: Results of this run
+        baseline: Results of the baseline run
+        threshold: Ratio over the baseline at which a time counts as a regression
+    
+    Returns:
+        List of regressions, each with 'metric', 'baseline', 'current' and 'ratio' keys
+    """
+    regressions = []
+    
+    def check(metric, old, new, min_difference):
+        if old is None or new is None or new - old < min_difference or new <= old * threshold:
+            return
+        regressions.append({"metric": metric, "baseline": old, "current": new,
+                            "ratio": round(new / old, 3) if old else None})
+    
+    for name, stage in current.get("stages", {}).items():
+        old = baseline.get("stages", {}).get(name, {})
+        check(f"stages.{name}.seconds", old.get("seconds"), stage["seconds"], MIN_REGRESSION_SECONDS)
+        check(f"stages.{name}.peak_rss_mb", old.get("peak_rss_mb"), stage["peak_rss_mb"], MIN_REGRESSION_RSS_MB)
+    
+    for name, latency in current.get("search", {}).items():
+        old = baseline.get("search", {}).get(name, {})
+        check(f"search.{name}.p50_ms", old.get("p50_ms"), latency["p50_ms"], MIN_REGRESSION_MS)
+        check(f"search.{name}.p95_ms", old.get("p95_ms"), latency["p95_ms"], MIN_REGRESSION_MS)
+    
+    # Recall is higher-is-better and is compared on absolute drop rather than ratio
+    for name, value in current.get("recall", {}).items():
+        old = baseline.get("recall", {}).get(name)
+        if isinstance(value, float) and isinstance(old, float) and old - value > MIN_RECALL_DROP:
+            regressions.append({"metric": f"recall.{name}", "baseline": old, "current": value,
+                                "ratio": round(value / old, 3) if old else None})
+    
+    return regressions
+
+
+if __name__ == "__main__":
+    options = {
+        "corpus": None, "files": DEFAULT_NUM_FILES, "lines": DEFAULT_LINES_PER_FILE, "queries": DEFAULT_NUM_QUERIES,
+        "top-k": DEFAULT_TOP_K, "index": "auto", "dtype": "float32", "seed": 0, "output": None, "compare": None,
+        "threshold": DEFAULT_REGRESSION_THRESHOLD, "model": DEFAULT_MODEL
+    }
+    keep = False
+    for arg in sys.argv[1:]:
+        if arg == "--keep":
+            keep = True
+        elif arg.startswith("--") and "=" in arg and arg[2:].split("=", 1)[0] in options:
+            key, value = arg[2:].split("=", 1)
+            options[key] = value
+        else:
+            print(__doc__)
+            sys.exit(1)
+    
+    results = run_benchmark(
+        corpus=options["corpus"],
+        num_files=int(options["files"]),
+        lines_per_file=int(options["lines"]),
+        num_queries=int(options["queries"]),
+        top_k=int(options["top-k"]),
+        index_type=options["index"],
+        embedding_dtype=options["dtype"],
+        seed=int(options["seed"]),
+        model_name=options["model"],
+        keep=keep
+    )
+    
+    exit_code = 0
+    if options["compare"]:
+        with open(options["compare"]) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("Warning: baseline was run with a different configuration", file=sys.stderr)
+        results["regressions"] = compare_results(results, baseline, float(options["threshold"]))
+        for regression in results["regressions"]:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']}",
+                  file=sys.stderr)
+        exit_code = 1 if results["regressions"] else 0
+    
+    output = json.dumps(results, indent=2)
+    if options["output"]:
+        with open(options["output"], "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote results to {options['output']}", file=sys.stderr)
+    print(output)
+    sys.exit(exit_code)
@@ -3,16 +3,27 @@ Repository Embedding Module
 
 This module provides functionality to:
 - Clone GitHub repositories or load local directories
+- Refresh stores of remote repositories from a persistent bare mirror, re-reading
+  only the paths changed since the indexed commit (see git_mirror.py)
 - Extract code/documentation files
+- Split files into overlapping chunks (line windows and function/class boundaries)
 - Generate embeddings using sentence-transformers
-- Save embeddings to a pickle file
+- Re-embed only new or modified files when updating an existing store
+- Save files, chunks and embeddings to a repository store (see repo_store.py),
+  streaming them to disk in memory-bounded batches with resumable checkpoints
 """
 
+import ast
+import codecs
+import hashlib
+import math
 import os
 import pickle
 import re
-from pathlib import Path
-from typing import List, Dict, Union
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Union
 import numpy as np
 from tqdm import tqdm
 from sentence_transformers import SentenceTransformer
@@ -20,12 +31,117 @@ import git
 import tempfile
 import shutil
 
+from repo_store import RepoStore, RepoStoreWriter, CHUNK_FIELDS, CHUNK_FILE
+from repo_index import build_store_index, normalize_vectors, METRICS
+from keyword_index import build_store_keyword_index
+from model_registry import get_model
+from git_mirror import sync_mirror, resolve_commit, has_commit, changed_paths, list_tree, read_blob
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
 # Allowed file extensions for code/documentation files
 ALLOWED_EXTENSIONS = {
     '.py', '.js', '.ts', '.tsx', '.jsx', '.java', '.sql', '.json', '.md'
 }
 
+# Directories that are never descended into
+SKIP_DIRS = {'.git', 'node_modules', '__pycache__', '.venv', 'venv', 'dist', 'build'}
+
+# Files are read by a thread pool; reads are I/O bound so this can exceed the core count
+LOAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Leading bytes inspected to decide whether a file is binary
+BINARY_SNIFF_BYTES = 8192
+
+# Files read ahead of the embedding pipeline, per loader thread
+LOAD_AHEAD_PER_WORKER = 4
+
+# Streaming pipeline: chunks waiting to be encoded and written are flushed once they
+# take up half the memory limit (the rest is left to the model) or reach the batch size
+DEFAULT_MEMORY_LIMIT_MB = 1024
+ENCODE_BATCH_CHUNKS = 2048
+CHECKPOINT_SECONDS = 30
+
+# Encoding: texts per model batch, and encoder processes (1 encodes in this process)
+ENCODE_BATCH_SIZE = 32
+ENCODE_WORKERS = 1
+
+# Metric of new stores: 'cosine' normalizes vectors once at embed time so they are
+# searched by inner product; 'l2' keeps raw vectors and Euclidean distance
+DEFAULT_METRIC = "cosine"
+
+# Chunking parameters. MiniLM only looks at the first 256 tokens of its input,
+# so files are embedded as short overlapping line windows instead of whole.
+CHUNK_LINES = 24
+CHUNK_OVERLAP = 4
+MAX_CHUNK_CHARS = 2000
+
+# Stores record how their chunk lines were counted. Older stores split lines with
+# str.splitlines(), which also breaks on these characters.
+LINE_BREAKS = "lf"
+OTHER_LINE_BREAKS = re.compile('[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+# Files whose function/class boundaries are used as preferred split points
+BOUNDARY_EXTENSIONS = {'.py', '.js', '.ts', '.tsx', '.jsx'}
+
+# Top-level JS/TS declarations: functions, classes and arrow functions bound to a name
+JS_BOUNDARY_PATTERN = re.compile(
+    r'^(export\s+(default\s+)?)?('
+    r'(async\s+)?function\b'
+    r'|(abstract\s+)?class\b'
+    r'|(const|let|var)\s+[\w$]+\s*=\s*(async\s+)?(function\b|\([^)]*\)\s*=>|[\w$]+\s*=>)'
+    r')'
+)
+
+
+def looks_binary(data: bytes) -> bool:
+    """
+    Check if file data is binary from its leading bytes.
+    
+    Args:
+        data: File data (only the first BINARY_SNIFF_BYTES bytes are inspected)
+        
+    Returns:
+        True if the data contains NUL bytes or is not valid UTF-8
+    """
+    head = data[:BINARY_SNIFF_BYTES]
+    if b'\x00' in head:
+        return True
+    try:
+        # Incremental decoding tolerates a multi-byte character cut off at the end of the sample
+        codecs.getincrementaldecoder('utf-8')(errors='strict').decode(head, final=len(data) <= BINARY_SNIFF_BYTES)
+        return False
+    except UnicodeDecodeError:
+        return True
+
+
+def decode_text(data: bytes) -> str:
+    """
+    Decode file data like text-mode open(): UTF-8 with replacement, universal newlines.
+    
+    Args:
+        data: File data
+        
+    Returns:
+        Decoded text
+    """
+    return data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def is_repo_file(relative_path: str) -> bool:
+    """
+    Check whether a repository-relative path is indexed, as walk_repo_files() decides.
+    
+    Args:
+        relative_path: '/'-separated path relative to the repository root
+        
+    Returns:
+        True if the path has an allowed extension and is outside skipped directories
+    """
+    parts = relative_path.split("/")
+    return os.path.splitext(parts[-1])[1] in ALLOWED_EXTENSIONS and not SKIP_DIRS.intersection(parts[:-1])
+
 
 def is_binary_file(file_path: str) -> bool:
     """
@@ -39,13 +155,8 @@ def is_binary_file(file_path: str) -> bool:
     """
     try:
         with open(file_path, 'rb') as f:
-            chunk = f.read(8192)
-            if b'\x00' in chunk:
-                return True
-            # Try to decode as UTF-8
-            chunk.decode('utf-8', errors='strict')
-            return False
-    except (UnicodeDecodeError, PermissionError, OSError):
+            return looks_binary(f.read(BINARY_SNIFF_BYTES + 1))
+    except (PermissionError, OSError):
         return True
 
 
@@ -80,136 +191,845 @@ def clone_repo(repo_url: str, target_dir: str = None) -> str:
         raise RuntimeError(f"Unexpected error during clone: {e}")
 
 
-def load_repo_files(path: str) -> List[Dict[str, str]]:
+def file_hash(content: str) -> str:
     """
-    Recursively load all code/documentation files from a directory.
+    Compute the content hash used to detect modified files.
     
     Args:
-        path: Path to repository root or local directory
+        content: File content
         
     Returns:
-        List of dictionaries with 'path' and 'content' keys
+        Hex SHA-256 digest of the UTF-8 encoded content
     """
-    files = []
-    path_obj = Path(path)
+    return hashlib.sha256(content.encode('utf-8', errors='replace')).hexdigest()
+
+
+def walk_repo_files(root: str) -> List[Tuple[str, str]]:
+    """
+    Find all code/documentation files under a directory in a single walk.
+    
+    Skipped directories (SKIP_DIRS) are pruned without being descended into.
+    
+    Args:
+        root: Repository root directory
+        
+    Returns:
+        List of (absolute path, path relative to root) tuples in sorted order
+    """
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1] in ALLOWED_EXTENSIONS:
+                file_path = os.path.join(dirpath, filename)
+                found.append((file_path, os.path.relpath(file_path, root)))
+    return found
+
+
+def _load_file(file_path: str, relative_path: str, previous: RepoStore = None):
+    """
+    Stat and (unless unchanged since the previous store) read one file.
+    
+    Runs on the loader thread pool; each file is opened at most once.
+    
+    Returns:
+        File dictionary, the previous store's index of an unchanged file, or
+        None if the file is binary or unreadable
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError as e:
+        print(f"Warning: Could not stat file {file_path}: {e}")
+        return None
+    
+    # Fast path: same mtime and size as in the previous store
+    old_idx = previous.path_index.get(relative_path) if previous else None
+    if old_idx is not None:
+        old = previous.files[old_idx]
+        if old.get("mtime") == stat.st_mtime and old.get("size") == stat.st_size and "sha256" in old:
+            return old_idx
+    
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except (PermissionError, OSError) as e:
+        print(f"Warning: Could not read file {file_path}: {e}")
+        return None
     
-    if not path_obj.exists():
+    # Skip binary files
+    if looks_binary(data):
+        return None
+    
+    content = decode_text(data)
+    
+    return {
+        "path": relative_path,
+        "content": content,
+        "sha256": file_hash(content),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size
+    }
+
+
+def _iter_repo_files(path: str, previous: RepoStore = None, workers: int = LOAD_WORKERS, skip=None):
+    """
+    Load code/documentation files one at a time, in walk order.
+    
+    Files are read on a thread pool with a bounded read-ahead window, so only a
+    few file contents are held in memory at once.
+    
+    Args:
+        path: Path to repository root or local directory
+        previous: Optional existing store to take unchanged files from
+        workers: Number of threads reading files concurrently
+        skip: Optional set of relative paths not to load
+        
+    Yields:
+        Tuples of (file dictionary, whether it was unchanged since the previous store)
+    """
+    if not os.path.exists(path):
         raise ValueError(f"Path does not exist: {path}")
     
-    if not path_obj.is_dir():
+    if not os.path.isdir(path):
         raise ValueError(f"Path is not a directory: {path}")
     
-    # Get all files matching allowed extensions
-    all_files = []
-    for ext in ALLOWED_EXTENSIONS:
-        all_files.extend(path_obj.rglob(f'*{ext}'))
-    
+    all_files = walk_repo_files(path)
     print(f"Found {len(all_files)} files with allowed extensions. Processing...")
     
-    for file_path in tqdm(all_files, desc="Loading files"):
-        # Skip binary files
-        if is_binary_file(str(file_path)):
-            continue
+    if skip:
+        all_files = [entry for entry in all_files if entry[1] not in skip]
+    
+    workers = max(1, workers)
+    entries = iter(all_files)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(all_files), desc="Loading files") as progress:
+        pending = deque()
         
-        # Skip common directories that shouldn't be processed
-        if any(skip_dir in file_path.parts for skip_dir in ['.git', 'node_modules', '__pycache__', '.venv', 'venv', 'dist', 'build']):
-            continue
+        def submit_next():
+            entry = next(entries, None)
+            if entry is not None:
+                pending.append(executor.submit(_load_file, entry[0], entry[1], previous))
         
-        try:
-            # Read file content with UTF-8 encoding, fallback to errors='replace'
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                content = f.read()
+        for _ in range(workers * LOAD_AHEAD_PER_WORKER):
+            submit_next()
+        
+        while pending:
+            result = pending.popleft().result()
+            submit_next()
+            progress.update(1)
             
-            # Store relative path from the root
-            relative_path = str(file_path.relative_to(path_obj))
+            if result is None:
+                continue
             
-            files.append({
-                "path": relative_path,
-                "content": content
-            })
-        except (PermissionError, OSError, UnicodeDecodeError) as e:
-            print(f"Warning: Could not read file {file_path}: {e}")
+            if isinstance(result, int):
+                # Unchanged file: content comes from the previous store (read here, not on the pool)
+                yield dict(previous.files[result], content=previous.get_content(result)), True
+            else:
+                yield result, False
+
+
+def _iter_commit_files(repo: git.Repo, commit: str, previous: RepoStore = None, changed: Dict[str, str] = None,
+                       skip=None):
+    """
+    Load code/documentation files at a commit of a bare mirror, one at a time.
+    
+    Files of the previous store are taken from it without reading their blobs
+    when they are not among the changed paths, or (if the diff is unknown)
+    when their blob SHA is the one recorded in the store.
+    
+    Args:
+        repo: Mirror repository
+        commit: Commit SHA to load
+        previous: Optional existing store to take unchanged files from
+        changed: Optional paths changed since the commit the previous store was indexed at
+        skip: Optional set of relative paths not to load
+        
+    Yields:
+        Tuples of (file dictionary, whether it was unchanged since the previous store)
+    """
+    entries = [entry for entry in list_tree(repo, commit) if is_repo_file(entry[0])]
+    print(f"Found {len(entries)} files with allowed extensions at commit {commit[:12]}. Processing...")
+    
+    if skip:
+        entries = [entry for entry in entries if entry[0] not in skip]
+    
+    for path, blob, size in tqdm(entries, desc="Loading files"):
+        old_idx = previous.path_index.get(path) if previous else None
+        if old_idx is not None:
+            old = previous.files[old_idx]
+            unchanged = path not in changed if changed is not None else old.get("blob") == blob
+            if unchanged and "sha256" in old:
+                yield dict(old, blob=blob, content=previous.get_content(old_idx)), True
+                continue
+        
+        data = read_blob(repo, blob)
+        if looks_binary(data):
             continue
+        
+        content = decode_text(data)
+        yield {"path": path, "content": content, "sha256": file_hash(content), "blob": blob, "size": size}, False
+
+
+def load_repo_files(path: str, previous: RepoStore = None, workers: int = LOAD_WORKERS) -> List[Dict[str, str]]:
+    """
+    Recursively load all code/documentation files from a directory.
+    
+    Args:
+        path: Path to repository root or local directory
+        previous: Optional existing store. Files whose mtime and size are
+            unchanged are taken from it without being read again.
+        workers: Number of threads reading files concurrently
+        
+    Returns:
+        List of dictionaries with 'path', 'content', 'sha256', 'mtime' and 'size' keys
+    """
+    files = []
+    unchanged = 0
+    
+    for file_dict, is_unchanged in _iter_repo_files(path, previous, workers):
+        files.append(file_dict)
+        unchanged += is_unchanged
     
-    print(f"Successfully loaded {len(files)} files.")
+    if previous:
+        print(f"Successfully loaded {len(files)} files ({unchanged} unchanged since last run).")
+    else:
+        print(f"Successfully loaded {len(files)} files.")
     return files
 
 
-def embed_files(files: List[Dict[str, str]], model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> np.ndarray:
+def split_lines(content: str) -> List[str]:
     """
-    Generate embeddings for a list of files using sentence-transformers.
+    Split content into lines, keeping the line ends.
+    
+    Only '\n' ends a line, as in snippets.py and the reranker (decode_text()
+    has already turned '\r\n' and '\r' into '\n'). str.splitlines() would
+    also break on form feeds and other separators, so chunk line numbers
+    would point at different lines than snippets.
+    
+    Args:
+        content: File content
+        
+    Returns:
+        Lines with their trailing '\n' (the last line has none if the content does not end with one)
+    """
+    parts = content.split("\n")
+    lines = [part + "\n" for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def find_boundaries(path: str, content: str) -> List[int]:
+    """
+    Find the 0-based line numbers where functions and classes start.
+    
+    Python files are parsed with ast (top-level definitions and methods of
+    top-level classes); JS/TS files use a regex over top-level declarations.
+    
+    Args:
+        path: File path, used to pick the language
+        content: File content
+        
+    Returns:
+        Sorted list of line numbers where a new definition starts
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in BOUNDARY_EXTENSIONS:
+        return []
+    
+    boundaries = set()
+    
+    if ext == '.py':
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return []
+        
+        def node_start(node):
+            # Decorators belong to the definition they decorate
+            decorators = getattr(node, 'decorator_list', [])
+            return min([node.lineno] + [d.lineno for d in decorators]) - 1
+        
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                boundaries.add(node_start(node))
+            if isinstance(node, ast.ClassDef):
+                for child in node.body:
+                    if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        boundaries.add(node_start(child))
+    else:
+        for i, line in enumerate(content.split("\n")):
+            if JS_BOUNDARY_PATTERN.match(line):
+                boundaries.add(i)
+    
+    return sorted(boundaries)
+
+
+def chunk_file(path: str, content: str, chunk_lines: int = CHUNK_LINES, overlap: int = CHUNK_OVERLAP) -> List[Dict[str, int]]:
+    """
+    Split one file into overlapping line-window chunks.
+    
+    Function/class boundaries are used as split points where available: small
+    definitions are packed together up to chunk_lines, large ones are cut into
+    windows of chunk_lines overlapping by overlap lines.
+    
+    Args:
+        path: File path, used to pick the language
+        content: File content
+        chunk_lines: Maximum number of lines per chunk
+        overlap: Number of lines shared by consecutive windows
+        
+    Returns:
+        List of dictionaries with 'start_line' and 'end_line' (1-based, inclusive)
+        and 'start' and 'end' character offsets into the content
+    """
+    if overlap >= chunk_lines:
+        raise ValueError("overlap must be smaller than chunk_lines")
+    
+    lines = split_lines(content)
+    if not lines:
+        return [{"start_line": 1, "end_line": 1, "start": 0, "end": len(content)}]
+    
+    # Character offset of the start of every line (plus end of file)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    
+    # Segments between definition boundaries, packed up to chunk_lines
+    cuts = [b for b in find_boundaries(path, content) if 0 < b < len(lines)]
+    edges = [0] + cuts + [len(lines)]
+    
+    ranges = []
+    current_start, current_end = 0, 0
+    for seg_start, seg_end in zip(edges[:-1], edges[1:]):
+        if current_end > current_start and seg_end - current_start > chunk_lines:
+            ranges.append((current_start, current_end))
+            current_start = seg_start
+        current_end = seg_end
+    ranges.append((current_start, current_end))
+    
+    # Cut oversized ranges into overlapping windows
+    chunks = []
+    for range_start, range_end in ranges:
+        start = range_start
+        while True:
+            end = min(start + chunk_lines, range_end)
+            chunks.append({
+                "start_line": start + 1,
+                "end_line": end,
+                "start": offsets[start],
+                "end": offsets[end]
+            })
+            if end >= range_end:
+                break
+            start = end - overlap
+    
+    return chunks
+
+
+def _file_chunks(file_index: int, file_dict: Dict[str, str], chunk_lines: int, overlap: int) -> List[Dict]:
+    """Chunk one file and attach its index, path and the chunk text to embed."""
+    content = file_dict["content"]
+    chunks = chunk_file(file_dict["path"], content, chunk_lines, overlap)
+    for chunk in chunks:
+        chunk["file"] = file_index
+        chunk["path"] = file_dict["path"]
+        chunk["content"] = content[chunk["start"]:chunk["end"]][:MAX_CHUNK_CHARS]
+    return chunks
+
+
+def chunk_files(files: List[Dict[str, str]], chunk_lines: int = CHUNK_LINES, overlap: int = CHUNK_OVERLAP) -> List[Dict[str, Union[str, int]]]:
+    """
+    Split every file into chunks for embedding.
     
     Args:
         files: List of dictionaries with 'path' and 'content' keys
+        chunk_lines: Maximum number of lines per chunk
+        overlap: Number of lines shared by consecutive windows
+    
+    Returns:
+        List of chunk dictionaries with 'file' (index into files), 'path',
+        line/character offsets and 'content' (the chunk text to embed)
+    """
+    chunks = []
+    
+    for file_index, file_dict in enumerate(tqdm(files, desc="Chunking files")):
+        chunks.extend(_file_chunks(file_index, file_dict, chunk_lines, overlap))
+    
+    print(f"Split {len(files)} files into {len(chunks)} chunks.")
+    return chunks
+
+
+class ChunkEncoder:
+    """
+    Encodes texts with a sentence-transformers model, optionally on a process pool.
+    
+    Texts are encoded longest first, so every batch holds texts of similar
+    length and little compute goes to padding; embeddings are returned in input
+    order. With workers > 1 the sorted texts are sharded across CPU worker
+    processes, each limited to its share of the cores.
+    """
+    
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = ENCODE_BATCH_SIZE,
+                 workers: int = ENCODE_WORKERS, normalize: bool = False):
+        """
+        Initialize the encoder. The model and worker pool are loaded on first use.
+        
+        Args:
+            model_name: Name of the sentence-transformers model to use
+            batch_size: Number of texts per model forward pass
+            workers: Number of encoder processes (1 encodes in this process)
+            normalize: If True, return unit-length embeddings (for 'cosine' stores)
+        """
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.normalize = normalize
+        self._model = None
+        self._pool = None
+    
+    @property
+    def model(self) -> SentenceTransformer:
+        """The sentence-transformers model, from the shared model registry."""
+        if self._model is None:
+            self._model = get_model(self.model_name)
+        return self._model
+    
+    @property
+    def min_batch_chunks(self) -> int:
+        """Smallest number of texts worth handing to encode() at once to keep every worker busy."""
+        return self.workers * self.batch_size * 4
+    
+    def _start_pool(self):
+        """Start one CPU worker process per worker, each using its share of the cores."""
+        threads = str(max(1, (os.cpu_count() or 1) // self.workers))
+        saved = {name: os.environ.get(name) for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS")}
+        
+        # Worker processes read the thread limits from the environment at startup
+        os.environ.update({name: threads for name in saved})
+        try:
+            print(f"Starting {self.workers} encoder processes ({threads} threads each)")
+            self._pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+    
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Encode texts.
+        
+        Args:
+            texts: Texts to encode
+            show_progress_bar: If True, show the model's progress bar (single process only)
+            
+        Returns:
+            float32 array of shape [len(texts), dim], in input order
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        sorted_texts = [texts[i] for i in order]
+        
+        if self.workers > 1 and len(texts) >= 2 * self.batch_size:
+            if self._pool is None:
+                self._start_pool()
+            # Contiguous slices of the sorted texts keep per-process batches length-homogeneous
+            chunk_size = max(self.batch_size, math.ceil(len(texts) / (self.workers * 4)))
+            vectors = self.model.encode_multi_process(
+                sorted_texts, self._pool, batch_size=self.batch_size, chunk_size=chunk_size
+            )
+        else:
+            vectors = self.model.encode(
+                sorted_texts,
+                batch_size=self.batch_size,
+                show_progress_bar=show_progress_bar,
+                convert_to_numpy=True,
+                normalize_embeddings=False
+            )
+        
+        if self.normalize:
+            vectors = normalize_vectors(vectors)
+        
+        embeddings = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+        embeddings[order] = vectors
+        return embeddings
+    
+    def close(self):
+        """Stop the worker processes, if any were started."""
+        if self._pool is not None:
+            self._model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+def embed_files(files: List[Dict[str, str]], model_name: str = DEFAULT_MODEL,
+                batch_size: int = ENCODE_BATCH_SIZE, workers: int = ENCODE_WORKERS,
+                normalize: bool = False) -> np.ndarray:
+    """
+    Generate embeddings for a list of files or chunks using sentence-transformers.
+    
+    Args:
+        files: List of dictionaries with a 'content' key (files or chunks from chunk_files())
         model_name: Name of the sentence-transformers model to use
+        batch_size: Number of texts per model forward pass
+        workers: Number of encoder processes
+        normalize: If True, return unit-length embeddings
         
     Returns:
-        NumPy array of embeddings (shape: [num_files, embedding_dim])
+        NumPy array of embeddings (shape: [num_items, embedding_dim])
     """
     if not files:
         raise ValueError("No files provided for embedding")
     
-    print(f"Loading embedding model: {model_name}")
-    model = SentenceTransformer(model_name)
+    encoder = ChunkEncoder(model_name, batch_size, workers, normalize)
+    
+    print(f"Generating embeddings for {len(files)} items...")
+    try:
+        embeddings = encoder.encode([file_dict["content"] for file_dict in files], show_progress_bar=True)
+    finally:
+        encoder.close()
+    
+    print(f"Generated embeddings with shape: {embeddings.shape}")
+    return embeddings
+
+
+def load_store(store_path: str) -> RepoStore:
+    """
+    Open an existing repository store for incremental updates.
+    
+    Args:
+        store_path: Path to the store directory (or a legacy pickle file)
+        
+    Returns:
+        RepoStore, or None if the store does not exist or cannot be read
+    """
+    if not os.path.exists(store_path):
+        return None
+    
+    try:
+        return RepoStore.open(store_path)
+    except Exception as e:
+        print(f"Warning: Could not load existing store {store_path}, rebuilding from scratch: {e}")
+        return None
+
+
+def _reusable_chunks(previous: RepoStore, model_name: str, chunk_lines: int, overlap: int, metric: str,
+                     embedding_dtype: str) -> Dict[str, Tuple[str, List[int]]]:
+    """
+    Index a previous store's chunks by file path, if they can be reused.
     
-    print(f"Generating embeddings for {len(files)} files...")
-    contents = [file_dict["content"] for file_dict in files]
+    Args:
+        previous: Previous store, or None
+        model_name: Name of the model used for this run
+        chunk_lines: Maximum number of lines per chunk in this run
+        overlap: Number of overlapping lines in this run
+        metric: Metric of the store written in this run
+        embedding_dtype: Storage precision of the store written in this run
+        
+    Returns:
+        Mapping of path to (content hash, chunk rows); empty if the previous store
+        was built with a different model, chunking parameters, metric or storage
+        precision. Its vectors are not copied across a metric change (cosine
+        stores hold normalized vectors, l2 stores raw ones) or a precision
+        change (a float16 or int8 store only has lossy copies of the vectors).
+    """
+    reusable = {}
+    if previous is None:
+        return reusable
     
-    # Generate embeddings with progress bar
-    embeddings = model.encode(
-        contents,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-        normalize_embeddings=False
+    compatible = (
+        previous.meta.get("model") == model_name and
+        previous.meta.get("chunk_lines") == chunk_lines and
+        previous.meta.get("chunk_overlap") == overlap and
+        previous.metric == metric and
+        previous.embedding_dtype == embedding_dtype
     )
+    if not compatible:
+        print("Existing store was built with different model, chunk, metric or dtype settings, re-embedding everything.")
+        return reusable
     
-    # Ensure float32 dtype
-    embeddings = embeddings.astype(np.float32)
+    old_rows = {}
+    for row, old_file_idx in enumerate(previous.chunks[:, CHUNK_FILE].tolist()):
+        old_rows.setdefault(old_file_idx, []).append(row)
+    for old_idx, old_file in enumerate(previous.files):
+        reusable[old_file["path"]] = (previous.get_file_sha256(old_idx), old_rows.get(old_idx, []))
+    return reusable
+
+
+def stream_repo_store(repo_path: str, out_file: str, previous: RepoStore = None, model_name: str = DEFAULT_MODEL,
+                      chunk_lines: int = CHUNK_LINES, overlap: int = CHUNK_OVERLAP,
+                      memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB, workers: int = LOAD_WORKERS,
+                      resume: bool = True, batch_size: int = ENCODE_BATCH_SIZE,
+                      encode_workers: int = ENCODE_WORKERS, embedding_dtype: str = "float32",
+                      metric: str = DEFAULT_METRIC, files=None, extra_metadata: Dict = None) -> Dict[str, int]:
+    """
+    Read, chunk, embed and write a repository to a store in one streaming pass.
     
-    print(f"Generated embeddings with shape: {embeddings.shape}")
-    return embeddings
+    Files are appended to the store as they are loaded and their chunks are
+    encoded in batches bounded by memory_limit_mb, so neither the file contents
+    nor the embedding matrix are ever held in memory in full. Progress is
+    checkpointed every CHECKPOINT_SECONDS; if a run is interrupted, the next run
+    with resume=True skips the files that were already written. (Files modified
+    in between are picked up by the following incremental run.)
+    
+    Args:
+        repo_path: Repository root directory
+        out_file: Output store directory
+        previous: Optional previous store; embeddings of unchanged files are reused
+        model_name: Name of the sentence-transformers model to use
+        chunk_lines: Maximum number of lines per chunk
+        overlap: Number of lines shared by consecutive windows
+        memory_limit_mb: Approximate memory ceiling for files and chunks in flight
+        workers: Number of threads reading files concurrently
+        resume: If True, continue an interrupted write of the same store
+        batch_size: Number of texts per model forward pass
+        encode_workers: Number of encoder processes
+        embedding_dtype: Storage precision of the embeddings ('float32', 'float16' or 'int8')
+        metric: Store metric, 'cosine' (vectors normalized here) or 'l2'
+        files: Optional callable taking the set of paths to skip and yielding
+            (file dictionary, unchanged) tuples, used instead of walking repo_path
+        extra_metadata: Optional entries added to the store metadata (e.g. the indexed commit)
+        
+    Returns:
+        Dictionary with 'files', 'chunks', 'encoded_chunks', 'reused_files' and 'dim' counts
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(METRICS)})")
+    
+    metadata = {
+        "model": model_name,
+        "chunk_lines": chunk_lines,
+        "chunk_overlap": overlap,
+        "metric": metric,
+        "line_breaks": LINE_BREAKS
+    }
+    metadata.update(extra_metadata or {})
+    reusable = _reusable_chunks(previous, model_name, chunk_lines, overlap, metric, embedding_dtype)
+    # Unchanged files with other line breaks are chunked again if the previous store numbered their lines differently
+    recount_lines = previous is not None and previous.meta.get("line_breaks") != LINE_BREAKS
+    
+    writer = RepoStoreWriter(out_file, metadata, resume=resume, embedding_dtype=embedding_dtype)
+    already_written = set(writer.written_paths)
+    
+    encoder = ChunkEncoder(model_name, batch_size, encode_workers, normalize=metric == "cosine")
+    batch_chunks = max(ENCODE_BATCH_CHUNKS, encoder.min_batch_chunks)
+    budget = memory_limit_mb * 1024 * 1024 // 2
+    row_bytes = 4 * (previous.dimension if previous is not None else 1024)
+    stats = {"files": writer.num_files, "chunks": writer.num_chunks, "encoded_chunks": 0, "reused_files": 0,
+             "dim": writer.dimension or 0}
+    
+    # Chunks waiting to be written: table rows, reused embedding (or None) and text to encode
+    rows, vectors, texts = [], [], []
+    pending_bytes = 0
+    last_checkpoint = time.monotonic()
+    
+    def flush():
+        nonlocal pending_bytes, row_bytes
+        if not rows:
+            return
+        
+        encoded = encoder.encode(texts) if texts else None
+        
+        dimension = encoded.shape[1] if encoded is not None else previous.dimension
+        matrix = np.empty((len(rows), dimension), dtype=np.float32)
+        next_encoded = 0
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                matrix[i] = encoded[next_encoded]
+                next_encoded += 1
+            else:
+                matrix[i] = vector
+        
+        writer.add_chunks(np.array(rows, dtype=np.int64), matrix)
+        stats["chunks"] += len(rows)
+        stats["encoded_chunks"] += len(texts)
+        stats["dim"] = dimension
+        row_bytes = 4 * dimension
+        
+        rows.clear()
+        vectors.clear()
+        texts.clear()
+        pending_bytes = 0
+    
+    try:
+        seen = set(already_written)
+        if files is None:
+            file_source = _iter_repo_files(repo_path, previous, workers, skip=already_written)
+        else:
+            file_source = files(already_written)
+        
+        for file_dict, _ in file_source:
+            seen.add(file_dict["path"])
+            file_index = writer.add_file(file_dict, file_dict["content"])
+            stats["files"] += 1
+            
+            old = reusable.get(file_dict["path"])
+            if old and old[0] == file_dict["sha256"] and not (
+                    recount_lines and OTHER_LINE_BREAKS.search(file_dict["content"])):
+                stats["reused_files"] += 1
+                for row in old[1]:
+                    chunk = previous.chunks[row].tolist()
+                    chunk[CHUNK_FILE] = file_index
+                    rows.append(chunk)
+                    vectors.append(previous.embeddings[row])
+                    pending_bytes += row_bytes
+            else:
+                for chunk in _file_chunks(file_index, file_dict, chunk_lines, overlap):
+                    rows.append([chunk[field] for field in CHUNK_FIELDS])
+                    vectors.append(None)
+                    texts.append(chunk["content"])
+                    pending_bytes += row_bytes + len(chunk["content"])
+            
+            if pending_bytes >= budget or len(rows) >= batch_chunks:
+                flush()
+                if time.monotonic() - last_checkpoint >= CHECKPOINT_SECONDS:
+                    writer.checkpoint()
+                    last_checkpoint = time.monotonic()
+        
+        flush()
+    except BaseException:
+        # Keep what was written so the next run can resume from the last checkpoint
+        writer.close()
+        raise
+    finally:
+        encoder.close()
+    
+    if stats["files"] == 0:
+        writer.abort()
+        raise ValueError("No files found to process. Check that the repository contains code/documentation files.")
+    
+    # Reused int8 vectors were dequantized; quantizing them with the scales they came with restores their codes
+    base_params = previous.embeddings.params if reusable and previous.embedding_dtype == "int8" else None
+    writer.commit(dimension=previous.dimension if previous is not None else None, base_params=base_params)
+    
+    deleted = len(set(reusable) - seen)
+    print(
+        f"Wrote {stats['files']} files ({stats['chunks']} chunks): "
+        f"{stats['reused_files']} files unchanged, {stats['encoded_chunks']} chunks encoded, {deleted} deleted."
+    )
+    return stats
 
 
-def save_embeddings(files: List[Dict[str, str]], embeddings: np.ndarray, out_file: str = "repo_store.pkl"):
+def save_embeddings(files: List[Dict[str, str]], embeddings: np.ndarray, out_file: str = "repo_store.pkl",
+                    chunks: List[Dict[str, Union[str, int]]] = None, metadata: Dict = None):
     """
-    Save files and embeddings to a pickle file.
+    Save files, chunk offsets and embeddings to a legacy pickle store.
+    
+    generate_repo_store() writes store directories instead (see repo_store.py);
+    this is kept for tools that still consume pickle stores. The store is written to a temporary file and moved into place, so readers
+    never see a partially written store.
     
     Args:
         files: List of dictionaries with 'path' and 'content' keys
-        embeddings: NumPy array of embeddings
+        embeddings: NumPy array of embeddings, one row per chunk (or per file if chunks is None)
         out_file: Output pickle file path
+        chunks: Optional chunk dictionaries from chunk_files()
+        metadata: Optional extra top-level entries (model name, chunk settings)
     """
-    if len(files) != embeddings.shape[0]:
-        raise ValueError(f"Mismatch: {len(files)} files but {embeddings.shape[0]} embeddings")
+    expected = len(chunks) if chunks is not None else len(files)
+    if expected != embeddings.shape[0]:
+        unit = "chunks" if chunks is not None else "files"
+        raise ValueError(f"Mismatch: {expected} {unit} but {embeddings.shape[0]} embeddings")
     
     data = {
         "files": files,
         "embeddings": embeddings
     }
     
+    if metadata:
+        data.update(metadata)
+    
+    if chunks is not None:
+        # Chunk text is a slice of the file content, so only offsets are stored
+        data["chunks"] = [
+            {k: chunk[k] for k in CHUNK_FIELDS}
+            for chunk in chunks
+        ]
+    
     print(f"Saving embeddings to {out_file}...")
-    with open(out_file, 'wb') as f:
+    tmp_file = out_file + ".tmp"
+    with open(tmp_file, 'wb') as f:
         pickle.dump(data, f)
+    os.replace(tmp_file, out_file)
     
-    print(f"Successfully saved {len(files)} file embeddings to {out_file}")
+    print(f"Successfully saved {embeddings.shape[0]} embeddings for {len(files)} files to {out_file}")
 
 
-def generate_repo_store(repo_url_or_path: str, out_file: str = "repo_store.pkl", cleanup: bool = True):
+def generate_repo_store(repo_url_or_path: str, out_file: str = "repo_store", cleanup: bool = True,
+                        incremental: bool = True, index_type: str = "auto",
+                        memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB, resume: bool = True,
+                        batch_size: int = ENCODE_BATCH_SIZE, encode_workers: int = ENCODE_WORKERS,
+                        embedding_dtype: str = "float32", metric: str = DEFAULT_METRIC,
+                        mirror: bool = False, mirror_dir: str = None, ref: str = "HEAD"):
     """
     Main function to generate a repository store from a GitHub URL or local path.
     
+    With mirror=True, a URL is kept as a persistent bare mirror instead of being
+    cloned per run: the mirror is fetched, and only the paths changed between
+    the commit recorded in the store and the new head are read and embedded.
+    
     Args:
         repo_url_or_path: GitHub repository URL or local directory path
-        out_file: Output pickle file path
+        out_file: Output store directory
         cleanup: If True and repo was cloned, remove the cloned directory after processing
+        incremental: If True and out_file already exists, only re-embed new or modified files
+        index_type: FAISS index to build and save with the store ('flat', 'ivf_flat',
+            'ivf_pq', 'hnsw'), or 'auto' to choose by store size
+        memory_limit_mb: Approximate memory ceiling for files and chunks in flight
+        resume: If True, continue an interrupted run from its last checkpoint
+        batch_size: Number of texts per model forward pass
+        encode_workers: Number of encoder processes (set to the core count on CPU-only hosts)
+        embedding_dtype: Storage precision of the embeddings: 'float32', or 'float16' /
+            'int8' for 2x / 4x smaller stores (see repo_index.py --benchmark-quantization)
+        metric: 'cosine' (normalized vectors, inner-product search) or 'l2'
+        mirror: If True and the input is a URL, index from a persistent bare mirror
+        mirror_dir: Directory holding the mirrors (defaults to REPO_MIRROR_DIR or ~/.cache)
+        ref: Branch or tag to index in mirror mode ('HEAD' is the default branch)
     """
     temp_clone_dir = None
     
+    if out_file.endswith(".pkl"):
+        raise ValueError(
+            f"Output must be a store directory, not a pickle file: {out_file}. "
+            f"Convert existing pickle stores with: python repo_store.py convert <pkl_file> <out_dir>"
+        )
+    
     try:
         # Determine if input is a URL or local path
-        is_url = repo_url_or_path.startswith(('http://', 'https://', 'git@'))
+        is_url = repo_url_or_path.startswith(('http://', 'https://', 'git@', 'file://'))
+        
+        # Load the previous store to skip unchanged files
+        previous = load_store(out_file) if incremental else None
+        files = None
+        extra_metadata = None
         
-        if is_url:
+        if is_url and mirror:
+            repo = sync_mirror(repo_url_or_path, mirror_dir)
+            commit = resolve_commit(repo, ref)
+            repo_path = repo.git_dir
+            extra_metadata = {"source": repo_url_or_path, "commit": commit}
+            
+            indexed = previous.meta.get("commit") if previous is not None else None
+            if previous is not None and previous.meta.get("source") != repo_url_or_path:
+                indexed = None
+            
+            if (indexed == commit and previous.metric == metric and previous.embedding_dtype == embedding_dtype
+                    and previous.meta.get("line_breaks") == LINE_BREAKS and os.path.isdir(out_file)):
+                print(f"Store {out_file} is already at commit {commit[:12]}, nothing to do.")
+                previous.close()
+                return
+            
+            changed = None
+            if indexed and has_commit(repo, indexed):
+                changed = changed_paths(repo, indexed, commit)
+                print(f"{len(changed)} paths changed between {indexed[:12]} and {commit[:12]}")
+            elif indexed:
+                print(f"Indexed commit {indexed[:12]} is no longer in the mirror, comparing blobs instead")
+            
+            def files(skip):
+                return _iter_commit_files(repo, commit, previous, changed, skip)
+        elif is_url:
             # Clone repository
             temp_clone_dir = clone_repo(repo_url_or_path)
             repo_path = temp_clone_dir
@@ -219,21 +1039,36 @@ def generate_repo_store(repo_url_or_path: str, out_file: str = "repo_store.pkl",
             if not os.path.exists(repo_path):
                 raise ValueError(f"Local path does not exist: {repo_path}")
         
-        # Load files
-        files = load_repo_files(repo_path)
+        # Load, chunk and embed files (only new or modified ones), writing the store as we go
+        stats = stream_repo_store(
+            repo_path, out_file, previous,
+            memory_limit_mb=memory_limit_mb,
+            resume=resume,
+            batch_size=batch_size,
+            encode_workers=encode_workers,
+            embedding_dtype=embedding_dtype,
+            metric=metric,
+            files=files,
+            extra_metadata=extra_metadata
+        )
+        if previous is not None:
+            previous.close()
         
-        if not files:
-            raise ValueError("No files found to process. Check that the repository contains code/documentation files.")
+        # Train approximate indexes now so search engines do not have to at load
+        index_report = build_store_index(out_file, index_type)
         
-        # Generate embeddings
-        embeddings = embed_files(files)
-        
-        # Save embeddings
-        save_embeddings(files, embeddings, out_file)
+        # Inverted index for keyword search
+        store = RepoStore.open(out_file)
+        try:
+            build_store_keyword_index(store)
+        finally:
+            store.close()
         
         print(f"\n✓ Successfully generated repository store: {out_file}")
-        print(f"  - Files processed: {len(files)}")
-        print(f"  - Embedding dimensions: {embeddings.shape[1]}")
+        print(f"  - Files processed: {stats['files']}")
+        print(f"  - Chunks embedded: {stats['chunks']}")
+        print(f"  - Embedding dimensions: {stats['dim']}")
+        print(f"  - Index: {index_report['type']}")
         
     finally:
         # Cleanup temporary clone directory if needed
@@ -245,14 +1080,56 @@ def generate_repo_store(repo_url_or_path: str, out_file: str = "repo_store.pkl",
 if __name__ == "__main__":
     import sys
     
-    if len(sys.argv) < 2:
-        print("Usage: python embed_repo.py <repo_url_or_path> [output_file]")
-        print("Example: python embed_repo.py https://github.com/user/repo.git repo_store.pkl")
-        print("Example: python embed_repo.py /path/to/local/repo repo_store.pkl")
+    # --full forces a rebuild instead of reusing embeddings from an existing store,
+    # --index=<type> picks the FAISS index (auto, flat, ivf_flat, ivf_pq, hnsw),
+    # --memory-limit=<MB> bounds the memory used for files and chunks in flight,
+    # --no-resume discards an interrupted run instead of continuing it,
+    # --workers=<N> encodes on N processes, --batch-size=<N> sets texts per forward pass,
+    # --dtype=<float32|float16|int8> sets the storage precision of the embeddings,
+    # --metric=<cosine|l2> sets how vectors are compared,
+    # --mirror indexes a URL from a persistent bare mirror, --ref=<branch> picks what to index
+    full_rebuild = "--full" in sys.argv
+    no_resume = "--no-resume" in sys.argv
+    use_mirror = "--mirror" in sys.argv
+    ref = "HEAD"
+    index_type = "auto"
+    memory_limit_mb = DEFAULT_MEMORY_LIMIT_MB
+    encode_workers = ENCODE_WORKERS
+    batch_size = ENCODE_BATCH_SIZE
+    embedding_dtype = "float32"
+    metric = DEFAULT_METRIC
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--index="):
+            index_type = arg.split("=", 1)[1]
+        elif arg.startswith("--memory-limit="):
+            memory_limit_mb = int(arg.split("=", 1)[1])
+        elif arg.startswith("--workers="):
+            encode_workers = int(arg.split("=", 1)[1])
+        elif arg.startswith("--batch-size="):
+            batch_size = int(arg.split("=", 1)[1])
+        elif arg.startswith("--dtype="):
+            embedding_dtype = arg.split("=", 1)[1]
+        elif arg.startswith("--metric="):
+            metric = arg.split("=", 1)[1]
+        elif arg.startswith("--ref="):
+            ref = arg.split("=", 1)[1]
+        elif arg not in ("--full", "--no-resume", "--mirror"):
+            args.append(arg)
+    
+    if len(args) < 1:
+        print("Usage: python embed_repo.py <repo_url_or_path> [output_dir] [--full] [--index=<type>] "
+              "[--memory-limit=<MB>] [--no-resume] [--workers=<N>] [--batch-size=<N>] "
+              "[--dtype=<float32|float16|int8>] [--metric=<cosine|l2>] [--mirror] [--ref=<branch>]")
+        print("Example: python embed_repo.py https://github.com/user/repo.git repo_store")
+        print("Example: python embed_repo.py /path/to/local/repo repo_store")
         sys.exit(1)
     
-    repo_input = sys.argv[1]
-    output_file = sys.argv[2] if len(sys.argv) > 2 else "repo_store.pkl"
+    repo_input = args[0]
+    output_file = args[1] if len(args) > 1 else "repo_store"
     
-    generate_repo_store(repo_input, output_file)
+    generate_repo_store(repo_input, output_file, incremental=not full_rebuild, index_type=index_type,
+                        memory_limit_mb=memory_limit_mb, resume=not no_resume,
+                        batch_size=batch_size, encode_workers=encode_workers, embedding_dtype=embedding_dtype,
+                        metric=metric, mirror=use_mirror, ref=ref)
 
@@ -0,0 +1,225 @@
+"""
+Federated Search Module
+
+This module searches many repository stores as one:
+- Every store is opened as a RepoSearchEngine sharing a single embedding model
+  and query embedding cache, so memory does not grow with a model per store
+- Each query is encoded once and the per-store FAISS indexes are searched in
+  parallel on a thread pool (FAISS releases the GIL while searching)
+- Per-store hits are merged into a global top-k with a heap on the calibrated
+  score, and content is read only for the files that are returned
+"""
+
+import contextlib
+import heapq
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from sentence_transformers import SentenceTransformer
+
+from search_repo import RepoSearchEngine, calibrated_score
+from search_repo_json import _truncate
+from query_cache import QueryEmbeddingCache
+from model_registry import get_model
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Threads searching store indexes concurrently
+FEDERATED_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class FederatedSearchEngine:
+    """
+    Search engine over several repository stores.
+    
+    Results are those of RepoSearchEngine.search() with an additional 'store'
+    key naming the store each file came from. Stores are ranked against each
+    other by their calibrated 'score', so stores with different metrics can be
+    searched together.
+    """
+    
+    def __init__(self, engines: Dict[str, RepoSearchEngine], executor: ThreadPoolExecutor = None,
+                 workers: int = FEDERATED_WORKERS):
+        """
+        Initialize from already-opened engines. Use FederatedSearchEngine.open() to load stores.
+        
+        Args:
+            engines: Mapping of store name to engine; all must share the same embedding model
+            executor: Optional thread pool to search stores on, e.g. one shared by a server
+            workers: Number of search threads if no executor is given
+        """
+        if not engines:
+            raise ValueError("At least one store is required")
+        
+        dimensions = {engine.get_embedding_dimension() for engine in engines.values()}
+        if len(dimensions) > 1:
+            raise ValueError(f"Stores have different embedding dimensions: {sorted(dimensions)}")
+        
+        self.engines = engines
+        self._encoder = next(iter(engines.values()))
+        self._own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(max_workers=max(1, workers),
+                                                       thread_name_prefix="federated-search")
+    
+    @classmethod
+    def open(cls, store_paths: List[str], model_name: str = DEFAULT_MODEL, model: SentenceTransformer = None,
+             index_type: str = "auto", query_cache: QueryEmbeddingCache = None,
+             workers: int = FEDERATED_WORKERS) -> "FederatedSearchEngine":
+        """
+        Load several stores with one shared model.
+        
+        Stores are loaded in parallel; each is named by the path it was given.
+        
+        Args:
+            store_paths: Paths to the store directories (or legacy pickle files)
+            model_name: Name of the sentence-transformers model (must match the one used for embedding)
+            model: Optional already-loaded model (by default the model_registry one is used)
+            index_type: FAISS index to use for every store (see RepoSearchEngine)
+            query_cache: Optional query embedding cache to share
+            workers: Number of threads loading and searching stores
+        
+        Returns:
+            FederatedSearchEngine instance
+        """
+        if model is None:
+            model = get_model(model_name)
+        if query_cache is None:
+            query_cache = QueryEmbeddingCache.from_env()
+        
+        def load(path):
+            return RepoSearchEngine(path, model_name=model_name, model=model, index_type=index_type,
+                                    query_cache=query_cache)
+        
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="store-loader") as loader:
+            engines = dict(zip(store_paths, loader.map(load, store_paths)))
+        
+        return cls(engines, workers=workers)
+    
+    def close(self):
+        """Shut down the thread pool if this engine created it."""
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+    
+    def get_file_count(self) -> int:
+        """
+        Get the total number of files over all stores.
+        
+        Returns:
+            Number of files
+        """
+        return sum(engine.get_file_count() for engine in self.engines.values())
+    
+    def search(self, query: str, top_k: int = 5, min_score: float = None,
+               include_content: bool = False) -> List[Dict[str, any]]:
+        """
+        Search all stores for the most similar files to a query string.
+        
+        Args:
+            query: Search query string
+            top_k: Number of top results to return over all stores
+            min_score: Optional threshold on the calibrated 'score' of results
+            include_content: If True, results also carry the full file 'content'
+        
+        Returns:
+            List of result dictionaries (see RepoSearchEngine.search()) with an
+            additional 'store' key, best first
+        """
+        return self.search_batch([query], top_k, min_score, include_content)[0]
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, min_score: float = None,
+                     include_content: bool = False) -> List[List[Dict[str, any]]]:
+        """
+        Search all stores for several queries at once.
+        
+        Queries are encoded in one model call, then every store searches all
+        queries in one FAISS call on its own thread.
+        
+        Args:
+            queries: Search query strings
+            top_k: Number of top results to return per query over all stores
+            min_score: Optional threshold on the calibrated 'score' of results
+            include_content: If True, results also carry the full file 'content'
+        
+        Returns:
+            One result list per query, in query order, each as returned by search()
+        """
+        if top_k <= 0:
+            raise ValueError("top_k must be positive")
+        
+        if not queries:
+            return []
+        
+        query_embeddings = self._encoder._encode_queries(queries)
+        
+        def search_store(item):
+            name, engine = item
+            num_files = min(top_k, engine.get_file_count())
+            if num_files == 0:
+                return name, [[] for _ in queries]
+            return name, engine._search_vectors(query_embeddings, num_files)
+        
+        store_hits = list(self.executor.map(search_store, self.engines.items()))
+        
+        batch_results = []
+        for query_idx in range(len(queries)):
+            # Every store's hits are already sorted, so only the best top_k of each can make the cut
+            candidates = (
+                (calibrated_score(chunk_hits[0]["distance"], self.engines[name].metric), name, file_idx, chunk_hits)
+                for name, hits in store_hits
+                for file_idx, chunk_hits in hits[query_idx][:top_k]
+            )
+            best = heapq.nlargest(top_k, candidates, key=lambda candidate: candidate[0])
+            
+            results = []
+            for score, name, file_idx, chunk_hits in best:
+                if min_score is not None and score < min_score:
+                    break
+                engine = self.engines[name]
+                content = engine.store.get_content(file_idx)
+                result = engine._vector_result(file_idx, chunk_hits, content)
+                result["store"] = name
+                if include_content:
+                    result["content"] = content
+                results.append(result)
+            batch_results.append(results)
+        
+        return batch_results
+    
+    def get_embedding_dimension(self) -> int:
+        """
+        Get the dimension of the embeddings shared by all stores.
+        
+        Returns:
+            Embedding dimension
+        """
+        return self._encoder.get_embedding_dimension()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(json.dumps({"error": "Usage: python federated_search.py <query> <store> [<store> ...] [--top-k=N]"}))
+        sys.exit(1)
+    
+    top_k = 5
+    positional = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--top-k="):
+            top_k = int(arg.split("=", 1)[1])
+        else:
+            positional.append(arg)
+    
+    query, store_paths = positional[0], positional[1:]
+    
+    try:
+        # Engine progress messages go to stderr so stdout stays valid JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            engine = FederatedSearchEngine.open(store_paths)
+            results = _truncate(engine.search(query, top_k))
+            engine.close()
+    except Exception as e:
+        results = {"error": str(e)}
+    
+    print(json.dumps(results, indent=2))
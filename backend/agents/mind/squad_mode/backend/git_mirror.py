@@ -0,0 +1,186 @@
+"""
+Git Mirror Module
+
+This module keeps persistent bare mirrors of remote repositories so stores can
+be refreshed from commit diffs instead of fresh clones:
+- One bare mirror per repository URL, created once and then only fetched
+- Changed paths between the indexed commit and the new head from
+  'git diff --name-status'
+- File listing and blob reads at a commit straight from the object database,
+  without checking out a working tree
+"""
+
+import hashlib
+import os
+import re
+import shutil
+from typing import Dict, List, Tuple
+import git
+
+
+# Directory holding the mirrors; override with REPO_MIRROR_DIR
+MIRROR_DIR_ENV = "REPO_MIRROR_DIR"
+DEFAULT_MIRROR_DIR = os.path.join(os.path.expanduser("~"), ".cache", "repo_search", "mirrors")
+
+# Tree entry modes of regular files (symlinks and submodules are not indexed)
+BLOB_MODES = {"100644", "100755"}
+
+
+def mirror_root() -> str:
+    """
+    Get the directory holding the mirrors.
+    
+    Returns:
+        REPO_MIRROR_DIR if set, otherwise DEFAULT_MIRROR_DIR
+    """
+    return os.environ.get(MIRROR_DIR_ENV) or DEFAULT_MIRROR_DIR
+
+
+def mirror_path(repo_url: str, root: str = None) -> str:
+    """
+    Get the mirror directory of a repository URL.
+    
+    The name keeps the readable end of the URL plus a hash of the whole URL,
+    so different hosts or owners with the same repository name do not collide.
+    
+    Args:
+        repo_url: Repository URL
+        root: Mirror directory (defaults to mirror_root())
+    
+    Returns:
+        Path of the bare mirror
+    """
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', re.split(r'[/:]', repo_url.rstrip("/"))[-1])
+    name = name[:-4] if name.endswith(".git") else name
+    digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(root or mirror_root(), f"{name}-{digest}.git")
+
+
+def sync_mirror(repo_url: str, root: str = None) -> git.Repo:
+    """
+    Create or update the bare mirror of a repository.
+    
+    The first call clones with --mirror; later calls only fetch new objects
+    and prune deleted refs.
+    
+    Args:
+        repo_url: Repository URL
+        root: Mirror directory (defaults to mirror_root())
+    
+    Returns:
+        git.Repo of the mirror
+    """
+    path = mirror_path(repo_url, root)
+    
+    try:
+        if os.path.isdir(path):
+            repo = git.Repo(path)
+            print(f"Fetching new commits into mirror {path}...")
+            repo.git.remote("update", "--prune")
+            return repo
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        print(f"Creating mirror of {repo_url} at {path}...")
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            # Left over from an interrupted clone
+            shutil.rmtree(tmp_path)
+        git.Repo.clone_from(repo_url, tmp_path, mirror=True)
+        os.replace(tmp_path, path)
+        return git.Repo(path)
+    except git.exc.GitCommandError as e:
+        raise ValueError(f"Failed to update mirror of {repo_url}: {e}")
+
+
+def resolve_commit(repo: git.Repo, ref: str = "HEAD") -> str:
+    """
+    Resolve a ref of the mirror to a commit SHA.
+    
+    Args:
+        repo: Mirror repository
+        ref: Branch, tag or 'HEAD' (the remote's default branch)
+    
+    Returns:
+        Full commit SHA
+    """
+    return repo.git.rev_parse(f"{ref}^{{commit}}")
+
+
+def has_commit(repo: git.Repo, sha: str) -> bool:
+    """
+    Check whether a commit is present in the mirror (it may be gone after a force push).
+    
+    Args:
+        repo: Mirror repository
+        sha: Commit SHA
+    
+    Returns:
+        True if the commit exists
+    """
+    try:
+        repo.git.cat_file("-e", f"{sha}^{{commit}}")
+        return True
+    except git.exc.GitCommandError:
+        return False
+
+
+def changed_paths(repo: git.Repo, old: str, new: str) -> Dict[str, str]:
+    """
+    List the paths that differ between two commits.
+    
+    Renames are reported as a deletion plus an addition, so every path is
+    either added ('A'), modified ('M'), type-changed ('T') or deleted ('D').
+    
+    Args:
+        repo: Mirror repository
+        old: Commit the store was indexed at
+        new: Commit to index
+    
+    Returns:
+        Mapping of path to status letter
+    """
+    output = repo.git.diff("--name-status", "-z", "--no-renames", old, new)
+    fields = output.split("\0")
+    changes = {}
+    for i in range(0, len(fields) - 1, 2):
+        changes[fields[i + 1]] = fields[i][:1]
+    return changes
+
+
+def list_tree(repo: git.Repo, commit: str) -> List[Tuple[str, str, int]]:
+    """
+    List the regular files of a commit.
+    
+    Args:
+        repo: Mirror repository
+        commit: Commit SHA
+    
+    Returns:
+        List of (path, blob SHA, size in bytes) tuples in git's path order
+    """
+    output = repo.git.ls_tree("-r", "-z", "--long", "--full-tree", commit)
+    entries = []
+    for record in output.split("\0"):
+        if not record:
+            continue
+        info, path = record.split("\t", 1)
+        mode, kind, sha, size = info.split()
+        if kind == "blob" and mode in BLOB_MODES:
+            entries.append((path, sha, int(size)))
+    return entries
+
+
+def read_blob(repo: git.Repo, sha: str) -> bytes:
+    """
+    Read a blob from the mirror's object database.
+    
+    Reads go through one persistent 'git cat-file --batch' process per repository.
+    
+    Args:
+        repo: Mirror repository
+        sha: Blob SHA
+    
+    Returns:
+        Blob data
+    """
+    return repo.odb.stream(bytes.fromhex(sha)).read()
@@ -0,0 +1,317 @@
+"""
+Keyword Index Module
+
+This module provides an inverted index for keyword search over repository files:
+- Word tokens (identifiers and words in any script) are indexed with per-file
+  term frequencies
+- Queries are scored with BM25
+- A trigram index over the vocabulary resolves substring queries (e.g. 'auth'
+  matching 'authenticate') without scanning file contents
+- The index can be saved next to a repository store and loaded at startup
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Iterable, List, Tuple
+import numpy as np
+
+from repo_store import RepoStore, keyword_index_path
+
+# Lowercased word tokens: letters of any script, digits and '_'. Very long tokens
+# are usually minified code or data.
+TOKEN_PATTERN = re.compile(r'\w{1,64}', re.UNICODE)
+
+# Saved indexes built with another tokenizer are treated as stale
+# (version 1 only indexed ASCII letters and digits)
+TOKENIZER_VERSION = 2
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Vocabulary terms that merely contain a query token count less than an exact match
+PARTIAL_MATCH_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+    
+    Text made only of punctuation or operators (e.g. '=>', '::') has no tokens.
+    
+    Args:
+        text: Text to tokenize
+    
+    Returns:
+        List of tokens in order of appearance
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _trigrams(term: str):
+    """All distinct 3-character substrings of a term."""
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index over the files of a repository store.
+    
+    Postings are kept in CSR form: the documents (file indices) and term
+    frequencies of term i are docs[offsets[i]:offsets[i + 1]].
+    """
+    
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, version=None, tokenizer: int = TOKENIZER_VERSION):
+        """
+        Initialize from postings arrays. Use KeywordIndex.build() or load() instead.
+    
+        Args:
+            terms: Vocabulary, sorted
+            offsets: int64 [num_terms + 1] start of each term's postings
+            docs: int32 document index of every posting
+            tfs: int32 term frequency of every posting
+            doc_lengths: int32 number of tokens in each document
+            version: Store version the index was built for
+            tokenizer: TOKENIZER_VERSION of the tokenizer the index was built with
+        """
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.avg_doc_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+        self.version = version
+        self.tokenizer = tokenizer
+        self._trigram_terms = None
+    
+    @classmethod
+    def build(cls, documents: Iterable[str], version=None) -> "KeywordIndex":
+        """
+        Build an index over documents.
+    
+        Args:
+            documents: Document texts, in file index order
+            version: Store version the index is built for
+    
+        Returns:
+            KeywordIndex instance
+        """
+        postings = {}
+        doc_lengths = []
+    
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+    
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+    
+        docs = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.int32)
+        for i, term in enumerate(terms):
+            entries = postings.pop(term)
+            docs[offsets[i]:offsets[i + 1]] = [d for d, _ in entries]
+            tfs[offsets[i]:offsets[i + 1]] = [tf for _, tf in entries]
+    
+        return cls(terms, offsets, docs, tfs, np.array(doc_lengths, dtype=np.int32), version)
+    
+    def save(self, path: str):
+        """
+        Save the index to a .npz file.
+    
+        Args:
+            path: Output file path
+        """
+        vocabulary = np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            vocabulary=vocabulary,
+            offsets=self.offsets,
+            docs=self.docs,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+            version=np.array([self.version if self.version is not None else np.nan], dtype=np.float64),
+            tokenizer=np.array([self.tokenizer], dtype=np.int32)
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "KeywordIndex":
+        """
+        Load an index saved with save().
+    
+        Args:
+            path: Index file path, or an open binary file
+    
+        Returns:
+            KeywordIndex instance
+        """
+        if hasattr(path, "seek"):
+            path.seek(0)
+        with np.load(path) as data:
+            vocabulary = data["vocabulary"].tobytes().decode("utf-8")
+            terms = vocabulary.split("\n") if vocabulary else []
+            version = float(data["version"][0])
+            tokenizer = int(data["tokenizer"][0]) if "tokenizer" in data.files else 1
+            return cls(
+                terms, data["offsets"], data["docs"], data["tfs"], data["doc_lengths"],
+                None if np.isnan(version) else version, tokenizer
+            )
+    
+    @property
+    def num_docs(self) -> int:
+        """Number of indexed documents."""
+        return len(self.doc_lengths)
+    
+    @property
+    def trigram_terms(self):
+        """Mapping of trigram to ids of vocabulary terms containing it, built on first use."""
+        if self._trigram_terms is None:
+            trigram_terms = {}
+            for term_id, term in enumerate(self.terms):
+                for trigram in _trigrams(term):
+                    trigram_terms.setdefault(trigram, []).append(term_id)
+            self._trigram_terms = {t: np.array(ids, dtype=np.int32) for t, ids in trigram_terms.items()}
+        return self._trigram_terms
+    
+    def matching_terms(self, token: str) -> List[Tuple[int, float]]:
+        """
+        Find vocabulary terms matching a query token.
+    
+        Tokens of three or more characters also match every term containing
+        them as a substring, found through the trigram index. Shorter non-ASCII
+        tokens do too, by scanning the vocabulary: scripts written without
+        spaces (e.g. CJK) index whole runs of text as one term.
+    
+        Args:
+            token: Lowercase query token
+    
+        Returns:
+            List of (term id, weight) tuples
+        """
+        matches = {}
+    
+        if len(token) >= 3:
+            candidates = None
+            for trigram in _trigrams(token):
+                ids = self.trigram_terms.get(trigram)
+                if ids is None:
+                    candidates = None
+                    break
+                candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+                if len(candidates) == 0:
+                    break
+            
+            if candidates is not None:
+                for term_id in candidates.tolist():
+                    if token in self.terms[term_id]:
+                        matches[term_id] = PARTIAL_MATCH_WEIGHT
+        elif not token.isascii():
+            for term_id, term in enumerate(self.terms):
+                if token in term:
+                    matches[term_id] = PARTIAL_MATCH_WEIGHT
+    
+        exact = self.term_ids.get(token)
+        if exact is not None:
+            matches[exact] = 1.0
+    
+        return list(matches.items())
+    
+    def search(self, query: str, top_k: int = None) -> List[Tuple[int, float]]:
+        """
+        Score documents against a query with BM25.
+    
+        Args:
+            query: Query text; every token is matched as a term and as a substring
+            top_k: Optional number of results to return
+    
+        Returns:
+            List of (document index, score) tuples, best first
+        """
+        doc_parts = []
+        score_parts = []
+    
+        for token in set(tokenize(query)):
+            for term_id, weight in self.matching_terms(token):
+                start, end = self.offsets[term_id], self.offsets[term_id + 1]
+                docs = self.docs[start:end]
+                tfs = self.tfs[start:end].astype(np.float32)
+                
+                df = end - start
+                idf = np.log(1.0 + (self.num_docs - df + 0.5) / (df + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[docs] / (self.avg_doc_length or 1.0))
+                
+                doc_parts.append(docs)
+                score_parts.append(weight * idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+    
+        if not doc_parts:
+            return []
+    
+        # Sum scores per document; work is proportional to matching postings only
+        all_docs = np.concatenate(doc_parts)
+        unique_docs, inverse = np.unique(all_docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+    
+        order = np.argsort(-scores, kind="stable")
+        if top_k is not None:
+            order = order[:top_k]
+        return [(int(unique_docs[i]), float(scores[i])) for i in order]
+
+
+def build_store_keyword_index(store: RepoStore, save: bool = True) -> KeywordIndex:
+    """
+    Build the keyword index of a store, reading every file's content once.
+    
+    Args:
+        store: Opened repository store
+        save: If True, save the index next to the store
+    
+    Returns:
+        KeywordIndex instance
+    """
+    version = store.version
+    index = KeywordIndex.build((store.get_content(i) for i in range(len(store.files))), version)
+    
+    if save:
+        index.save(keyword_index_path(store.path))
+        print(f"Saved keyword index with {len(index.terms)} terms to {keyword_index_path(store.path)}")
+    
+    return index
+
+
+def load_store_keyword_index(store: RepoStore) -> KeywordIndex:
+    """
+    Load the keyword index saved with a store if it is present and up to date.
+    
+    The index file is the one the store opened with the rest of its snapshot.
+    
+    Args:
+        store: Opened repository store
+    
+    Returns:
+        KeywordIndex, or None if there is no usable saved index
+    """
+    path = keyword_index_path(store.path)
+    if store.keyword_index_file is None:
+        return None
+    
+    try:
+        index = KeywordIndex.load(store.keyword_index_file)
+    except Exception as e:
+        print(f"Warning: Could not load keyword index {path}: {e}")
+        return None
+    
+    if (index.version != store.version or index.num_docs != len(store.files)
+            or index.tokenizer != TOKENIZER_VERSION):
+        print(f"Keyword index at {path} is stale, ignoring it")
+        return None
+    
+    return index
@@ -0,0 +1,201 @@
+"""
+Model Registry Module
+
+This module loads embedding models once per process and shares them:
+- get_model() returns the resident model for a name, loading it on first use
+  (concurrent callers wait for a single load)
+- preload() loads and warms up models ahead of the first request
+- Models can run on the default PyTorch backend, on ONNX Runtime or OpenVINO,
+  and PyTorch models can be dynamically quantized to int8 for CPU inference
+- Every encode() call is timed; model_stats() reports load time and latency
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Defaults for models loaded without an explicit backend / quantization
+MODEL_BACKEND_ENV = "REPO_SEARCH_MODEL_BACKEND"
+MODEL_QUANTIZE_ENV = "REPO_SEARCH_MODEL_QUANTIZE"
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+# Encode latencies kept per model for percentiles
+LATENCY_WINDOW = 1024
+
+
+class EncodeMetrics:
+    """Running encode statistics of one model."""
+    
+    def __init__(self, load_seconds: float):
+        self.load_seconds = load_seconds
+        self.calls = 0
+        self.texts = 0
+        self.total_seconds = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+    
+    def record(self, num_texts: int, seconds: float):
+        """
+        Record one encode() call.
+        
+        Args:
+            num_texts: Number of texts encoded
+            seconds: Wall-clock duration of the call
+        """
+        with self._lock:
+            self.calls += 1
+            self.texts += num_texts
+            self.total_seconds += seconds
+            self._latencies.append(seconds)
+    
+    def stats(self) -> Dict[str, float]:
+        """
+        Get the statistics.
+        
+        Returns:
+            Dictionary with 'load_seconds', 'calls', 'texts', 'mean_ms', 'p50_ms',
+            'p95_ms' (over the last LATENCY_WINDOW calls) and 'texts_per_second' keys
+        """
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            calls, texts, total = self.calls, self.texts, self.total_seconds
+        
+        return {
+            "load_seconds": round(self.load_seconds, 3),
+            "calls": calls,
+            "texts": texts,
+            "mean_ms": round(total * 1000 / calls, 3) if calls else 0.0,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else 0.0,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3) if len(latencies) else 0.0,
+            "texts_per_second": round(texts / total, 1) if total > 0 else 0.0
+        }
+
+
+class RegisteredModel:
+    """
+    A shared model whose encode() calls are timed.
+    
+    Every other attribute (e.g. start_multi_process_pool) is the underlying
+    SentenceTransformer's.
+    """
+    
+    def __init__(self, model: SentenceTransformer, metrics: EncodeMetrics):
+        self.model = model
+        self.metrics = metrics
+    
+    def encode(self, sentences, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.model.encode(sentences, *args, **kwargs)
+        finally:
+            self.metrics.record(1 if isinstance(sentences, str) else len(sentences), time.perf_counter() - start)
+    
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+_models: Dict[tuple, RegisteredModel] = {}
+_loading: Dict[tuple, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+def _default_backend() -> str:
+    return os.environ.get(MODEL_BACKEND_ENV) or "torch"
+
+
+def _default_quantize() -> bool:
+    return os.environ.get(MODEL_QUANTIZE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def _load(model_name: str, backend: str, quantize: bool) -> SentenceTransformer:
+    """Load a model on the requested backend, falling back to PyTorch if it is unavailable."""
+    if backend != "torch":
+        try:
+            return SentenceTransformer(model_name, backend=backend)
+        except (TypeError, ValueError, ImportError) as e:
+            # Older sentence-transformers without backends, or the runtime is not installed
+            print(f"Warning: Could not load {model_name} with the {backend} backend, using torch: {e}")
+    
+    model = SentenceTransformer(model_name)
+    if quantize:
+        try:
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            print(f"Warning: Could not quantize {model_name}, using full precision: {e}")
+    return model
+
+
+def get_model(model_name: str = DEFAULT_MODEL, backend: str = None, quantize: bool = None) -> RegisteredModel:
+    """
+    Get the resident model for a name, loading it on first use.
+    
+    Args:
+        model_name: Name of the sentence-transformers model
+        backend: 'torch', 'onnx' or 'openvino' (defaults to REPO_SEARCH_MODEL_BACKEND, else 'torch')
+        quantize: If True, quantize a PyTorch model's linear layers to int8
+            (defaults to REPO_SEARCH_MODEL_QUANTIZE)
+    
+    Returns:
+        RegisteredModel shared by every caller asking for the same configuration
+    """
+    backend = backend or _default_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    quantize = _default_quantize() if quantize is None else quantize
+    key = (model_name, backend, bool(quantize) and backend == "torch")
+    
+    model = _models.get(key)
+    if model is not None:
+        return model
+    
+    # One lock per configuration, so loading one model does not block lookups of another
+    with _registry_lock:
+        lock = _loading.setdefault(key, threading.Lock())
+    
+    with lock:
+        model = _models.get(key)
+        if model is None:
+            print(f"Loading embedding model: {model_name} ({backend}{', int8' if key[2] else ''})")
+            start = time.perf_counter()
+            loaded = _load(model_name, backend, key[2])
+            model = RegisteredModel(loaded, EncodeMetrics(time.perf_counter() - start))
+            _models[key] = model
+    return model
+
+
+def preload(model_names: List[str], backend: str = None, quantize: bool = None, warmup: bool = True):
+    """
+    Load models ahead of the first request.
+    
+    Args:
+        model_names: Names of the sentence-transformers models
+        backend: Backend to load them on (see get_model())
+        quantize: Whether to quantize them (see get_model())
+        warmup: If True, run one small encode so lazy initialization happens now
+    """
+    for model_name in model_names:
+        model = get_model(model_name, backend, quantize)
+        if warmup:
+            model.model.encode(["warm up"], convert_to_numpy=True)
+
+
+def model_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Get load time and encode latency of every resident model.
+    
+    Returns:
+        Mapping of 'model_name[backend]' to EncodeMetrics.stats()
+    """
+    return {
+        f"{name}[{backend}{',int8' if quantized else ''}]": model.metrics.stats()
+        for (name, backend, quantized), model in list(_models.items())
+    }
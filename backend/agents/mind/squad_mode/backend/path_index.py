@@ -0,0 +1,181 @@
+"""
+Path Index Module
+
+This module provides fast lookups of repository files by path:
+- Exact path to file index through a hash map
+- Prefix and directory listings through a sorted path table (binary search)
+- Glob queries narrowed to the range of their literal prefix before matching
+"""
+
+import bisect
+import re
+from typing import Dict, List, Tuple
+
+
+# Sorts after any character that can follow a prefix, closing a prefix range
+_PREFIX_END = "\U0010ffff"
+
+_GLOB_SPECIAL = re.compile(r'[*?\[]')
+
+
+def _glob_to_regex(pattern: str) -> re.Pattern:
+    """
+    Compile a glob pattern matched against whole '/'-separated paths.
+    
+    '*' and '?' do not cross directory separators, '**/' matches any number of
+    directories and a trailing '**' matches everything below a directory.
+    
+    Args:
+        pattern: Glob pattern, e.g. 'src/**/*.py'
+    
+    Returns:
+        Compiled regular expression
+    """
+    regex = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            regex.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            regex.append("[^/]*")
+        elif c == "?":
+            regex.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern.startswith("[!", i) or pattern.startswith("[]", i) else i + 1)
+            if end == -1:
+                regex.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            regex.append(re.escape(c))
+        i += 1
+    return re.compile("".join(regex) + r"\Z")
+
+
+class PathIndex:
+    """
+    Lookup table over the file paths of a repository store.
+    
+    Paths are kept in a hash map for exact lookups and in a sorted list for
+    range queries: all paths under a prefix are contiguous in sorted order, so
+    they are found with two binary searches.
+    """
+    
+    def __init__(self, paths: List[str]):
+        """
+        Initialize from the store's file paths.
+        
+        Args:
+            paths: File paths, in file index order
+        """
+        self._ids: Dict[str, int] = {path: i for i, path in enumerate(paths)}
+        order = sorted(range(len(paths)), key=paths.__getitem__)
+        self._sorted_paths = [paths[i] for i in order]
+        self._sorted_ids = order
+    
+    def __len__(self) -> int:
+        return len(self._sorted_paths)
+    
+    def __contains__(self, path: str) -> bool:
+        return path in self._ids
+    
+    def get(self, path: str, default=None):
+        """
+        Get the file index of an exact path.
+        
+        Args:
+            path: File path
+            default: Value returned if the path is not in the store
+        
+        Returns:
+            File index, or default
+        """
+        return self._ids.get(path, default)
+    
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        """Positions in the sorted table of the paths starting with prefix."""
+        start = bisect.bisect_left(self._sorted_paths, prefix)
+        end = bisect.bisect_left(self._sorted_paths, prefix + _PREFIX_END, start)
+        return start, end
+    
+    def with_prefix(self, prefix: str) -> List[Tuple[str, int]]:
+        """
+        Find all paths starting with a prefix.
+        
+        Args:
+            prefix: Path prefix, e.g. 'src/api' (matches 'src/api.py' and 'src/api/x.py')
+        
+        Returns:
+            List of (path, file index) tuples in path order
+        """
+        start, end = self._range(prefix)
+        return list(zip(self._sorted_paths[start:end], self._sorted_ids[start:end]))
+    
+    def list_directory(self, directory: str = "") -> Dict[str, List[str]]:
+        """
+        List the immediate contents of a directory.
+        
+        Subdirectories are skipped over with a binary search each, so the cost
+        depends on the number of entries listed rather than on the size of the
+        subtree.
+        
+        Args:
+            directory: Directory path relative to the repository root ('' for the root)
+        
+        Returns:
+            Dictionary with 'files' (paths) and 'directories' (paths) keys, in path order
+        """
+        prefix = directory.strip("/")
+        prefix = prefix + "/" if prefix else ""
+        
+        files, directories = [], []
+        pos, end = self._range(prefix)
+        while pos < end:
+            path = self._sorted_paths[pos]
+            slash = path.find("/", len(prefix))
+            if slash == -1:
+                files.append(path)
+                pos += 1
+            else:
+                subdirectory = path[:slash + 1]
+                directories.append(subdirectory[:-1])
+                pos = bisect.bisect_left(self._sorted_paths, subdirectory + _PREFIX_END, pos, end)
+        
+        return {"files": files, "directories": directories}
+    
+    def glob(self, pattern: str) -> List[Tuple[str, int]]:
+        """
+        Find all paths matching a glob pattern.
+        
+        Only the paths sharing the pattern's literal prefix (the part before the
+        first wildcard) are tested against it.
+        
+        Args:
+            pattern: Glob pattern, e.g. 'backend/**/*.py' or 'src/*/index.[jt]s'
+        
+        Returns:
+            List of (path, file index) tuples in path order
+        """
+        special = _GLOB_SPECIAL.search(pattern)
+        if special is None:
+            file_idx = self._ids.get(pattern)
+            return [] if file_idx is None else [(pattern, file_idx)]
+        
+        regex = _glob_to_regex(pattern)
+        start, end = self._range(pattern[:special.start()])
+        return [
+            (path, file_idx)
+            for path, file_idx in zip(self._sorted_paths[start:end], self._sorted_ids[start:end])
+            if regex.match(path)
+        ]
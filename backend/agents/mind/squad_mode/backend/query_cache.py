@@ -0,0 +1,231 @@
+"""
+Query Cache Module
+
+This module provides the caches used by RepoSearchEngine to avoid repeated work:
+- LRUCache: a bounded, thread-safe least-recently-used cache
+- QueryEmbeddingCache: query text -> embedding, per model, optionally backed by
+  an SQLite file so one-shot processes share what earlier ones encoded
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+
+
+# Set to a file path to persist query embeddings across processes
+QUERY_CACHE_ENV = "REPO_SEARCH_QUERY_CACHE"
+
+DEFAULT_EMBEDDING_CACHE_SIZE = 4096
+DEFAULT_RESULT_CACHE_SIZE = 1024
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize query text for cache lookups.
+    
+    Only whitespace is normalized; case is kept since it can matter to cased models.
+    
+    Args:
+        query: Query text
+    
+    Returns:
+        Query with surrounding whitespace stripped and inner runs collapsed
+    """
+    return " ".join(query.split())
+
+
+class LRUCache:
+    """
+    Bounded mapping that evicts the least recently used entry when full.
+    
+    Safe to share between the threads of the search server.
+    """
+    
+    def __init__(self, max_entries: int):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            max_entries: Maximum number of entries (0 disables caching)
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default=None):
+        """
+        Look up a key, marking it as recently used.
+        
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+        
+        Returns:
+            Cached value, or default
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key, value):
+        """
+        Insert or replace an entry, evicting the least recently used one if full.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache size and hit/miss counts.
+        
+        Returns:
+            Dictionary with 'entries', 'hits' and 'misses' keys
+        """
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class QueryEmbeddingCache:
+    """
+    Cache of query embeddings keyed by model name and normalized query text.
+    
+    Entries live in an in-memory LRU; with a disk path they are also written to
+    an SQLite file and read back on a memory miss.
+    """
+    
+    def __init__(self, max_entries: int = DEFAULT_EMBEDDING_CACHE_SIZE, disk_path: str = None):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of embeddings kept in memory
+            disk_path: Optional SQLite file persisting embeddings across processes
+        """
+        self.memory = LRUCache(max_entries)
+        self.disk_path = disk_path
+        self.disk_hits = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+                self._db = sqlite3.connect(disk_path, check_same_thread=False, timeout=5)
+                self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not open query cache {disk_path}, caching in memory only: {e}")
+                self._db = None
+    
+    @classmethod
+    def from_env(cls, max_entries: int = DEFAULT_EMBEDDING_CACHE_SIZE) -> "QueryEmbeddingCache":
+        """
+        Create a cache, disk-backed if REPO_SEARCH_QUERY_CACHE names a file.
+        
+        Returns:
+            QueryEmbeddingCache instance
+        """
+        return cls(max_entries, os.environ.get(QUERY_CACHE_ENV) or None)
+    
+    @staticmethod
+    def _key(model_name: str, query: str) -> str:
+        """Cache key of a query for a model."""
+        return hashlib.sha1(f"{model_name}\0{normalize_query(query)}".encode("utf-8")).hexdigest()
+    
+    def get_many(self, model_name: str, queries: List[str]) -> List[np.ndarray]:
+        """
+        Look up the embeddings of several queries.
+        
+        Args:
+            model_name: Name of the model the embeddings were produced with
+            queries: Query texts
+        
+        Returns:
+            List with the cached embedding of each query, or None for misses
+        """
+        keys = [self._key(model_name, q) for q in queries]
+        found = [self.memory.get(k) for k in keys]
+        
+        missing = [i for i, vector in enumerate(found) if vector is None]
+        if missing and self._db is not None:
+            rows = {}
+            try:
+                with self._db_lock:
+                    # Stay under SQLite's limit on bound parameters
+                    for start in range(0, len(missing), 500):
+                        batch = [keys[i] for i in missing[start:start + 500]]
+                        rows.update(self._db.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                            batch
+                        ).fetchall())
+            except sqlite3.Error as e:
+                print(f"Warning: Could not read query cache: {e}")
+                rows = {}
+            
+            for i in missing:
+                blob = rows.get(keys[i])
+                if blob is not None:
+                    found[i] = np.frombuffer(blob, dtype=np.float32)
+                    self.memory.put(keys[i], found[i])
+                    self.disk_hits += 1
+        
+        return found
+    
+    def put_many(self, model_name: str, queries: List[str], embeddings: np.ndarray):
+        """
+        Store the embeddings of several queries.
+        
+        Args:
+            model_name: Name of the model the embeddings were produced with
+            queries: Query texts
+            embeddings: float32 matrix with one row per query
+        """
+        rows = []
+        for query, vector in zip(queries, embeddings):
+            key = self._key(model_name, query)
+            vector = np.array(vector, dtype=np.float32)
+            self.memory.put(key, vector)
+            rows.append((key, vector.tobytes()))
+        
+        if self._db is not None and rows:
+            try:
+                with self._db_lock:
+                    self._db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+                    self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not write query cache: {e}")
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with in-memory 'entries', 'hits', 'misses' and 'disk_hits'
+        """
+        return dict(self.memory.stats(), disk_hits=self.disk_hits)
@@ -0,0 +1,424 @@
+"""
+Repository Index Module
+
+This module builds and persists the FAISS index used to search a repository store:
+- Flat (exact) search for small stores
+- IVF-Flat, IVF-PQ and HNSW approximate indexes for large stores
+- Scalar-quantized (float16 / int8) flat indexes for stores kept at reduced precision
+- L2 or inner-product (cosine, for normalized vectors) search, per the store's metric
+- Trained indexes are saved alongside the store so they are not rebuilt at load
+- Recall@k of an approximate index measured against exact search
+- A benchmark of recall and size of quantized embeddings against float32
+"""
+
+import os
+import json
+import math
+from typing import Dict
+import numpy as np
+import faiss
+
+from repo_store import (
+    RepoStore, is_pickle_store, store_version,
+    EMBEDDING_DTYPES, QUANTIZE_BATCH_ROWS, quantization_params, quantize, dequantize
+)
+
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq_fp16", "sq8")
+
+# Index types that are cheap to rebuild at load, so they are not saved with the store
+UNSAVED_INDEX_TYPES = ("flat", "sq_fp16", "sq8")
+
+# Exact-search index matching each store embedding precision
+FLAT_INDEX_FOR_DTYPE = {"float32": "flat", "float16": "sq_fp16", "int8": "sq8"}
+
+# Store metrics: 'l2' searches raw vectors by Euclidean distance, 'cosine' searches
+# vectors normalized at embed time by inner product
+METRICS = ("l2", "cosine")
+FAISS_METRICS = {"l2": faiss.METRIC_L2, "cosine": faiss.METRIC_INNER_PRODUCT}
+
+INDEX_FILE = "index.faiss"
+INDEX_META_FILE = "index.json"
+
+# Store sizes (in vectors) above which auto selection moves to the next index type
+FLAT_MAX_VECTORS = 20000
+HNSW_MAX_VECTORS = 200000
+IVF_FLAT_MAX_VECTORS = 2000000
+
+# Build and search parameters
+HNSW_NEIGHBORS = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+PQ_BITS = 8
+TRAINING_SAMPLES_PER_LIST = 64
+ADD_BATCH_SIZE = 65536
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scale vectors to unit length, as stored by 'cosine' stores.
+    
+    Args:
+        vectors: float32 vector or matrix (one vector per row)
+    
+    Returns:
+        float32 array of the same shape; zero vectors are left as they are
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def choose_index_type(num_vectors: int, embedding_dtype: str = "float32") -> str:
+    """
+    Pick an index type for a store of the given size.
+    
+    Small stores are searched exhaustively; quantized stores are searched on
+    their quantized form so the index is as compact as the store.
+    
+    Args:
+        num_vectors: Number of vectors in the store
+        embedding_dtype: Storage precision of the store's embeddings
+    
+    Returns:
+        One of INDEX_TYPES
+    """
+    if num_vectors <= FLAT_MAX_VECTORS:
+        return FLAT_INDEX_FOR_DTYPE.get(embedding_dtype, "flat")
+    if num_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    if num_vectors <= IVF_FLAT_MAX_VECTORS:
+        return "ivf_flat"
+    return "ivf_pq"
+
+
+def _ivf_lists(num_vectors: int) -> int:
+    """Number of IVF lists: about 4 * sqrt(n), with enough training points per list."""
+    nlist = int(4 * math.sqrt(num_vectors))
+    return max(1, min(nlist, num_vectors // 39))
+
+
+def _pq_subquantizers(dimension: int) -> int:
+    """Largest divisor of the dimension giving at least 4 dimensions per sub-quantizer."""
+    for m in range(dimension // 4, 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+def _training_sample(embeddings: np.ndarray, size: int) -> np.ndarray:
+    """Random subset of rows used to train IVF/PQ quantizers."""
+    if embeddings.shape[0] <= size:
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(0).choice(embeddings.shape[0], size, replace=False))
+    return np.ascontiguousarray(embeddings[rows], dtype=np.float32)
+
+
+def build_index(embeddings: np.ndarray, index_type: str = "auto", embedding_dtype: str = "float32",
+                metric: str = "l2") -> faiss.Index:
+    """
+    Build a FAISS index over a store's embeddings.
+    
+    Args:
+        embeddings: Embedding matrix (may be memory-mapped or quantized), one row per chunk
+        index_type: One of INDEX_TYPES, or 'auto' to choose by store size
+        embedding_dtype: Storage precision of the embeddings, used by 'auto'
+        metric: Store metric, one of METRICS
+    
+    Returns:
+        Trained FAISS index containing all embeddings
+    """
+    num_vectors, dimension = embeddings.shape
+    
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(METRICS)})")
+    faiss_metric = FAISS_METRICS[metric]
+    
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors, embedding_dtype)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {', '.join(INDEX_TYPES)})")
+    
+    # IVF/PQ quantizers need enough points per centroid to train; tiny stores stay exact
+    min_vectors = {"ivf_flat": 39 * 16, "ivf_pq": 39 * 2 ** PQ_BITS}.get(index_type, 0)
+    if num_vectors < min_vectors:
+        print(f"Store too small to train {index_type} ({num_vectors} vectors), using flat index")
+        index_type = "flat"
+    
+    if index_type == "flat":
+        index = faiss.IndexFlat(dimension, faiss_metric)
+    elif index_type in ("sq_fp16", "sq8"):
+        qtype = faiss.ScalarQuantizer.QT_fp16 if index_type == "sq_fp16" else faiss.ScalarQuantizer.QT_8bit
+        index = faiss.IndexScalarQuantizer(dimension, qtype, faiss_metric)
+        if index_type == "sq8":
+            # Per-dimension ranges, like the int8 store quantization
+            index.train(_training_sample(embeddings, 65536))
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_NEIGHBORS, faiss_metric)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        nlist = _ivf_lists(num_vectors)
+        quantizer = faiss.IndexFlat(dimension, faiss_metric)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, _pq_subquantizers(dimension), PQ_BITS, faiss_metric)
+        
+        print(f"Training {index_type} index ({nlist} lists)...")
+        sample_size = max(nlist * TRAINING_SAMPLES_PER_LIST, 2 ** PQ_BITS * 39)
+        index.train(_training_sample(embeddings, sample_size))
+        index.nprobe = max(1, nlist // 16)
+    
+    # Add in batches so memory-mapped embeddings are never copied in full
+    for start in range(0, num_vectors, ADD_BATCH_SIZE):
+        index.add(np.ascontiguousarray(embeddings[start:start + ADD_BATCH_SIZE], dtype=np.float32))
+    
+    return index
+
+
+def get_index_type(index: faiss.Index) -> str:
+    """
+    Get the INDEX_TYPES name of an index.
+    
+    Args:
+        index: FAISS index built by build_index() or loaded by load_index()
+    
+    Returns:
+        Index type name
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "sq_fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "sq8"
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def get_index_metric(index: faiss.Index) -> str:
+    """
+    Get the METRICS name of an index's metric.
+    
+    Args:
+        index: FAISS index
+    
+    Returns:
+        'cosine' for inner-product indexes, otherwise 'l2'
+    """
+    return "cosine" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+
+
+def _index_paths(store_path: str):
+    """Paths of the serialized index and its metadata for a store."""
+    if is_pickle_store(store_path):
+        return store_path + ".faiss", store_path + ".faiss.json"
+    return os.path.join(store_path, INDEX_FILE), os.path.join(store_path, INDEX_META_FILE)
+
+
+def save_index(index: faiss.Index, store_path: str):
+    """
+    Serialize an index next to its store.
+    
+    Args:
+        index: FAISS index built over the store's embeddings
+        store_path: Store directory (or legacy pickle file)
+    """
+    index_file, meta_file = _index_paths(store_path)
+    
+    faiss.write_index(index, index_file + ".tmp")
+    os.replace(index_file + ".tmp", index_file)
+    
+    meta = {
+        "type": get_index_type(index),
+        "metric": get_index_metric(index),
+        "num_vectors": int(index.ntotal),
+        "store_version": store_version(store_path)
+    }
+    with open(meta_file + ".tmp", 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_file + ".tmp", meta_file)
+    
+    print(f"Saved {meta['type']} index with {index.ntotal} vectors to {index_file}")
+
+
+def load_index(store: RepoStore) -> faiss.Index:
+    """
+    Load the serialized index of a store if it is present and up to date.
+    
+    Args:
+        store: Opened repository store
+    
+    Returns:
+        FAISS index, or None if there is no usable serialized index
+    """
+    index_file, meta_file = _index_paths(store.path)
+    if not os.path.exists(index_file) or not os.path.exists(meta_file):
+        return None
+    
+    try:
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        
+        # An index built for an older version of the store is stale
+        if meta.get("store_version") != store.version or meta.get("num_vectors") != len(store.chunks):
+            print(f"Serialized index at {index_file} is stale, ignoring it")
+            return None
+        
+        index = faiss.read_index(index_file)
+        if get_index_metric(index) != store.metric:
+            print(f"Serialized index at {index_file} uses a different metric than the store, ignoring it")
+            return None
+    except Exception as e:
+        print(f"Warning: Could not load serialized index {index_file}: {e}")
+        return None
+    
+    return index
+
+
+def measure_recall(index: faiss.Index, embeddings: np.ndarray, queries: np.ndarray, k: int = 10) -> float:
+    """
+    Measure recall@k of an index against exact (flat) search.
+    
+    Exact search uses L2, which ranks normalized vectors the same way as
+    inner product, so this serves indexes of either metric.
+    
+    Args:
+        index: Index to evaluate
+        embeddings: The embeddings the index was built over
+        queries: Query vectors, shape [num_queries, dim]
+        k: Number of neighbours compared
+    
+    Returns:
+        Mean fraction of the exact top-k found by the index
+    """
+    k = min(k, embeddings.shape[0])
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    
+    exact = faiss.IndexFlatL2(embeddings.shape[1])
+    for start in range(0, embeddings.shape[0], ADD_BATCH_SIZE):
+        exact.add(np.ascontiguousarray(embeddings[start:start + ADD_BATCH_SIZE], dtype=np.float32))
+    
+    _, expected = exact.search(queries, k)
+    _, found = index.search(queries, k)
+    
+    hits = sum(len(set(e) & set(f)) for e, f in zip(expected.tolist(), found.tolist()))
+    return hits / float(k * len(queries))
+
+
+def sample_queries(embeddings: np.ndarray, num_queries: int = 200, noise: float = 0.01) -> np.ndarray:
+    """
+    Make recall test queries from stored vectors with a little noise added.
+    
+    Args:
+        embeddings: Store embeddings
+        num_queries: Number of queries to sample
+        noise: Standard deviation of the noise, relative to the mean vector norm
+    
+    Returns:
+        Query matrix of shape [num_queries, dim]
+    """
+    queries = _training_sample(embeddings, num_queries).copy()
+    scale = noise * float(np.linalg.norm(queries, axis=1).mean() or 1.0)
+    queries += np.random.default_rng(1).normal(0, scale, queries.shape).astype(np.float32)
+    return queries
+
+
+def build_store_index(store_path: str, index_type: str = "auto", report_recall: bool = True) -> Dict:
+    """
+    Build, report on and save the index for a store.
+    
+    Flat (and scalar-quantized flat) indexes are not saved: they are rebuilt
+    from the embeddings at load, which costs next to no training and avoids
+    duplicating the vectors on disk.
+    
+    Args:
+        store_path: Store directory (or legacy pickle file)
+        index_type: One of INDEX_TYPES, or 'auto'
+        report_recall: If True, measure recall@10 against exact search
+    
+    Returns:
+        Dictionary with 'type', 'metric', 'num_vectors' and (optionally) 'recall_at_10'
+    """
+    store = RepoStore.open(store_path)
+    index = build_index(store.embeddings, index_type, store.embedding_dtype, store.metric)
+    
+    report = {"type": get_index_type(index), "metric": store.metric, "num_vectors": int(index.ntotal)}
+    
+    if report_recall and report["type"] != "flat" and index.ntotal > 0:
+        report["recall_at_10"] = measure_recall(index, store.embeddings, sample_queries(store.embeddings), k=10)
+        print(f"Recall@10 vs. flat index: {report['recall_at_10']:.3f}")
+    
+    if report["type"] not in UNSAVED_INDEX_TYPES:
+        save_index(index, store_path)
+    
+    return report
+
+
+def benchmark_quantization(store_path: str, k: int = 10, num_queries: int = 200) -> Dict[str, Dict]:
+    """
+    Measure what storing a store's embeddings at lower precision costs in recall.
+    
+    For every precision in EMBEDDING_DTYPES this reports the bytes per vector,
+    recall@k of exact search over the round-tripped (quantized and dequantized)
+    vectors, and recall@k of the matching scalar-quantizer index, both against
+    exact float32 search.
+    
+    Args:
+        store_path: Store directory (or legacy pickle file); float32 stores give the true baseline
+        k: Number of neighbours compared
+        num_queries: Number of sampled queries
+    
+    Returns:
+        Mapping of precision to 'bytes_per_vector', 'recall_store' and 'recall_index'
+    """
+    store = RepoStore.open(store_path)
+    embeddings = store.embeddings
+    num_vectors, dimension = embeddings.shape
+    queries = sample_queries(embeddings, num_queries)
+    
+    report = {}
+    for dtype in EMBEDDING_DTYPES:
+        params = quantization_params(embeddings) if dtype == "int8" else None
+        
+        # Exact search over the vectors as a store of this precision would return them
+        round_trip = faiss.IndexFlatL2(dimension)
+        for start in range(0, num_vectors, QUANTIZE_BATCH_ROWS):
+            batch = np.asarray(embeddings[start:start + QUANTIZE_BATCH_ROWS], dtype=np.float32)
+            round_trip.add(np.ascontiguousarray(dequantize(quantize(batch, dtype, params), dtype, params)))
+        
+        index_type = FLAT_INDEX_FOR_DTYPE[dtype]
+        index = build_index(embeddings, index_type, metric=store.metric)
+        
+        report[dtype] = {
+            "bytes_per_vector": dimension * np.dtype(dtype).itemsize,
+            "recall_store": measure_recall(round_trip, embeddings, queries, k),
+            "recall_index": measure_recall(index, embeddings, queries, k)
+        }
+        print(
+            f"{dtype:>8}: {report[dtype]['bytes_per_vector']} bytes/vector, "
+            f"recall@{k} {report[dtype]['recall_store']:.3f} (stored), "
+            f"{report[dtype]['recall_index']:.3f} ({index_type} index)"
+        )
+    
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build the search index for a repository store")
+    parser.add_argument("store", help="Store directory (or legacy pickle file)")
+    parser.add_argument("--type", default="auto", choices=("auto",) + INDEX_TYPES)
+    parser.add_argument("--no-recall", action="store_true", help="Skip the recall@10 measurement")
+    parser.add_argument("--benchmark-quantization", action="store_true",
+                        help="Report recall@10 of float16/int8 embeddings against float32 instead of building")
+    args = parser.parse_args()
+    
+    if args.benchmark_quantization:
+        print(json.dumps(benchmark_quantization(args.store), indent=2))
+    else:
+        print(json.dumps(build_store_index(args.store, args.type, not args.no_recall), indent=2))
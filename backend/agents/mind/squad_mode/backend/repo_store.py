@@ -0,0 +1,825 @@
+"""
+Repository Store Module
+
+This module defines the on-disk layout of a repository store and provides:
+- RepoStore: read access to a store, with embeddings and file content
+  memory-mapped, so content is only read for the files that are returned
+- RepoStoreWriter: writes a store directory and swaps it into place atomically
+- Conversion of legacy pickle stores to the directory layout
+
+A store directory contains:
+- meta.json:      format version, model/chunk settings and per-file metadata
+- files.npy:      int64 [num_files, 2] byte offset and length of each file in content.bin
+- chunks.npy:     int64 [num_chunks, 5] file index, start/end line, start/end char offset
+- embeddings.f32: raw float32 [num_chunks, dim] matrix, one row per chunk
+                  (embeddings.f16 / embeddings.i8 in float16 or int8 quantized stores)
+- content.bin:    UTF-8 file contents, concatenated
+- embedding_scales.npy: float32 [2, dim] per-dimension offset and scale (int8 stores only)
+- keywords.npz:   keyword index (see keyword_index.py), written after the store
+
+RepoStore.open() opens every file it will read, so an open store keeps
+reading its own snapshot after RepoStoreWriter swaps a new directory in.
+
+While a store is being written, RepoStoreWriter appends to files.jsonl and
+chunks.i64 in a temporary directory and records checkpoints, so an interrupted
+write can be resumed.
+"""
+
+import os
+import json
+import hashlib
+import mmap
+import pickle
+import shutil
+from typing import List, Dict
+import numpy as np
+
+from path_index import PathIndex
+
+
+STORE_FORMAT_VERSION = 1
+
+META_FILE = "meta.json"
+FILES_FILE = "files.npy"
+CHUNKS_FILE = "chunks.npy"
+EMBEDDINGS_FILE = "embeddings.f32"
+CONTENT_FILE = "content.bin"
+SCALES_FILE = "embedding_scales.npy"
+KEYWORD_INDEX_FILE = "keywords.npz"
+
+# Storage precisions of the embedding matrix and their files
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+EMBEDDING_FILES = {"float32": EMBEDDINGS_FILE, "float16": "embeddings.f16", "int8": "embeddings.i8"}
+
+# Rows processed at a time when quantizing or dequantizing
+QUANTIZE_BATCH_ROWS = 65536
+
+# Append-only logs and checkpoint of a store that is still being written
+FILES_LOG = "files.jsonl"
+CHUNKS_LOG = "chunks.i64"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# Columns of the chunks table
+CHUNK_FILE, CHUNK_START_LINE, CHUNK_END_LINE, CHUNK_START, CHUNK_END = range(5)
+CHUNK_FIELDS = ("file", "start_line", "end_line", "start", "end")
+
+
+def is_pickle_store(path: str) -> bool:
+    """
+    Check whether a store path refers to a legacy pickle store.
+    
+    Args:
+        path: Store path
+    
+    Returns:
+        True if the path is a pickle file rather than a store directory
+    """
+    return not os.path.isdir(path)
+
+
+def store_version(path: str) -> float:
+    """
+    Get a value that changes whenever a store is rewritten.
+    
+    Args:
+        path: Store path (directory or pickle file)
+    
+    Returns:
+        Modification time of the store's metadata (or of the pickle file)
+    """
+    if is_pickle_store(path):
+        return os.path.getmtime(path)
+    return os.path.getmtime(os.path.join(path, META_FILE))
+
+
+def keyword_index_path(store_path: str) -> str:
+    """
+    Get the path of the keyword index saved with a store.
+    
+    Args:
+        store_path: Store directory (or legacy pickle file)
+    
+    Returns:
+        Index file path
+    """
+    if is_pickle_store(store_path):
+        return store_path + ".keywords.npz"
+    return os.path.join(store_path, KEYWORD_INDEX_FILE)
+
+
+def chunks_to_array(chunks: List[Dict[str, int]]) -> np.ndarray:
+    """
+    Convert chunk dictionaries to the compact chunks table.
+    
+    Args:
+        chunks: Chunk dictionaries with 'file', line and character offset keys
+    
+    Returns:
+        int64 array of shape [num_chunks, 5]
+    """
+    table = np.zeros((len(chunks), len(CHUNK_FIELDS)), dtype=np.int64)
+    for i, chunk in enumerate(chunks):
+        table[i] = [chunk[field] for field in CHUNK_FIELDS]
+    return table
+
+
+def quantization_params(embeddings: np.ndarray, base: np.ndarray = None) -> np.ndarray:
+    """
+    Compute per-dimension int8 quantization parameters.
+    
+    Each dimension's [min, max] range is mapped onto the 256 int8 levels.
+    
+    Args:
+        embeddings: float32 matrix (may be memory-mapped; read in batches)
+        base: Optional parameters the embeddings were partly quantized with
+            before (e.g. by a previous store). Dimensions whose base range
+            still covers every row keep the base parameters, so requantizing
+            those rows gives back the same codes; the others are widened.
+    
+    Returns:
+        float32 array of shape [2, dim]: offset (per-dimension minimum) and scale
+    """
+    dimension = embeddings.shape[1]
+    low = np.full(dimension, np.inf, dtype=np.float32)
+    high = np.full(dimension, -np.inf, dtype=np.float32)
+    for start in range(0, embeddings.shape[0], QUANTIZE_BATCH_ROWS):
+        batch = np.asarray(embeddings[start:start + QUANTIZE_BATCH_ROWS], dtype=np.float32)
+        low = np.minimum(low, batch.min(axis=0))
+        high = np.maximum(high, batch.max(axis=0))
+    
+    if embeddings.shape[0] == 0:
+        if base is not None:
+            return np.array(base, dtype=np.float32)
+        low[:] = 0
+        high[:] = 0
+    
+    keep = None
+    if base is not None:
+        # Constant dimensions are stored with scale 1.0 (below); their range is the single offset value
+        base_low = base[0]
+        base_high = np.where(base[1] == 1.0, base[0], base[0] + 255.0 * base[1])
+        keep = (low >= base_low) & (high <= base_high)
+        low = np.minimum(low, base_low)
+        high = np.maximum(high, base_high)
+    
+    scale = (high - low) / 255.0
+    scale[scale == 0] = 1.0
+    params = np.stack([low, scale]).astype(np.float32)
+    if keep is not None:
+        params[:, keep] = base[:, keep]
+    return params
+
+
+def quantize(embeddings: np.ndarray, dtype: str, params: np.ndarray = None) -> np.ndarray:
+    """
+    Convert float32 embeddings to a storage precision.
+    
+    Args:
+        embeddings: float32 rows
+        dtype: One of EMBEDDING_DTYPES
+        params: Parameters from quantization_params() (int8 only)
+    
+    Returns:
+        Array of the storage dtype
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if dtype == "float32":
+        return embeddings
+    if dtype == "float16":
+        return embeddings.astype(np.float16)
+    levels = np.rint((embeddings - params[0]) / params[1]) - 128
+    return np.clip(levels, -128, 127).astype(np.int8)
+
+
+def dequantize(stored: np.ndarray, dtype: str, params: np.ndarray = None) -> np.ndarray:
+    """
+    Convert stored embeddings back to float32.
+    
+    Args:
+        stored: Rows as stored
+        dtype: One of EMBEDDING_DTYPES
+        params: Parameters from quantization_params() (int8 only)
+    
+    Returns:
+        float32 array
+    """
+    if dtype == "int8":
+        return (stored.astype(np.float32) + 128) * params[1] + params[0]
+    return np.asarray(stored, dtype=np.float32)
+
+
+class QuantizedEmbeddings:
+    """
+    Read-only float32 view of a quantized embedding matrix.
+    
+    Indexing dequantizes only the selected rows, so consumers that read the
+    matrix in slices (index building, incremental reuse) never hold a full
+    float32 copy.
+    """
+    
+    def __init__(self, stored: np.ndarray, dtype: str, params: np.ndarray = None):
+        """
+        Args:
+            stored: Stored (memory-mapped) matrix
+            dtype: Storage precision, one of EMBEDDING_DTYPES
+            params: Parameters from quantization_params() (int8 only)
+        """
+        self.stored = stored
+        self.storage_dtype = dtype
+        self.params = params
+        self.shape = stored.shape
+        self.ndim = 2
+        self.dtype = np.dtype(np.float32)
+    
+    def __len__(self) -> int:
+        return self.shape[0]
+    
+    def __getitem__(self, key) -> np.ndarray:
+        return dequantize(self.stored[key], self.storage_dtype, self.params)
+    
+    def __array__(self, dtype=None, copy=None):
+        matrix = np.empty(self.shape, dtype=np.float32)
+        for start in range(0, self.shape[0], QUANTIZE_BATCH_ROWS):
+            matrix[start:start + QUANTIZE_BATCH_ROWS] = self[start:start + QUANTIZE_BATCH_ROWS]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+
+class RepoStore:
+    """
+    Read access to a repository store.
+    
+    Directory stores memory-map the embeddings and file content; legacy pickle
+    stores are loaded fully into memory and exposed the same way. Everything
+    is opened by open(), so a store rewritten on disk afterwards is never
+    mixed into an open one.
+    """
+    
+    def __init__(self, path: str, meta: Dict, files: List[Dict], chunks: np.ndarray,
+                 embeddings: np.ndarray, contents: List[str] = None, content_offsets: np.ndarray = None,
+                 content_map: mmap.mmap = None, version: float = None, keyword_index_file=None):
+        """
+        Initialize from already loaded parts. Use RepoStore.open() instead.
+        
+        Args:
+            path: Store path
+            meta: Store-level metadata (model, chunk settings, ...)
+            files: Per-file metadata dictionaries ('path', 'sha256', 'mtime', 'size')
+            chunks: Chunks table from chunks_to_array()
+            embeddings: Embedding matrix, one row per chunk
+            contents: In-memory file contents (pickle stores only)
+            content_offsets: Byte offset/length of each file in content.bin (directory stores only)
+            content_map: Memory map of content.bin (directory stores only; None if it is empty)
+            version: store_version() of the snapshot that was opened
+            keyword_index_file: Open binary file of the saved keyword index, if there was one
+        """
+        self.path = path
+        self.meta = meta
+        self.files = files
+        self.chunks = chunks
+        self.embeddings = embeddings
+        self._contents = contents
+        self._content_offsets = content_offsets
+        self._content_map = content_map
+        self.version = version
+        self.keyword_index_file = keyword_index_file
+        self.path_index = PathIndex([f["path"] for f in files])
+        
+        if len(self.chunks) != self.embeddings.shape[0]:
+            raise ValueError(
+                f"Mismatch: {len(self.chunks)} chunks but {self.embeddings.shape[0]} embeddings"
+            )
+    
+    @classmethod
+    def open(cls, path: str) -> "RepoStore":
+        """
+        Open a repository store.
+        
+        Args:
+            path: Store directory, or a legacy pickle file
+        
+        Returns:
+            RepoStore instance
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Repository store file not found: {path}")
+        
+        try:
+            if is_pickle_store(path):
+                return cls._open_pickle(path)
+            return cls._open_directory(path)
+        except (FileNotFoundError, ValueError):
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Failed to load repository store: {e}")
+    
+    @classmethod
+    def _open_directory(cls, path: str) -> "RepoStore":
+        # Files are opened relative to a handle on the directory: RepoStoreWriter.commit()
+        # renames directories, so this reads one snapshot even if a new one is swapped in meanwhile
+        dir_fd = os.open(path, os.O_RDONLY)
+        
+        def open_file(name):
+            return open(name, 'rb', opener=lambda name, flags: os.open(name, flags, dir_fd=dir_fd))
+        
+        try:
+            with open_file(META_FILE) as f:
+                version = os.fstat(f.fileno()).st_mtime
+                meta = json.load(f)
+            
+            if meta.get("version") != STORE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported store format version: {meta.get('version')}")
+            
+            files = meta.pop("files")
+            with open_file(FILES_FILE) as f:
+                content_offsets = np.load(f)
+            with open_file(CHUNKS_FILE) as f:
+                chunks = np.load(f)
+            
+            num_chunks, dimension = meta["num_chunks"], meta["dim"]
+            embedding_dtype = meta.get("embedding_dtype", "float32")
+            if embedding_dtype not in EMBEDDING_DTYPES:
+                raise ValueError(f"Unsupported embedding dtype: {embedding_dtype}")
+            
+            if num_chunks:
+                with open_file(EMBEDDING_FILES[embedding_dtype]) as f:
+                    embeddings = np.memmap(f, dtype=np.dtype(embedding_dtype), mode='r', shape=(num_chunks, dimension))
+            else:
+                # np.memmap cannot map an empty file
+                embeddings = np.zeros((0, dimension), dtype=np.dtype(embedding_dtype))
+            
+            if embedding_dtype != "float32":
+                params = None
+                if embedding_dtype == "int8":
+                    with open_file(SCALES_FILE) as f:
+                        params = np.load(f)
+                embeddings = QuantizedEmbeddings(embeddings, embedding_dtype, params)
+            
+            content_map = None
+            with open_file(CONTENT_FILE) as f:
+                if os.fstat(f.fileno()).st_size:
+                    content_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            
+            # The keyword index is written after the store is committed and may not exist yet
+            try:
+                keyword_index_file = open_file(KEYWORD_INDEX_FILE)
+            except FileNotFoundError:
+                keyword_index_file = None
+        finally:
+            os.close(dir_fd)
+        
+        return cls(path, meta, files, chunks, embeddings, content_offsets=content_offsets,
+                   content_map=content_map, version=version, keyword_index_file=keyword_index_file)
+    
+    @classmethod
+    def _open_pickle(cls, path: str) -> "RepoStore":
+        with open(path, 'rb') as f:
+            version = os.fstat(f.fileno()).st_mtime
+            data = pickle.load(f)
+        
+        raw_files = data["files"]
+        contents = [f["content"] for f in raw_files]
+        files = [{k: v for k, v in f.items() if k != "content"} for f in raw_files]
+        
+        # Stores written before chunking have exactly one embedding per file
+        chunk_dicts = data.get("chunks")
+        if chunk_dicts is None:
+            chunk_dicts = [
+                {
+                    "file": i,
+                    "start_line": 1,
+                    "end_line": max(1, content.count("\n") + 1),
+                    "start": 0,
+                    "end": len(content)
+                }
+                for i, content in enumerate(contents)
+            ]
+        
+        meta = {k: v for k, v in data.items() if k not in ("files", "chunks", "embeddings")}
+        meta["dim"] = data["embeddings"].shape[1]
+        
+        try:
+            keyword_index_file = open(keyword_index_path(path), 'rb')
+        except FileNotFoundError:
+            keyword_index_file = None
+        
+        return cls(path, meta, files, chunks_to_array(chunk_dicts),
+                   data["embeddings"].astype(np.float32, copy=False), contents=contents,
+                   version=version, keyword_index_file=keyword_index_file)
+    
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension."""
+        return self.embeddings.shape[1]
+    
+    @property
+    def metric(self) -> str:
+        """Distance metric the store's vectors are searched with ('l2', or 'cosine' for normalized vectors)."""
+        return self.meta.get("metric", "l2")
+    
+    @property
+    def embedding_dtype(self) -> str:
+        """Storage precision of the embeddings, one of EMBEDDING_DTYPES."""
+        return self.meta.get("embedding_dtype", "float32")
+    
+    def get_content(self, file_idx: int) -> str:
+        """
+        Read the content of one file.
+        
+        Args:
+            file_idx: Index of the file in the store
+        
+        Returns:
+            File content
+        """
+        if self._contents is not None:
+            return self._contents[file_idx]
+        
+        offset, length = (int(v) for v in self._content_offsets[file_idx])
+        if length == 0:
+            return ""
+        return self._content_map[offset:offset + length].decode('utf-8', errors='replace')
+    
+    def get_file_sha256(self, file_idx: int) -> str:
+        """
+        Get the content hash of one file, computing it for stores that predate hashing.
+        
+        Args:
+            file_idx: Index of the file in the store
+        
+        Returns:
+            Hex SHA-256 digest of the file content
+        """
+        sha = self.files[file_idx].get("sha256")
+        if sha is None:
+            sha = hashlib.sha256(self.get_content(file_idx).encode('utf-8', errors='replace')).hexdigest()
+        return sha
+    
+    def close(self):
+        """Release the memory-mapped content file and the keyword index file."""
+        if self._content_map is not None:
+            self._content_map.close()
+            self._content_map = None
+        if self.keyword_index_file is not None:
+            self.keyword_index_file.close()
+            self.keyword_index_file = None
+
+
+class RepoStoreWriter:
+    """
+    Writes a repository store directory.
+    
+    Everything is written to a temporary sibling directory; commit() moves it
+    over the target so readers only ever see a complete store. Files, chunks
+    and embeddings are appended to disk as they are added, so memory use does
+    not grow with the size of the store, and checkpoint() records a point an
+    interrupted write can be resumed from.
+    """
+    
+    def __init__(self, path: str, metadata: Dict = None, resume: bool = False, embedding_dtype: str = "float32"):
+        """
+        Start writing a store.
+        
+        Args:
+            path: Target store directory
+            metadata: Store-level metadata (model name, chunk settings, ...)
+            resume: If True, continue from the last checkpoint of an interrupted
+                write with the same metadata instead of starting over
+            embedding_dtype: Storage precision of the embeddings, one of EMBEDDING_DTYPES.
+                Embeddings are written as float32 and quantized in commit(), once
+                the per-dimension ranges are known.
+        """
+        if path.endswith(".pkl"):
+            raise ValueError(f"Store path must be a directory, not a pickle file: {path}")
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {embedding_dtype} (expected one of {', '.join(EMBEDDING_DTYPES)})")
+        
+        self.path = os.path.abspath(path)
+        self.tmp_path = self.path + ".tmp"
+        self.metadata = dict(metadata or {})
+        self.metadata["embedding_dtype"] = embedding_dtype
+        
+        self._files = []
+        self._content_offsets = []
+        self._content_size = 0
+        self._num_chunks = 0
+        self._dimension = None
+        
+        checkpoint = self._read_checkpoint() if resume else None
+        if checkpoint is None:
+            if os.path.exists(self.tmp_path):
+                shutil.rmtree(self.tmp_path)
+            os.makedirs(self.tmp_path)
+        
+        self._content = open(os.path.join(self.tmp_path, CONTENT_FILE), 'ab')
+        self._embeddings = open(os.path.join(self.tmp_path, EMBEDDINGS_FILE), 'ab')
+        self._chunks = open(os.path.join(self.tmp_path, CHUNKS_LOG), 'ab')
+        self._files_log = open(os.path.join(self.tmp_path, FILES_LOG), 'ab')
+        
+        if checkpoint is not None:
+            self._restore(checkpoint)
+    
+    def _read_checkpoint(self) -> Dict:
+        """Read the checkpoint of an interrupted write, or None if it cannot be resumed."""
+        try:
+            with open(os.path.join(self.tmp_path, CHECKPOINT_FILE), 'r') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if checkpoint.get("metadata") != self.metadata:
+            print("Found an interrupted write with different settings, starting over")
+            return None
+        return checkpoint
+    
+    def _restore(self, checkpoint: Dict):
+        """Drop anything written after the checkpoint and reload the file list."""
+        for handle, size in ((self._content, "content_size"), (self._embeddings, "embeddings_size"),
+                             (self._chunks, "chunks_size"), (self._files_log, "files_size")):
+            handle.truncate(checkpoint[size])
+            handle.seek(0, os.SEEK_END)
+        
+        with open(os.path.join(self.tmp_path, FILES_LOG), 'r', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                self._content_offsets.append((entry["offset"], entry["length"]))
+                self._files.append(entry["file"])
+        
+        self._content_size = checkpoint["content_size"]
+        self._num_chunks = checkpoint["num_chunks"]
+        self._dimension = checkpoint["dim"]
+        print(f"Resuming interrupted write: {len(self._files)} files, {self._num_chunks} chunks already written")
+    
+    @property
+    def num_files(self) -> int:
+        """Number of files added so far (including ones restored from a checkpoint)."""
+        return len(self._files)
+    
+    @property
+    def num_chunks(self) -> int:
+        """Number of chunks added so far (including ones restored from a checkpoint)."""
+        return self._num_chunks
+    
+    @property
+    def dimension(self) -> int:
+        """Embedding dimension of the chunks added so far, or None if there are none."""
+        return self._dimension
+    
+    @property
+    def written_paths(self) -> List[str]:
+        """Paths of the files added so far, in store order."""
+        return [f["path"] for f in self._files]
+    
+    def add_file(self, file_dict: Dict, content: str) -> int:
+        """
+        Append one file.
+        
+        Args:
+            file_dict: File metadata ('path', 'sha256', 'mtime', 'size'); any 'content' key is ignored
+            content: File content
+        
+        Returns:
+            Index of the file in the store
+        """
+        data = content.encode('utf-8', errors='replace')
+        self._content.write(data)
+        
+        entry = {k: v for k, v in file_dict.items() if k != "content"}
+        self._files_log.write((json.dumps({
+            "file": entry,
+            "offset": self._content_size,
+            "length": len(data)
+        }) + "\n").encode('utf-8'))
+        
+        self._content_offsets.append((self._content_size, len(data)))
+        self._content_size += len(data)
+        self._files.append(entry)
+        return len(self._files) - 1
+    
+    def add_chunks(self, chunks: np.ndarray, embeddings: np.ndarray):
+        """
+        Append chunks and their embeddings.
+        
+        Args:
+            chunks: Chunks table rows (see chunks_to_array()) referencing added files
+            embeddings: Matrix with one row per chunk
+        """
+        if len(chunks) != embeddings.shape[0]:
+            raise ValueError(f"Mismatch: {len(chunks)} chunks but {embeddings.shape[0]} embeddings")
+        if len(chunks) == 0:
+            return
+        
+        if self._dimension is None:
+            self._dimension = embeddings.shape[1]
+        elif embeddings.shape[1] != self._dimension:
+            raise ValueError(f"Embedding dimension changed from {self._dimension} to {embeddings.shape[1]}")
+        
+        self._embeddings.write(np.ascontiguousarray(embeddings, dtype=np.float32).tobytes())
+        self._chunks.write(np.ascontiguousarray(chunks, dtype=np.int64).reshape(-1, len(CHUNK_FIELDS)).tobytes())
+        self._num_chunks += len(chunks)
+    
+    def checkpoint(self):
+        """
+        Make everything added so far durable and record it as a resume point.
+        
+        Callers should only checkpoint when every added file has all of its
+        chunks added, since a resumed write skips the files it already has.
+        """
+        sizes = {}
+        for handle, size in ((self._content, "content_size"), (self._embeddings, "embeddings_size"),
+                             (self._chunks, "chunks_size"), (self._files_log, "files_size")):
+            handle.flush()
+            os.fsync(handle.fileno())
+            sizes[size] = handle.tell()
+        
+        checkpoint = dict(sizes, metadata=self.metadata, num_chunks=self._num_chunks, dim=self._dimension)
+        checkpoint_file = os.path.join(self.tmp_path, CHECKPOINT_FILE)
+        with open(checkpoint_file + ".tmp", 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(checkpoint_file + ".tmp", checkpoint_file)
+    
+    def _close(self):
+        """Close the append handles."""
+        for handle in (self._content, self._embeddings, self._chunks, self._files_log):
+            handle.close()
+    
+    def commit(self, dimension: int = None, base_params: np.ndarray = None):
+        """
+        Finish the store and move it into place.
+        
+        Args:
+            dimension: Embedding dimension, only needed if no chunks were added
+            base_params: Quantization parameters of the int8 store that added
+                embeddings were taken from, so they are stored with the same
+                codes again (see quantization_params())
+        """
+        self._close()
+        
+        chunks_log = os.path.join(self.tmp_path, CHUNKS_LOG)
+        chunks = np.fromfile(chunks_log, dtype=np.int64).reshape(-1, len(CHUNK_FIELDS))
+        offsets = np.array(self._content_offsets, dtype=np.int64).reshape(-1, 2)
+        np.save(os.path.join(self.tmp_path, CHUNKS_FILE), chunks)
+        np.save(os.path.join(self.tmp_path, FILES_FILE), offsets)
+        
+        embedding_dtype = self.metadata["embedding_dtype"]
+        if embedding_dtype != "float32":
+            self._quantize_embeddings(embedding_dtype, base_params)
+        
+        meta = dict(self.metadata)
+        meta.update({
+            "version": STORE_FORMAT_VERSION,
+            "dim": self._dimension or dimension or 0,
+            "num_files": len(self._files),
+            "num_chunks": self._num_chunks,
+            "files": self._files
+        })
+        with open(os.path.join(self.tmp_path, META_FILE), 'w') as f:
+            json.dump(meta, f)
+        
+        for name in (CHUNKS_LOG, FILES_LOG, CHECKPOINT_FILE):
+            path = os.path.join(self.tmp_path, name)
+            if os.path.exists(path):
+                os.remove(path)
+        
+        # Swap directories; the old store is removed only after the new one is in place
+        old_path = self.path + ".old"
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        if os.path.exists(self.path):
+            os.rename(self.path, old_path)
+        os.rename(self.tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    
+    def _quantize_embeddings(self, dtype: str, base_params: np.ndarray = None):
+        """Rewrite the float32 embeddings file at a lower precision, a batch of rows at a time."""
+        source = os.path.join(self.tmp_path, EMBEDDINGS_FILE)
+        dimension = self._dimension or 0
+        
+        if self._num_chunks and dimension:
+            embeddings = np.memmap(source, dtype=np.float32, mode='r', shape=(self._num_chunks, dimension))
+        else:
+            embeddings = np.zeros((0, dimension), dtype=np.float32)
+        
+        params = None
+        if dtype == "int8":
+            params = quantization_params(embeddings, base_params)
+            np.save(os.path.join(self.tmp_path, SCALES_FILE), params)
+        
+        with open(os.path.join(self.tmp_path, EMBEDDING_FILES[dtype]), 'wb') as f:
+            for start in range(0, embeddings.shape[0], QUANTIZE_BATCH_ROWS):
+                f.write(quantize(embeddings[start:start + QUANTIZE_BATCH_ROWS], dtype, params).tobytes())
+        
+        del embeddings
+        os.remove(source)
+    
+    def close(self):
+        """Stop writing but keep the temporary directory so the write can be resumed."""
+        self._close()
+    
+    def abort(self):
+        """Discard everything written so far."""
+        self._close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def save_store(files: List[Dict], chunks: List[Dict], embeddings: np.ndarray, out_dir: str, metadata: Dict = None):
+    """
+    Write a complete store directory in one go.
+    
+    Args:
+        files: File dictionaries with 'path' and 'content' keys (plus optional hash/mtime/size)
+        chunks: Chunk dictionaries with 'file', line and character offset keys
+        embeddings: Matrix with one row per chunk
+        out_dir: Target store directory
+        metadata: Store-level metadata
+    """
+    writer = RepoStoreWriter(out_dir, metadata)
+    try:
+        for file_dict in files:
+            writer.add_file(file_dict, file_dict["content"])
+        writer.add_chunks(chunks_to_array(chunks), embeddings)
+        writer.commit(dimension=embeddings.shape[1])
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def convert_pickle_store(pkl_file: str, out_dir: str):
+    """
+    Convert a legacy pickle store to a store directory.
+    
+    Args:
+        pkl_file: Path to the pickle store
+        out_dir: Target store directory
+    """
+    store = RepoStore.open(pkl_file)
+    
+    writer = RepoStoreWriter(out_dir, store.meta)
+    try:
+        for i, file_dict in enumerate(store.files):
+            writer.add_file(file_dict, store.get_content(i))
+        writer.add_chunks(store.chunks, store.embeddings)
+        writer.commit(dimension=store.dimension)
+    except BaseException:
+        writer.abort()
+        raise
+    
+    print(f"Converted {pkl_file} ({len(store.files)} files, {len(store.chunks)} chunks) to {out_dir}")
+
+
+def quantize_store(store_path: str, out_dir: str, embedding_dtype: str):
+    """
+    Copy a store with its embeddings stored at another precision.
+    
+    Args:
+        store_path: Source store directory (or legacy pickle file)
+        out_dir: Target store directory (may be the source directory itself)
+        embedding_dtype: Target precision, one of EMBEDDING_DTYPES
+    """
+    store = RepoStore.open(store_path)
+    metadata = {k: v for k, v in store.meta.items() if k not in ("dim", "num_files", "num_chunks", "embedding_dtype")}
+    
+    writer = RepoStoreWriter(out_dir, metadata, embedding_dtype=embedding_dtype)
+    try:
+        for i, file_dict in enumerate(store.files):
+            writer.add_file(file_dict, store.get_content(i))
+        for start in range(0, len(store.chunks), QUANTIZE_BATCH_ROWS):
+            end = start + QUANTIZE_BATCH_ROWS
+            writer.add_chunks(store.chunks[start:end], store.embeddings[start:end])
+        writer.commit(dimension=store.dimension)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        store.close()
+    
+    print(f"Wrote {out_dir} with {embedding_dtype} embeddings ({len(store.chunks)} chunks)")
+
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) < 3 or sys.argv[1] not in ("convert", "quantize", "info"):
+        print("Usage: python repo_store.py convert <pkl_file> <out_dir>")
+        print("       python repo_store.py quantize <store> <out_dir> <float32|float16|int8>")
+        print("       python repo_store.py info <store>")
+        sys.exit(1)
+    
+    if sys.argv[1] == "quantize":
+        if len(sys.argv) < 5:
+            print("Usage: python repo_store.py quantize <store> <out_dir> <float32|float16|int8>")
+            sys.exit(1)
+        quantize_store(sys.argv[2], sys.argv[3], sys.argv[4])
+    elif sys.argv[1] == "convert":
+        if len(sys.argv) < 4:
+            print("Usage: python repo_store.py convert <pkl_file> <out_dir>")
+            sys.exit(1)
+        convert_pickle_store(sys.argv[2], sys.argv[3])
+    else:
+        store = RepoStore.open(sys.argv[2])
+        print(f"Store: {store.path}")
+        print(f"  - Files: {len(store.files)}")
+        print(f"  - Chunks: {len(store.chunks)}")
+        print(f"  - Embedding dimensions: {store.dimension}")
+        for key, value in store.meta.items():
+            if key not in ("dim", "num_files", "num_chunks"):
+                print(f"  - {key}: {value}")
@@ -4,107 +4,354 @@ Repository Search Engine Module
 This module provides a FAISS-based vector search engine for repository embeddings.
 """
 
-import pickle
+import bisect
 import numpy as np
 from typing import List, Dict
 from sentence_transformers import SentenceTransformer
-import faiss
+
+from repo_store import RepoStore, CHUNK_FILE, CHUNK_START_LINE, CHUNK_END_LINE
+from repo_index import build_index, load_index, get_index_type, normalize_vectors
+from keyword_index import KeywordIndex, build_store_keyword_index, load_store_keyword_index, tokenize
+from query_cache import LRUCache, QueryEmbeddingCache, normalize_query, DEFAULT_RESULT_CACHE_SIZE
+from snippets import chunk_snippet, keyword_snippet
+from model_registry import get_model
+
+
+# How many chunk hits to fetch per requested file before aggregating by file
+CHUNK_CANDIDATES_PER_FILE = 4
+
+# Keyword search score bonuses for a keyword in a file's path / at the end of its path
+PATH_MATCH_SCORE = 10
+PATH_SUFFIX_SCORE = 5
+
+# Keywords with no indexable tokens (e.g. '=>') are found by scanning contents;
+# each file scores one point per match, up to this many
+SUBSTRING_MATCH_CAP = 5
+
+# Combined search: candidates taken from each ranking per requested result
+COMBINED_CANDIDATES_PER_RESULT = 4
+
+# Reciprocal rank fusion constant; larger values flatten the weight of top ranks
+RRF_K = 60
+
+FUSION_METHODS = ("weighted", "rrf")
+
+# Fused candidates re-scored by the reranker, and the text shown to it per file
+RERANK_CANDIDATES = 20
+RERANK_MAX_CHARS = 2000
+
+
+def calibrated_score(distance: float, metric: str) -> float:
+    """
+    Convert a search distance to a relevance score comparable across queries.
+    
+    For 'cosine' stores the score is the cosine similarity (clipped at 0); for
+    'l2' stores it is 1 / (1 + squared distance). Both are in [0, 1], higher is
+    better, and do not depend on the other results of the query, so they can be
+    thresholded directly.
+    
+    Args:
+        distance: Distance as reported in search results
+        metric: Store metric ('cosine' or 'l2')
+    
+    Returns:
+        Score in [0, 1]
+    """
+    if metric == "cosine":
+        return max(0.0, 1.0 - distance)
+    return 1.0 / (1.0 + max(0.0, distance))
 
 
 class RepoSearchEngine:
     """
     A vector search engine for repository code/documentation using FAISS.
     
-    This class loads pre-computed embeddings from a pickle file and provides
-    semantic search functionality over the repository files.
+    This class opens a repository store (see repo_store.py) and provides
+    semantic search functionality over the repository files. File content is
+    read from the store only for the files that are returned, and results carry
+    a snippet of the matching lines; the full content is added on request or
+    fetched later by path.
     """
     
-    def __init__(self, pkl_file: str = "repo_store.pkl", model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, store_path: str = "repo_store", model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 model: SentenceTransformer = None, index_type: str = "auto",
+                 query_cache: QueryEmbeddingCache = None, result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+                 reranker=None):
         """
         Initialize the search engine by loading embeddings and building FAISS index.
         
         Args:
-            pkl_file: Path to the pickle file containing files and embeddings
+            store_path: Path to the store directory (or a legacy pickle file)
             model_name: Name of the sentence-transformers model (must match the one used for embedding)
+            model: Optional already-loaded model (by default the model_registry one is used)
+            index_type: FAISS index to use ('flat', 'ivf_flat', 'ivf_pq', 'hnsw', 'sq_fp16', 'sq8'), or 'auto'
+                to use the index saved with the store or pick one by store size
+            query_cache: Optional query embedding cache to share between several engines
+                (by default one is created, disk-backed if REPO_SEARCH_QUERY_CACHE is set)
+            result_cache_size: Number of search results kept per engine (0 disables)
+            reranker: Optional cross-encoder (e.g. sentence_transformers.CrossEncoder) used by
+                search_combined(rerank=True); anything with a predict(pairs) method works
+        """
+        print(f"Loading repository store from {store_path}...")
+        
+        self.store = RepoStore.open(store_path)
+        # Cached results are keyed to the snapshot that was opened
+        self.version = self.store.version
+        self.embeddings = self.store.embeddings
+        self.chunks = self.store.chunks
+        self.metric = self.store.metric
+        
+        print(
+            f"Loaded {len(self.store.files)} files ({len(self.chunks)} chunks) "
+            f"with embeddings of dimension {self.store.dimension}"
+        )
+        
+        # The embedding model for query encoding is loaded once per process and shared
+        if model is None:
+            model = get_model(model_name)
+        self.model = model
+        self.model_name = model_name
+        self.reranker = reranker
+        
+        # Query embeddings are cached per model; results per store version
+        self.query_cache = query_cache if query_cache is not None else QueryEmbeddingCache.from_env()
+        self.result_cache = LRUCache(result_cache_size)
+        
+        # Use the index saved with the store if there is one, otherwise build it
+        self.index = load_index(self.store)
+        if self.index is not None and index_type not in ("auto", get_index_type(self.index)):
+            self.index = None
+        
+        if self.index is None:
+            print("Building FAISS index...")
+            self.index = build_index(self.embeddings, index_type, self.store.embedding_dtype, self.metric)
+        
+        print(f"FAISS {get_index_type(self.index)} index ({self.metric}) ready with {self.index.ntotal} vectors")
+        
+        # Keyword index and path lookup blob, loaded on the first keyword search
+        self._keyword_index = None
+        self._path_blob = None
+        self._path_starts = None
+    
+    def search(self, query: str, top_k: int = 5, min_score: float = None,
+               include_content: bool = False) -> List[Dict[str, any]]:
         """
-        print(f"Loading repository store from {pkl_file}...")
+        Search for the most similar files to a query string.
         
-        try:
-            with open(pkl_file, 'rb') as f:
-                data = pickle.load(f)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Repository store file not found: {pkl_file}")
-        except Exception as e:
-            raise RuntimeError(f"Failed to load repository store: {e}")
+        Chunks are searched individually and aggregated per file: a file's
+        distance is that of its best-matching chunk. For 'cosine' stores the
+        distance is 1 - cosine similarity, for 'l2' stores the squared L2 distance.
         
-        self.files = data["files"]
-        self.embeddings = data["embeddings"]
+        Args:
+            query: Search query string
+            top_k: Number of top results to return
+            min_score: Optional threshold on the calibrated 'score' of results
+            include_content: If True, results also carry the full file 'content'
+            
+        Returns:
+            List of dictionaries with 'file_id', 'path', 'distance', 'score'
+            (see calibrated_score()), 'snippet' (the lines of the best chunk, see
+            snippets.py) and 'chunks' (the matching line ranges with their
+            distances) keys, sorted by distance (ascending, so lower is better)
+        """
+        return self.search_batch([query], top_k, min_score, include_content)[0]
+    
+    def search_batch(self, queries: List[str], top_k: int = 5, min_score: float = None,
+                     include_content: bool = False) -> List[List[Dict[str, any]]]:
+        """
+        Search for several queries at once.
         
-        if len(self.files) != self.embeddings.shape[0]:
-            raise ValueError(
-                f"Mismatch: {len(self.files)} files but {self.embeddings.shape[0]} embeddings"
-            )
+        All queries are encoded in a single model call and searched with a
+        single FAISS call over the stacked query matrix; only queries that hit
+        too few distinct files are searched again with a wider k.
         
-        print(f"Loaded {len(self.files)} files with embeddings of dimension {self.embeddings.shape[1]}")
+        Args:
+            queries: Search query strings
+            top_k: Number of top results to return per query
+            min_score: Optional threshold on the calibrated 'score' of results
+            include_content: If True, results also carry the full file 'content'
+            
+        Returns:
+            One result list per query, in query order, each as returned by search()
+        """
+        if top_k <= 0:
+            raise ValueError("top_k must be positive")
         
-        # Load the embedding model for query encoding
-        print(f"Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        if not queries:
+            return []
         
-        # Build FAISS L2 index
-        print("Building FAISS L2 index...")
-        dimension = self.embeddings.shape[1]
+        if top_k > len(self.store.files):
+            top_k = len(self.store.files)
         
-        # Create FAISS index (L2 distance)
-        self.index = faiss.IndexFlatL2(dimension)
+        # Repeated queries are answered from the result cache; only the rest are encoded and searched
+        cache_keys = [(self.version, "search", normalize_query(q), top_k) for q in queries]
+        batch_results = [self.result_cache.get(key) for key in cache_keys]
+        todo = [i for i, results in enumerate(batch_results) if results is None]
         
-        # Add embeddings to index
-        self.index.add(self.embeddings.astype('float32'))
+        if todo:
+            hits = self._vector_hits([queries[i] for i in todo], top_k)
+            
+            # Cut snippets, reading each file's content once even if several queries return it
+            contents = {}
+            for i, query_hits in zip(todo, hits):
+                results = []
+                for file_idx, chunk_hits in query_hits[:top_k]:
+                    if file_idx not in contents:
+                        contents[file_idx] = self.store.get_content(file_idx)
+                    results.append(self._vector_result(file_idx, chunk_hits, contents[file_idx]))
+                batch_results[i] = results
+                self.result_cache.put(cache_keys[i], results)
+        
+        if min_score is not None:
+            batch_results = [[r for r in results if r["score"] >= min_score] for results in batch_results]
+        
+        return [self._output(results, include_content) for results in batch_results]
+    
+    def _vector_result(self, file_idx: int, chunk_hits: List[Dict[str, any]], content: str) -> Dict[str, any]:
+        """
+        Build a search() result for a file from its chunk hits.
         
-        print(f"FAISS index built with {self.index.ntotal} vectors")
+        Args:
+            file_idx: File index in the store
+            chunk_hits: Chunk hits of the file, best first
+            content: File content, used to cut the snippet
+            
+        Returns:
+            Result dictionary as returned by search()
+        """
+        return {
+            "file_id": file_idx,
+            "path": self.store.files[file_idx]["path"],
+            "distance": chunk_hits[0]["distance"],
+            "score": calibrated_score(chunk_hits[0]["distance"], self.metric),
+            "snippet": chunk_snippet(content, chunk_hits),
+            "chunks": chunk_hits
+        }
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, any]]:
+    def _output(self, results: List[Dict[str, any]], include_content: bool = False) -> List[Dict[str, any]]:
         """
-        Search for the most similar files to a query string.
+        Copy cached results for a caller, adding the full content if requested.
+        
+        Results are shallow-copied so callers can modify them without touching the cache.
         
         Args:
-            query: Search query string
-            top_k: Number of top results to return
+            results: Result dictionaries with 'file_id' keys
+            include_content: If True, add each file's 'content'
             
         Returns:
-            List of dictionaries with 'path', 'content', and 'distance' keys,
-            sorted by distance (ascending, so lower is better)
+            List of new result dictionaries
         """
-        if top_k <= 0:
-            raise ValueError("top_k must be positive")
+        if not include_content:
+            return [dict(r) for r in results]
+        return [dict(r, content=self.store.get_content(r["file_id"])) for r in results]
+    
+    def _vector_hits(self, queries: List[str], num_files: int) -> List[List[tuple]]:
+        """
+        Find the best-matching files of several queries without reading any content.
         
-        if top_k > len(self.files):
-            top_k = len(self.files)
+        All queries are searched with one FAISS call; only queries that hit too
+        few distinct files are searched again with a wider k.
         
-        # Encode query using the same model
-        query_embedding = self.model.encode(
-            query,
-            convert_to_numpy=True,
-            normalize_embeddings=False
-        ).astype('float32')
+        Args:
+            queries: Search query strings
+            num_files: Number of distinct files wanted per query
+            
+        Returns:
+            One list of (file index, chunk hits) tuples per query, as returned
+            by _aggregate_chunk_hits() (may hold more than num_files entries)
+        """
+        return self._search_vectors(self._encode_queries(queries), num_files)
+    
+    def _search_vectors(self, query_embeddings: np.ndarray, num_files: int) -> List[List[tuple]]:
+        """
+        Find the best-matching files of already encoded queries (see _vector_hits()).
         
-        # Reshape for FAISS (needs to be 2D: [1, dimension])
-        query_embedding = query_embedding.reshape(1, -1)
+        Args:
+            query_embeddings: float32 matrix with one unnormalized query embedding per row
+            num_files: Number of distinct files wanted per query
+            
+        Returns:
+            One list of (file index, chunk hits) tuples per query
+        """
+        if self.metric == "cosine":
+            query_embeddings = normalize_vectors(query_embeddings)
+        
+        # Search in FAISS index, widening the chunk search until enough distinct files are hit
+        hits = [None] * len(query_embeddings)
+        pending = list(range(len(query_embeddings)))
+        k = min(num_files * CHUNK_CANDIDATES_PER_FILE, self.index.ntotal)
+        while pending:
+            distances, indices = self.index.search(query_embeddings[pending], k)
+            widen = []
+            for row, query_idx in enumerate(pending):
+                hits[query_idx] = self._aggregate_chunk_hits(distances[row], indices[row])
+                if len(hits[query_idx]) < num_files and k < self.index.ntotal:
+                    widen.append(query_idx)
+            pending = widen
+            k = min(k * 2, self.index.ntotal)
+        
+        return hits
+    
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed queries, encoding only the ones missing from the query cache (in one forward pass).
         
-        # Search in FAISS index
-        distances, indices = self.index.search(query_embedding, top_k)
+        Args:
+            queries: Query strings
+            
+        Returns:
+            float32 matrix with one row per query
+        """
+        vectors = self.query_cache.get_many(self.model_name, queries)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        
+        if missing:
+            # Encode queries using the same model
+            encoded = self.model.encode(
+                [queries[i] for i in missing],
+                convert_to_numpy=True,
+                normalize_embeddings=False
+            ).astype('float32').reshape(len(missing), -1)
+            self.query_cache.put_many(self.model_name, [queries[i] for i in missing], encoded)
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+        
+        return np.ascontiguousarray(np.stack(vectors), dtype=np.float32)
+    
+    def _aggregate_chunk_hits(self, distances: np.ndarray, indices: np.ndarray) -> List[tuple]:
+        """
+        Group chunk hits by file, keeping FAISS order (best chunk first).
         
-        # Build results
-        results = []
-        for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.files):
-                results.append({
-                    "path": self.files[idx]["path"],
-                    "content": self.files[idx]["content"],
-                    "distance": float(distance)
-                })
+        Args:
+            distances: Chunk distances from FAISS
+            indices: Chunk indices from FAISS
+            
+        Returns:
+            List of (file index, chunk hits) tuples ordered by best chunk distance
+        """
+        by_file = {}
+        for distance, idx in zip(distances, indices):
+            if idx < 0 or idx >= len(self.chunks):
+                continue
+            if self.metric == "cosine":
+                # Inner-product indexes report similarity; convert to a distance (lower is better)
+                distance = 1.0 - distance
+            chunk = self.chunks[idx]
+            by_file.setdefault(int(chunk[CHUNK_FILE]), []).append({
+                "start_line": int(chunk[CHUNK_START_LINE]),
+                "end_line": int(chunk[CHUNK_END_LINE]),
+                "distance": float(distance)
+            })
+        return list(by_file.items())
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get hit/miss statistics of the query embedding and result caches.
         
-        return results
+        Returns:
+            Dictionary with 'query_embeddings' and 'results' statistics
+        """
+        return {"query_embeddings": self.query_cache.stats(), "results": self.result_cache.stats()}
     
     def get_file_count(self) -> int:
         """
@@ -113,135 +360,264 @@ class RepoSearchEngine:
         Returns:
             Number of files
         """
-        return len(self.files)
+        return len(self.store.files)
     
-    def search_by_keyword(self, keyword: str, top_k: int = 5) -> List[Dict[str, any]]:
+    def search_by_keyword(self, keyword: str, top_k: int = 5, include_content: bool = False) -> List[Dict[str, any]]:
         """
         Search for files by keyword in file path or content.
         
+        Content matches are scored with BM25 over an inverted index (see
+        keyword_index.py), so only files containing the keyword are touched.
+        
         Args:
             keyword: Keyword to search for (case-insensitive)
             top_k: Number of top results to return
+            include_content: If True, results also carry the full file 'content'
             
         Returns:
-            List of dictionaries with 'path', 'content', and 'score' keys,
-            sorted by relevance (higher score = more matches)
+            List of dictionaries with 'file_id', 'path', 'score' and 'snippet'
+            (the lines around the best keyword match) keys, sorted by relevance
+            (higher score = better match)
         """
         if top_k <= 0:
             raise ValueError("top_k must be positive")
         
         keyword_lower = keyword.lower()
-        results = []
         
-        for i, file_dict in enumerate(self.files):
-            path = file_dict.get("path", "")
-            content = file_dict.get("content", "")
-            
-            # Calculate relevance score
-            score = 0
-            
-            # Path matches (higher weight)
-            if keyword_lower in path.lower():
-                score += 10
-                # Exact filename match gets bonus
-                if path.lower().endswith(keyword_lower):
-                    score += 5
+        cache_key = (self.version, "keyword", keyword_lower, top_k)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return self._output(cached, include_content)
+        
+        ranked = self._keyword_ranking(keyword_lower)[:top_k]
+        
+        # Content is only read for the files that are returned, to cut their snippets
+        results = [
+            {
+                "file_id": file_idx,
+                "path": self.store.files[file_idx]["path"],
+                "score": score,
+                "distance": None,  # Not applicable for keyword search
+                "snippet": keyword_snippet(self.store.get_content(file_idx), keyword_lower)
+            }
+            for file_idx, score in ranked
+        ]
+        self.result_cache.put(cache_key, results)
+        return self._output(results, include_content)
+    
+    def _keyword_ranking(self, keyword_lower: str) -> List[tuple]:
+        """
+        Rank files against a keyword by BM25 content score plus path bonuses.
+        
+        Keywords without tokens are matched by a content scan instead of the index.
+        
+        Args:
+            keyword_lower: Lowercase keyword
             
-            # Content matches
-            content_lower = content.lower()
-            matches = content_lower.count(keyword_lower)
-            if matches > 0:
-                score += min(matches, 5)  # Cap content matches at 5
+        Returns:
+            List of (file index, score) tuples, best first
+        """
+        if tokenize(keyword_lower):
+            scores = dict(self.keyword_index.search(keyword_lower))
+        else:
+            scores = self._substring_scores(keyword_lower)
+        
+        # Path matches (higher weight); exact filename match gets a bonus
+        for file_idx, suffix in self._path_matches(keyword_lower):
+            bonus = PATH_MATCH_SCORE + (PATH_SUFFIX_SCORE if suffix else 0)
+            scores[file_idx] = scores.get(file_idx, 0.0) + bonus
+        
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    
+    def _substring_scores(self, keyword_lower: str) -> Dict[int, float]:
+        """
+        Score files by how often their content contains a keyword, by scanning every file.
+        
+        Used for keywords the index cannot look up because they have no tokens,
+        such as operators ('=>', '::').
+        
+        Args:
+            keyword_lower: Lowercase keyword
             
-            if score > 0:
-                results.append({
-                    "path": path,
-                    "content": content,
-                    "score": score,
-                    "distance": None  # Not applicable for keyword search
-                })
+        Returns:
+            Mapping of file index to score, for files containing the keyword
+        """
+        if not keyword_lower.strip():
+            return {}
+        
+        scores = {}
+        for file_idx in range(len(self.store.files)):
+            matches = self.store.get_content(file_idx).lower().count(keyword_lower)
+            if matches:
+                scores[file_idx] = float(min(matches, SUBSTRING_MATCH_CAP))
+        return scores
+    
+    @property
+    def keyword_index(self) -> KeywordIndex:
+        """Keyword index saved with the store, or built in memory if there is none."""
+        if self._keyword_index is None:
+            index = load_store_keyword_index(self.store)
+            if index is None:
+                print("Building keyword index...")
+                index = build_store_keyword_index(self.store, save=False)
+            self._keyword_index = index
+        return self._keyword_index
+    
+    def _path_matches(self, keyword_lower: str) -> List[tuple]:
+        """
+        Find files whose lowercase path contains a keyword.
         
-        # Sort by score (descending) and limit to top_k
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:top_k]
+        Args:
+            keyword_lower: Lowercase keyword
+            
+        Returns:
+            List of (file index, whether the path ends with the keyword) tuples
+        """
+        if self._path_blob is None:
+            paths = [f.get("path", "").lower() for f in self.store.files]
+            self._path_starts = []
+            offset = 0
+            for path in paths:
+                self._path_starts.append(offset)
+                offset += len(path) + 1
+            self._path_blob = "\n".join(paths) + "\n"
+        
+        if not keyword_lower or "\n" in keyword_lower:
+            return []
+        
+        matches = {}
+        pos = self._path_blob.find(keyword_lower)
+        while pos != -1:
+            file_idx = bisect.bisect_right(self._path_starts, pos) - 1
+            end = pos + len(keyword_lower)
+            matches[file_idx] = matches.get(file_idx, False) or self._path_blob[end] == "\n"
+            pos = self._path_blob.find(keyword_lower, pos + 1)
+        
+        return list(matches.items())
     
-    def search_combined(self, query: str, keyword: str = None, top_k: int = 5, vector_weight: float = 0.7) -> List[Dict[str, any]]:
+    def search_combined(self, query: str, keyword: str = None, top_k: int = 5, vector_weight: float = 0.7,
+                        fusion: str = "weighted", rerank: bool = False,
+                        include_content: bool = False) -> List[Dict[str, any]]:
         """
         Combined vector and keyword search.
         
+        Both searches draw a shared pool of candidate files, which are fused by
+        file index before any content is read: only the returned files (and,
+        when reranking, the reranked candidates) are loaded from the store.
+        
+        With 'weighted' fusion a file's combined score is the weighted sum of its
+        calibrated vector score and its keyword score relative to the best keyword
+        match. With 'rrf' (reciprocal rank fusion) it is the weighted sum of
+        1 / (RRF_K + rank) over both rankings, which ignores score scales entirely.
+        
         Args:
             query: Semantic search query for vector search
             keyword: Optional keyword for keyword search
             top_k: Number of results to return
             vector_weight: Weight for vector search results (0-1), keyword weight is 1 - vector_weight
+            fusion: 'weighted' or 'rrf'
+            rerank: If True, re-score the best fused candidates with the engine's reranker
+            include_content: If True, results also carry the full file 'content'
             
         Returns:
-            Combined and ranked results
-        """
-        vector_results = self.search(query, top_k * 2)  # Get more for combination
-        keyword_results = []
-        
-        if keyword:
-            keyword_results = self.search_by_keyword(keyword, top_k * 2)
-        
-        # Normalize scores
-        if vector_results:
-            max_distance = max(r["distance"] for r in vector_results if r["distance"] is not None)
-            if max_distance > 0:
-                for r in vector_results:
-                    if r["distance"] is not None:
-                        r["normalized_score"] = 1 - (r["distance"] / max_distance)
-                    else:
-                        r["normalized_score"] = 0
-        
-        if keyword_results:
-            max_score = max(r["score"] for r in keyword_results if r["score"] is not None)
-            if max_score > 0:
-                for r in keyword_results:
-                    if r["score"] is not None:
-                        r["normalized_score"] = r["score"] / max_score
-                    else:
-                        r["normalized_score"] = 0
-        
-        # Combine results
-        combined = {}
-        
-        for r in vector_results:
-            path = r["path"]
-            if path not in combined:
-                combined[path] = {
-                    "path": path,
-                    "content": r["content"],
-                    "vector_score": r.get("normalized_score", 0),
-                    "keyword_score": 0,
-                    "combined_score": 0
-                }
-            else:
-                combined[path]["vector_score"] = r.get("normalized_score", 0)
-        
-        for r in keyword_results:
-            path = r["path"]
-            if path not in combined:
-                combined[path] = {
-                    "path": path,
-                    "content": r["content"],
-                    "vector_score": 0,
-                    "keyword_score": r.get("normalized_score", 0),
-                    "combined_score": 0
-                }
+            List of dictionaries with 'file_id', 'path', 'snippet', 'vector_score',
+            'keyword_score', 'combined_score' (and 'rerank_score' when reranking)
+            keys, best first
+        """
+        if top_k <= 0:
+            raise ValueError("top_k must be positive")
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method: {fusion} (expected one of {', '.join(FUSION_METHODS)})")
+        if rerank and self.reranker is None:
+            raise ValueError("Reranking requested but no reranker is loaded")
+        
+        keyword_lower = keyword.lower() if keyword else None
+        cache_key = (self.version, "combined", normalize_query(query), keyword_lower, top_k, vector_weight, fusion, rerank)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            return self._output(cached, include_content)
+        
+        num_candidates = min(max(top_k, RERANK_CANDIDATES if rerank else 0) * COMBINED_CANDIDATES_PER_RESULT,
+                             len(self.store.files))
+        
+        vector_hits = self._vector_hits([query], num_candidates)[0][:num_candidates]
+        keyword_ranking = self._keyword_ranking(keyword_lower)[:num_candidates] if keyword_lower else []
+        
+        # Fuse on file indices; candidates are [vector score, keyword score, combined score]
+        max_score = keyword_ranking[0][1] if keyword_ranking else 0.0
+        if max_score <= 0:
+            keyword_ranking = []
+        
+        candidates = {}
+        for rank, (file_idx, chunk_hits) in enumerate(vector_hits):
+            score = calibrated_score(chunk_hits[0]["distance"], self.metric)
+            fused = 1.0 / (RRF_K + rank + 1) if fusion == "rrf" else score
+            candidates[file_idx] = [score, 0.0, vector_weight * fused]
+        for rank, (file_idx, score) in enumerate(keyword_ranking):
+            entry = candidates.setdefault(file_idx, [0.0, 0.0, 0.0])
+            entry[1] = score / max_score
+            fused = 1.0 / (RRF_K + rank + 1) if fusion == "rrf" else entry[1]
+            entry[2] += (1 - vector_weight) * fused
+        
+        ranked = sorted(candidates.items(), key=lambda item: item[1][2], reverse=True)
+        chunk_hits_by_file = dict(vector_hits)
+        
+        contents = {}
+        rerank_scores = {}
+        if rerank and ranked:
+            ranked = ranked[:max(top_k, RERANK_CANDIDATES)]
+            for file_idx, _ in ranked:
+                contents[file_idx] = self.store.get_content(file_idx)
+            passages = [
+                self._rerank_passage(contents[file_idx], chunk_hits_by_file.get(file_idx))
+                for file_idx, _ in ranked
+            ]
+            scores = self.reranker.predict([(query, passage) for passage in passages])
+            rerank_scores = {file_idx: float(score) for (file_idx, _), score in zip(ranked, scores)}
+            ranked.sort(key=lambda item: rerank_scores[item[0]], reverse=True)
+        
+        # Content is only read for the files that are returned, to cut their snippets
+        results = []
+        for file_idx, (vector_score, keyword_score, combined_score) in ranked[:top_k]:
+            if file_idx not in contents:
+                contents[file_idx] = self.store.get_content(file_idx)
+            if file_idx in chunk_hits_by_file or not keyword_lower:
+                snippet = chunk_snippet(contents[file_idx], chunk_hits_by_file.get(file_idx))
             else:
-                combined[path]["keyword_score"] = r.get("normalized_score", 0)
-        
-        # Calculate combined scores
-        for path, result in combined.items():
-            result["combined_score"] = (
-                vector_weight * result["vector_score"] +
-                (1 - vector_weight) * result["keyword_score"]
-            )
+                snippet = keyword_snippet(contents[file_idx], keyword_lower)
+            result = {
+                "file_id": file_idx,
+                "path": self.store.files[file_idx]["path"],
+                "snippet": snippet,
+                "vector_score": vector_score,
+                "keyword_score": keyword_score,
+                "combined_score": combined_score
+            }
+            if file_idx in chunk_hits_by_file:
+                result["chunks"] = chunk_hits_by_file[file_idx]
+            if rerank:
+                result["rerank_score"] = rerank_scores[file_idx]
+            results.append(result)
+        
+        self.result_cache.put(cache_key, results)
+        return self._output(results, include_content)
+    
+    @staticmethod
+    def _rerank_passage(content: str, chunk_hits: List[Dict[str, any]] = None) -> str:
+        """
+        Text of a file shown to the reranker: its best-matching chunk, or its beginning.
         
-        # Sort by combined score and return top_k
-        final_results = sorted(combined.values(), key=lambda x: x["combined_score"], reverse=True)
-        return final_results[:top_k]
+        Args:
+            content: File content
+            chunk_hits: Optional vector chunk hits of the file, best first
+            
+        Returns:
+            Passage of at most RERANK_MAX_CHARS characters
+        """
+        if chunk_hits:
+            lines = content.split("\n")
+            content = "\n".join(lines[chunk_hits[0]["start_line"] - 1:chunk_hits[0]["end_line"]])
+        return content[:RERANK_MAX_CHARS]
     
     def get_file_by_path(self, file_path: str) -> Dict[str, any] | None:
         """
@@ -253,15 +629,70 @@ class RepoSearchEngine:
         Returns:
             File dictionary or None if not found
         """
-        for file_dict in self.files:
-            if file_dict.get("path") == file_path:
-                return {
-                    "path": file_dict["path"],
-                    "content": file_dict["content"],
-                    "distance": 0,
-                    "score": 100
-                }
-        return None
+        file_idx = self.store.path_index.get(file_path)
+        if file_idx is None:
+            return None
+        
+        return {
+            "file_id": file_idx,
+            "path": file_path,
+            "content": self.store.get_content(file_idx),
+            "distance": 0,
+            "score": 100
+        }
+    
+    def get_files_by_paths(self, file_paths: List[str]) -> List[Dict[str, any]]:
+        """
+        Get several files by their exact paths in one call.
+        
+        Args:
+            file_paths: Exact file paths
+            
+        Returns:
+            File dictionaries (as from get_file_by_path) for the paths present in the store
+        """
+        results = []
+        for file_path in file_paths:
+            result = self.get_file_by_path(file_path)
+            if result is not None:
+                results.append(result)
+        return results
+    
+    def list_files(self, prefix: str = "") -> List[str]:
+        """
+        List the paths starting with a prefix.
+        
+        Args:
+            prefix: Path prefix ('' lists every file)
+            
+        Returns:
+            Matching paths in sorted order
+        """
+        return [path for path, _ in self.store.path_index.with_prefix(prefix)]
+    
+    def list_directory(self, directory: str = "") -> Dict[str, List[str]]:
+        """
+        List the files and subdirectories directly inside a directory.
+        
+        Args:
+            directory: Directory path ('' for the repository root)
+            
+        Returns:
+            Dictionary with 'files' and 'directories' keys
+        """
+        return self.store.path_index.list_directory(directory)
+    
+    def glob_files(self, pattern: str) -> List[str]:
+        """
+        List the paths matching a glob pattern ('*' stays within a directory, '**' spans directories).
+        
+        Args:
+            pattern: Glob pattern, e.g. 'backend/**/*.py'
+            
+        Returns:
+            Matching paths in sorted order
+        """
+        return [path for path, _ in self.store.path_index.glob(pattern)]
     
     def get_embedding_dimension(self) -> int:
         """
@@ -270,22 +701,29 @@ class RepoSearchEngine:
         Returns:
             Embedding dimension
         """
-        return self.embeddings.shape[1]
+        return self.store.dimension
+
+    def close(self):
+        """Release the store's memory-mapped files; the engine cannot be searched afterwards."""
+        self.index = None
+        self.embeddings = None
+        self._keyword_index = None
+        self.store.close()
 
 
 if __name__ == "__main__":
     import sys
     
     if len(sys.argv) < 2:
-        print("Usage: python search_repo.py <pkl_file> [query]")
-        print("Example: python search_repo.py repo_store.pkl 'authentication function'")
+        print("Usage: python search_repo.py <store> [query]")
+        print("Example: python search_repo.py repo_store 'authentication function'")
         sys.exit(1)
     
-    pkl_file = sys.argv[1]
+    store_path = sys.argv[1]
     query = sys.argv[2] if len(sys.argv) > 2 else "authentication"
     
     # Initialize search engine
-    engine = RepoSearchEngine(pkl_file)
+    engine = RepoSearchEngine(store_path)
     
     # Perform search
     print(f"\nSearching for: '{query}'")
@@ -296,6 +734,6 @@ if __name__ == "__main__":
     for i, result in enumerate(results, 1):
         print(f"\n[{i}] {result['path']}")
         print(f"    Distance: {result['distance']:.4f}")
-        print(f"    Content preview (first 200 chars):")
-        print(f"    {result['content'][:200]}...")
+        print(f"    Lines {result['snippet']['start_line']}-{result['snippet']['end_line']}:")
+        print("    " + result["snippet"]["text"].replace("\n", "\n    "))
 
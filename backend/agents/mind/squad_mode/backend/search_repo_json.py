@@ -2,86 +2,188 @@
 Repository Search Engine - JSON Output Version
 
 This script performs semantic search on a repository and outputs results as JSON.
+
+Results carry the path, scores and a snippet of the matching lines; pass --content
+to also include each file's (truncated) content.
+
+With --batch, a JSON array of queries is read from stdin and answered with one
+model call and one index search; the output is one result list per query.
+
+If REPO_SEARCH_SERVER is set (e.g. http://127.0.0.1:8765), queries are sent to the
+resident search_server.py daemon instead of loading the model and index per call.
 """
 
-import pickle
-import numpy as np
+import contextlib
+import os
 import sys
 import json
-from sentence_transformers import SentenceTransformer
-import faiss
+import urllib.request
+
+from search_repo import RepoSearchEngine
+
+
+SEARCH_SERVER_ENV = "REPO_SEARCH_SERVER"
 
+MAX_CONTENT_CHARS = 2000
 
-def search_repo(pkl_file: str, query: str, top_k: int = 5):
+
+def _post(server_url: str, endpoint: str, params: dict):
+    """POST a JSON request to a search_server.py endpoint and decode the response."""
+    payload = json.dumps(params).encode("utf-8")
+    request = urllib.request.Request(
+        server_url.rstrip("/") + "/" + endpoint,
+        data=payload,
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def search_repo_remote(server_url: str, store_path: str, query: str, top_k: int = 5,
+                       include_content: bool = False):
     """
-    Search for the most similar files to a query string.
+    Search through a running search_server.py daemon.
     
     Args:
-        pkl_file: Path to the pickle file containing files and embeddings
+        server_url: Base URL of the search server
+        store_path: Path to the repository store (must live under the server's store root)
         query: Search query string
         top_k: Number of top results to return
+        include_content: If True, results also carry the (truncated) file content
         
     Returns:
-        List of dictionaries with 'path', 'content', and 'distance' keys
+        List of result dictionaries as returned by search_repo()
     """
-    try:
-        # Load data
-        with open(pkl_file, 'rb') as f:
-            data = pickle.load(f)
-        
-        files = data["files"]
-        embeddings = data["embeddings"]
-        
-        # Load the embedding model
-        model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-        
-        # Build FAISS index
-        dimension = embeddings.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(embeddings.astype('float32'))
+    return _post(server_url, "search", {
+        "store": os.path.abspath(store_path),
+        "query": query,
+        "top_k": top_k,
+        "include_content": include_content
+    })
+
+
+def search_repo_batch_remote(server_url: str, store_path: str, queries: list, top_k: int = 5,
+                             include_content: bool = False):
+    """
+    Search several queries through a running search_server.py daemon.
+    
+    Args:
+        server_url: Base URL of the search server
+        store_path: Path to the repository store (must live under the server's store root)
+        queries: Search query strings
+        top_k: Number of top results to return per query
+        include_content: If True, results also carry the (truncated) file content
         
-        # Encode query
-        query_embedding = model.encode(
-            query,
-            convert_to_numpy=True,
-            normalize_embeddings=False
-        ).astype('float32')
+    Returns:
+        One result list per query
+    """
+    return _post(server_url, "search_batch", {
+        "store": os.path.abspath(store_path),
+        "queries": queries,
+        "top_k": top_k,
+        "include_content": include_content
+    })
+
+
+def _truncate(results):
+    """Truncate result contents in place for manageable size."""
+    for r in results:
+        if len(r.get("content") or "") > MAX_CONTENT_CHARS:
+            r["content"] = r["content"][:MAX_CONTENT_CHARS] + "..."
+    return results
+
+
+def search_repo(store_path: str, query: str, top_k: int = 5, include_content: bool = False):
+    """
+    Search for the most similar files to a query string.
+    
+    Args:
+        store_path: Path to the repository store (directory or legacy pickle file)
+        query: Search query string
+        top_k: Number of top results to return
+        include_content: If True, results also carry the (truncated) file content
         
-        query_embedding = query_embedding.reshape(1, -1)
+    Returns:
+        List of dictionaries with 'file_id', 'path', 'distance', 'score',
+        'snippet' and 'chunks' keys (and 'content' if requested)
+    """
+    try:
+        # Engine progress messages go to stderr so stdout stays valid JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            engine = RepoSearchEngine(store_path)
+            results = engine.search(query, top_k, include_content=include_content)
         
-        # Search
-        distances, indices = index.search(query_embedding, min(top_k, len(files)))
+        return _truncate(results)
+    
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def search_repo_batch(store_path: str, queries: list, top_k: int = 5, include_content: bool = False):
+    """
+    Search for several queries with a single model call and index search.
+    
+    Args:
+        store_path: Path to the repository store (directory or legacy pickle file)
+        queries: Search query strings
+        top_k: Number of top results to return per query
+        include_content: If True, results also carry the (truncated) file content
         
-        # Build results
-        results = []
-        for distance, idx in zip(distances[0], indices[0]):
-            if idx < len(files):
-                # Truncate content for manageable size
-                content = files[idx]["content"]
-                if len(content) > 2000:
-                    content = content[:2000] + "..."
-                
-                results.append({
-                    "path": files[idx]["path"],
-                    "content": content,
-                    "distance": float(distance)
-                })
+    Returns:
+        One result list per query, each as returned by search_repo()
+    """
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            engine = RepoSearchEngine(store_path)
+            batch_results = engine.search_batch(queries, top_k, include_content=include_content)
         
-        return results
+        return [_truncate(results) for results in batch_results]
     
     except Exception as e:
         return {"error": str(e)}
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print(json.dumps({"error": "Usage: python search_repo_json.py <pkl_file> <query> [top_k]"}))
+    batch = "--batch" in sys.argv
+    include_content = "--content" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in ("--batch", "--content")]
+    
+    if len(args) < (1 if batch else 2):
+        print(json.dumps({"error": "Usage: python search_repo_json.py <store> <query> [top_k] [--content]\n"
+                                   "       python search_repo_json.py <store> --batch [top_k] [--content] < queries.json"}))
         sys.exit(1)
     
-    pkl_file = sys.argv[1]
-    query = sys.argv[2]
-    top_k = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    store_path = args[0]
+    if batch:
+        try:
+            queries = json.load(sys.stdin)
+            if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                raise ValueError("expected a JSON array of strings")
+        except ValueError as e:
+            print(json.dumps({"error": f"Invalid queries on stdin: {e}"}))
+            sys.exit(1)
+        top_k = int(args[1]) if len(args) > 1 else 5
+    else:
+        query = args[1]
+        top_k = int(args[2]) if len(args) > 2 else 5
+    
+    server_url = os.environ.get(SEARCH_SERVER_ENV)
+    results = None
+    
+    if server_url:
+        try:
+            if batch:
+                results = search_repo_batch_remote(server_url, store_path, queries, top_k, include_content)
+            else:
+                results = search_repo_remote(server_url, store_path, query, top_k, include_content)
+        except Exception as e:
+            # Fall back to a local one-shot search if the daemon is unreachable
+            print(f"Search server unavailable ({e}), searching locally", file=sys.stderr)
     
-    results = search_repo(pkl_file, query, top_k)
+    if results is None:
+        if batch:
+            results = search_repo_batch(store_path, queries, top_k, include_content)
+        else:
+            results = search_repo(store_path, query, top_k, include_content)
     print(json.dumps(results, indent=2))
 
@@ -0,0 +1,473 @@
+"""
+Repository Search Server
+
+This module runs a long-lived local HTTP daemon around RepoSearchEngine:
+- Loads the embedding model once and shares it (and its query embedding cache) between all stores
+- Keeps one search engine (and FAISS index) resident per repository store
+- Hot-reloads a store when it is rewritten on disk
+- Serves search, keyword, combined and file lookups as JSON endpoints
+- Lists files by prefix, directory or glob pattern
+- Searches several stores at once, merging their results into one ranking
+"""
+
+import os
+import sys
+import json
+import threading
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Tuple
+from urllib.parse import urlparse, parse_qs
+from sentence_transformers import CrossEncoder
+
+from repo_store import store_version
+from search_repo import RepoSearchEngine
+from search_repo_json import _truncate
+from federated_search import FederatedSearchEngine, FEDERATED_WORKERS
+from query_cache import QueryEmbeddingCache
+from model_registry import BACKENDS, get_model, model_stats, preload as preload_models
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class _ResidentEngine:
+    """A loaded engine with the store version it was loaded from and the number of requests using it."""
+    
+    def __init__(self, engine: RepoSearchEngine, version: float):
+        self.engine = engine
+        self.version = version
+        self.users = 0
+        self.retired = False
+
+
+class StorePool:
+    """
+    Keeps one RepoSearchEngine per store resident and reloads stale ones.
+    
+    Stores are addressed by path relative to a root directory; anything that
+    resolves outside the root is rejected, since loading a legacy pickle store
+    unpickles it.
+    
+    Requests check engines out with engine() / federated(). An engine replaced
+    by a reload (or unloaded) is closed once the last request using it is done,
+    so its memory-mapped files are released without pulling them out from
+    under a running search.
+    """
+    
+    def __init__(self, store_root: str, model_name: str = DEFAULT_MODEL, watch_interval: float = 2.0,
+                 reranker_name: str = None, backend: str = None, quantize: bool = None):
+        """
+        Initialize the pool and load the shared embedding model (and reranker).
+        
+        Args:
+            store_root: Directory containing the repository stores
+            model_name: Name of the sentence-transformers model shared by all stores
+            watch_interval: Seconds between checks for modified stores (0 disables the watcher)
+            reranker_name: Optional cross-encoder model used by combined searches with rerank
+            backend: Model backend ('torch', 'onnx' or 'openvino', see model_registry.py)
+            quantize: Whether to quantize the model to int8 for CPU inference
+        """
+        self.store_root = os.path.abspath(store_root)
+        self.model_name = model_name
+        self.watch_interval = watch_interval
+        
+        # Loaded and warmed up before the first query arrives
+        preload_models([model_name], backend, quantize)
+        self.model = get_model(model_name, backend, quantize)
+        self.query_cache = QueryEmbeddingCache.from_env()
+        
+        self.reranker = None
+        if reranker_name:
+            print(f"Loading shared reranker: {reranker_name}")
+            self.reranker = CrossEncoder(reranker_name)
+        
+        # store path -> resident engine; _lock guards the map and the user counts
+        self._engines: Dict[str, _ResidentEngine] = {}
+        self._lock = threading.Lock()
+        # store path -> lock held while that store loads, so each store loads once
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._stop = threading.Event()
+        self._watcher = None
+        
+        # Threads searching the stores of multi-store queries
+        self.executor = ThreadPoolExecutor(max_workers=FEDERATED_WORKERS, thread_name_prefix="federated-search")
+    
+    def resolve(self, store: str) -> str:
+        """
+        Resolve a store name to an absolute path inside the store root.
+        
+        Args:
+            store: Store path, relative to the store root
+        
+        Returns:
+            Absolute path of the store
+        """
+        if not store:
+            raise ValueError("store is required")
+        
+        path = os.path.abspath(os.path.join(self.store_root, store))
+        if os.path.commonpath([path, self.store_root]) != self.store_root:
+            raise ValueError(f"Store is outside the store root: {store}")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Repository store file not found: {store}")
+        return path
+    
+    def load(self, store: str):
+        """
+        Load a store if it is not resident yet.
+        
+        Args:
+            store: Store path, relative to the store root
+        """
+        with self.engine(store):
+            pass
+    
+    @contextmanager
+    def engine(self, store: str) -> Iterator[RepoSearchEngine]:
+        """
+        Check out the resident engine for a store, loading it on first use.
+        
+        The engine stays open until the with block exits, even if the store is
+        reloaded in the meantime.
+        
+        Args:
+            store: Store path, relative to the store root
+        
+        Yields:
+            RepoSearchEngine for the store
+        """
+        resident = self._checkout(self.resolve(store))
+        try:
+            yield resident.engine
+        finally:
+            with self._lock:
+                resident.users -= 1
+                self._close_if_unused(resident)
+    
+    def _checkout(self, path: str) -> _ResidentEngine:
+        """Get the resident engine for a path with its user count taken, loading it if needed."""
+        with self._lock:
+            resident = self._engines.get(path)
+            if resident is not None:
+                resident.users += 1
+                return resident
+        
+        with self._load_lock(path):
+            with self._lock:
+                resident = self._engines.get(path)
+                if resident is not None:
+                    resident.users += 1
+                    return resident
+            return self._load(path, checkout=True)
+    
+    def _load_lock(self, path: str) -> threading.Lock:
+        """Get the lock held while a store loads."""
+        with self._lock:
+            return self._load_locks.setdefault(path, threading.Lock())
+    
+    def _load(self, path: str, checkout: bool = False) -> _ResidentEngine:
+        """Load (or reload) a store and swap it into the pool; the caller holds the store's load lock."""
+        version = store_version(path)
+        engine = RepoSearchEngine(path, model_name=self.model_name, model=self.model, query_cache=self.query_cache,
+                                  reranker=self.reranker)
+        resident = _ResidentEngine(engine, version)
+        if checkout:
+            resident.users = 1
+        
+        with self._lock:
+            previous = self._engines.get(path)
+            self._engines[path] = resident
+            if previous is not None:
+                self._retire(previous)
+        return resident
+    
+    def _retire(self, resident: _ResidentEngine):
+        """Mark an engine that left the pool for closing; the caller holds _lock."""
+        resident.retired = True
+        self._close_if_unused(resident)
+    
+    def _close_if_unused(self, resident: _ResidentEngine):
+        """Close a retired engine once no request uses it; the caller holds _lock."""
+        if resident.retired and resident.users == 0:
+            resident.engine.close()
+    
+    def reload_modified(self):
+        """
+        Reload every resident store that was rewritten since it was loaded.
+        
+        Queries keep using the previous engine until the new one is ready.
+        """
+        with self._lock:
+            loaded = [(path, resident.version) for path, resident in self._engines.items()]
+        
+        for path, version in loaded:
+            try:
+                with self._load_lock(path):
+                    if not os.path.exists(path):
+                        print(f"Store removed from disk, unloading: {path}")
+                        with self._lock:
+                            resident = self._engines.pop(path, None)
+                            if resident is not None:
+                                self._retire(resident)
+                        continue
+                    
+                    if store_version(path) != version:
+                        print(f"Store changed on disk, reloading: {path}")
+                        self._load(path)
+            except Exception as e:
+                # Keep serving the old engine if the new file is half-written or broken
+                print(f"Warning: Could not reload store {path}: {e}")
+    
+    def start_watcher(self):
+        """Start the background thread that hot-reloads modified stores."""
+        if self.watch_interval <= 0 or self._watcher is not None:
+            return
+        
+        def watch():
+            while not self._stop.wait(self.watch_interval):
+                self.reload_modified()
+        
+        self._watcher = threading.Thread(target=watch, name="store-watcher", daemon=True)
+        self._watcher.start()
+    
+    @contextmanager
+    def federated(self, stores) -> Iterator[FederatedSearchEngine]:
+        """
+        Check out a federated engine over several stores, loading them on first use.
+        
+        Args:
+            stores: Store paths relative to the store root, as a list or comma-separated string
+        
+        Yields:
+            FederatedSearchEngine over the resident engines
+        """
+        if isinstance(stores, str):
+            stores = [store for store in stores.split(",") if store.strip()]
+        with ExitStack() as checked_out:
+            engines = {store: checked_out.enter_context(self.engine(store)) for store in stores}
+            yield FederatedSearchEngine(engines, executor=self.executor)
+    
+    def stop(self):
+        """Stop the background watcher and the search threads, and close the resident engines."""
+        self._stop.set()
+        self.executor.shutdown(wait=False)
+        with self._lock:
+            for resident in self._engines.values():
+                self._retire(resident)
+            self._engines.clear()
+    
+    def loaded_stores(self) -> Dict[str, int]:
+        """
+        Get the resident stores and their file counts.
+        
+        Returns:
+            Mapping of store path (relative to the root) to number of files
+        """
+        with self._lock:
+            return {
+                os.path.relpath(path, self.store_root): resident.engine.get_file_count()
+                for path, resident in self._engines.items()
+            }
+
+
+def _flag(value) -> bool:
+    """Interpret a boolean request parameter given as JSON or as a query string value."""
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def handle_request(pool: StorePool, endpoint: str, params: Dict) -> Tuple[int, object]:
+    """
+    Dispatch one API call against the store pool.
+    
+    Args:
+        pool: StorePool holding the resident engines
+        endpoint: Endpoint name, e.g. 'search' or 'file'
+        params: Request parameters
+    
+    Returns:
+        Tuple of (HTTP status code, JSON-serializable body)
+    """
+    if endpoint == "health":
+        return 200, {"status": "ok", "stores": pool.loaded_stores(), "query_cache": pool.query_cache.stats(),
+                     "models": model_stats()}
+    
+    try:
+        top_k = int(params.get("top_k", 5))
+        min_score = float(params["min_score"]) if params.get("min_score") is not None else None
+        include_content = _flag(params.get("include_content"))
+        
+        if endpoint == "search":
+            with pool.engine(params.get("store")) as engine:
+                return 200, _truncate(engine.search(params["query"], top_k, min_score, include_content))
+        
+        if endpoint == "search_batch":
+            with pool.engine(params.get("store")) as engine:
+                queries = params["queries"]
+                if isinstance(queries, str):
+                    queries = [q for q in queries.split("\n") if q.strip()]
+                batch_results = engine.search_batch(queries, top_k, min_score, include_content)
+                return 200, [_truncate(results) for results in batch_results]
+        
+        if endpoint == "search_multi":
+            with pool.federated(params["stores"]) as engine:
+                return 200, _truncate(engine.search(params["query"], top_k, min_score, include_content))
+        
+        if endpoint == "search_by_keyword":
+            with pool.engine(params.get("store")) as engine:
+                return 200, _truncate(engine.search_by_keyword(params["keyword"], top_k, include_content))
+        
+        if endpoint == "search_combined":
+            with pool.engine(params.get("store")) as engine:
+                results = engine.search_combined(
+                    params["query"],
+                    keyword=params.get("keyword"),
+                    top_k=top_k,
+                    vector_weight=float(params.get("vector_weight", 0.7)),
+                    fusion=params.get("fusion", "weighted"),
+                    rerank=_flag(params.get("rerank")),
+                    include_content=include_content
+                )
+                return 200, _truncate(results)
+        
+        if endpoint == "file":
+            with pool.engine(params.get("store")) as engine:
+                result = engine.get_file_by_path(params["path"])
+                if result is None:
+                    return 404, {"error": f"File not found: {params['path']}"}
+                return 200, result
+        
+        if endpoint == "files":
+            with pool.engine(params.get("store")) as engine:
+                paths = params["paths"]
+                if isinstance(paths, str):
+                    paths = paths.split(",")
+                return 200, _truncate(engine.get_files_by_paths(paths))
+        
+        if endpoint == "list":
+            with pool.engine(params.get("store")) as engine:
+                if "directory" in params:
+                    return 200, engine.list_directory(params["directory"])
+                return 200, engine.list_files(params.get("prefix", ""))
+        
+        if endpoint == "glob":
+            with pool.engine(params.get("store")) as engine:
+                return 200, engine.glob_files(params["pattern"])
+    
+    except KeyError as e:
+        return 400, {"error": f"Missing parameter: {e.args[0]}"}
+    except FileNotFoundError as e:
+        return 404, {"error": str(e)}
+    except ValueError as e:
+        return 400, {"error": str(e)}
+    except Exception as e:
+        return 500, {"error": str(e)}
+    
+    return 404, {"error": f"Unknown endpoint: {endpoint}"}
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler exposing the store pool.
+    
+    GET takes parameters from the query string, POST from a JSON body.
+    """
+    
+    pool: StorePool = None
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self._respond(*handle_request(self.pool, url.path.strip("/"), params))
+    
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("Request body must be a JSON object")
+        except ValueError as e:
+            self._respond(400, {"error": f"Invalid JSON body: {e}"})
+            return
+        self._respond(*handle_request(self.pool, url.path.strip("/"), params))
+    
+    def _respond(self, status: int, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        # Per-request access logs are too noisy for a query server
+        pass
+
+
+def serve(store_root: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          preload=None, model_name: str = DEFAULT_MODEL, watch_interval: float = 2.0,
+          reranker_name: str = None, backend: str = None, quantize: bool = None):
+    """
+    Run the search server until interrupted.
+    
+    Args:
+        store_root: Directory containing the repository stores
+        host: Interface to bind (defaults to localhost only)
+        port: Port to listen on
+        preload: Optional list of store paths to load before accepting queries
+        model_name: Name of the sentence-transformers model
+        watch_interval: Seconds between checks for modified stores
+        reranker_name: Optional cross-encoder model for reranked combined searches
+        backend: Model backend ('torch', 'onnx' or 'openvino')
+        quantize: Whether to quantize the model to int8 for CPU inference
+    """
+    pool = StorePool(store_root, model_name=model_name, watch_interval=watch_interval, reranker_name=reranker_name,
+                     backend=backend, quantize=quantize)
+    
+    for store in preload or []:
+        pool.load(store)
+    
+    pool.start_watcher()
+    
+    handler = type("BoundSearchRequestHandler", (SearchRequestHandler,), {"pool": pool})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Repository search server listening on http://{host}:{port} (stores in {pool.store_root})")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down search server...")
+    finally:
+        pool.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Serve repository stores for low-latency search")
+    parser.add_argument("store_root", help="Directory containing repository stores")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--preload", nargs="*", default=[], help="Stores to load at startup")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--watch-interval", type=float, default=2.0,
+                        help="Seconds between checks for modified stores (0 disables)")
+    parser.add_argument("--reranker", default=None,
+                        help="Cross-encoder model for combined searches with rerank=true")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Model inference backend (default: torch, or REPO_SEARCH_MODEL_BACKEND)")
+    parser.add_argument("--quantize", action="store_true", default=None,
+                        help="Quantize the model to int8 for CPU inference")
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.store_root):
+        print(f"Store root is not a directory: {args.store_root}")
+        sys.exit(1)
+    
+    serve(args.store_root, args.host, args.port, args.preload, args.model, args.watch_interval, args.reranker,
+          args.backend, args.quantize)
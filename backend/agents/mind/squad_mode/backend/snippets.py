@@ -0,0 +1,114 @@
+"""
+Snippet Extraction Module
+
+This module cuts the part of a file worth showing for a search hit, so results
+can carry a few lines instead of the whole file:
+- Vector hits use the line range of the best-matching chunk
+- Keyword hits use the window around the line with the most keyword matches
+"""
+
+from typing import Dict, List
+
+from keyword_index import tokenize
+
+
+# Snippets are cut to this many lines / characters
+SNIPPET_MAX_LINES = 12
+SNIPPET_MAX_CHARS = 800
+
+# Lines shown before a keyword match
+SNIPPET_CONTEXT_LINES = 2
+
+
+def line_window(content: str, start_line: int, end_line: int) -> Dict[str, any]:
+    """
+    Cut a range of lines out of a file, capped at SNIPPET_MAX_LINES / SNIPPET_MAX_CHARS.
+    
+    Args:
+        content: File content
+        start_line: First line (1-based)
+        end_line: Last line (1-based, inclusive)
+    
+    Returns:
+        Dictionary with 'start_line', 'end_line' and 'text' keys describing the
+        lines actually included
+    """
+    start_line = max(1, start_line)
+    end_line = max(start_line, min(end_line, start_line + SNIPPET_MAX_LINES - 1))
+    
+    # Find the lines by scanning for newlines rather than splitting the whole file
+    pos = 0
+    for _ in range(start_line - 1):
+        newline = content.find("\n", pos)
+        if newline == -1:
+            return {"start_line": start_line, "end_line": start_line, "text": ""}
+        pos = newline + 1
+    
+    end = pos
+    for _ in range(end_line - start_line + 1):
+        newline = content.find("\n", end)
+        if newline == -1:
+            end = len(content)
+            break
+        end = newline + 1
+    
+    text = content[pos:end].rstrip("\n")[:SNIPPET_MAX_CHARS]
+    return {"start_line": start_line, "end_line": start_line + text.count("\n"), "text": text}
+
+
+def chunk_snippet(content: str, chunk_hits: List[Dict[str, any]]) -> Dict[str, any]:
+    """
+    Snippet of a vector hit: the lines of its best-matching chunk.
+    
+    Args:
+        content: File content
+        chunk_hits: Chunk hits of the file, best first
+    
+    Returns:
+        Snippet dictionary as returned by line_window()
+    """
+    if not chunk_hits:
+        return line_window(content, 1, SNIPPET_MAX_LINES)
+    return line_window(content, chunk_hits[0]["start_line"], chunk_hits[0]["end_line"])
+
+
+def keyword_snippet(content: str, keyword: str) -> Dict[str, any]:
+    """
+    Snippet of a keyword hit: the window around the line matching the most keyword tokens.
+    
+    Tokens are matched as case-insensitive substrings, as in keyword search; a
+    keyword without tokens (e.g. '=>') is matched as a whole.
+    Files without a matching line (e.g. path-only matches) get their first lines.
+    
+    Args:
+        content: File content
+        keyword: Keyword or query text
+    
+    Returns:
+        Snippet dictionary as returned by line_window()
+    """
+    tokens = set(tokenize(keyword)) or ({keyword.lower()} if keyword.strip() else set())
+    lowered = content.lower()
+    
+    # Count matches per line, walking the match positions in order so newlines are counted once
+    positions = []
+    for token in tokens:
+        pos = lowered.find(token)
+        while pos != -1:
+            positions.append(pos)
+            pos = lowered.find(token, pos + 1)
+    positions.sort()
+    
+    line_hits = {}
+    line, prev = 1, 0
+    for pos in positions:
+        line += lowered.count("\n", prev, pos)
+        prev = pos
+        line_hits[line] = line_hits.get(line, 0) + 1
+    
+    if not line_hits:
+        return line_window(content, 1, SNIPPET_MAX_LINES)
+    
+    best_line = max(line_hits, key=lambda line: (line_hits[line], -line))
+    start_line = max(1, best_line - SNIPPET_CONTEXT_LINES)
+    return line_window(content, start_line, start_line + SNIPPET_MAX_LINES - 1)
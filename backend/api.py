@@ -1,6 +1,8 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
 import json
 import os
 import subprocess
@@ -21,7 +23,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-STATUS_PATH = "/Users/psiadmin/clawd/workspace/whitebox-dashboard/frontend/public/status.json"
 COMMANDS_LOG = "/Users/psiadmin/clawd/workspace/whitebox-dashboard/commands.log"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(BASE_DIR, "../../simpliautomate_new/.env")
@@ -34,6 +35,12 @@ if GEMINI_API_KEY:
 MODEL_NAME = "gemini-1.5-flash" 
 
 from bridge import bridge
+from status_store import StatusStore
+from state_stream import StateBroadcaster
+
+# The API server owns the dashboard state; other components mutate it through /state/mutations
+store = StatusStore()
+broadcaster = StateBroadcaster(store)
 
 class ActionRequest(BaseModel):
     review_id: str
@@ -45,6 +52,9 @@ class SkillRequest(BaseModel):
 class ChatRequest(BaseModel):
     message: str
 
+class MutationRequest(BaseModel):
+    ops: List[Dict[str, Any]]
+
 async def process_chat_logic(msg):
     # 1. Detect Repository URL
     repo_match = re.search(r'https://github\.com/[\w.-]+/([\w.-]+)', msg)
@@ -53,13 +63,6 @@ async def process_chat_logic(msg):
         repo_url = repo_match.group(0)
         repo_name = repo_match.group(1)
         
-        # Load status safely
-        try:
-            with open(STATUS_PATH, 'r') as f:
-                data = json.load(f)
-        except:
-            data = {"workflow": {"history": []}}
-
         # Mission Log
         log_entries = [
             f"🚀 [SQUAD MISSION]: Expansion Protocol Initiated for {repo_name}",
@@ -67,8 +70,7 @@ async def process_chat_logic(msg):
             f"🛡️ [SECURITY]: Scanning codebase for vulnerabilities..."
         ]
         
-        for entry in log_entries:
-            data["workflow"]["history"].insert(0, entry)
+        await asyncio.to_thread(store.apply, [{"op": "add_history", "entry": entry} for entry in log_entries])
             
         ai_response = f"Repository **{repo_name}** detected. ⬜\n\nI have initiated the **SquadRun Expansion Protocol**."
 
@@ -90,16 +92,10 @@ async def process_chat_logic(msg):
                 response = await asyncio.to_thread(model.generate_content, prompt)
                 if response.text:
                     ai_response += "\n\n" + response.text
-                    data["workflow"]["history"].insert(0, f"🧠 [CORTEX]: Mission plan generated by {MODEL_NAME}.")
+                    await asyncio.to_thread(store.apply, [{"op": "add_history", "entry": f"🧠 [CORTEX]: Mission plan generated by {MODEL_NAME}."}])
             except Exception as ai_e:
                 print(f"Gemini generation failed: {ai_e}")
                 ai_response += "\n\n(Neural Link unstable - reverting to default protocol)"
-        
-        # Save status safely
-        tmp_path = STATUS_PATH + ".tmp"
-        with open(tmp_path, 'w') as f:
-            json.dump(data, f, indent=4)
-        os.rename(tmp_path, STATUS_PATH)
 
         try:
             subprocess.Popen([
@@ -190,28 +186,65 @@ async def handle_learning(request: SkillRequest):
 @app.post("/action")
 async def handle_action(request: ActionRequest):
     try:
-        with open(STATUS_PATH, 'r') as f:
-            data = json.load(f)
-        found_review = None
-        if "reviews" in data:
-            for r in data["reviews"]:
-                if r["id"] == request.review_id:
-                    found_review = r
-                    break
-            if found_review:
-                data["reviews"] = [r for r in data["reviews"] if r["id"] != request.review_id]
-                log_entry = f"User {request.action.upper()}ED: {found_review['title']}"
-                data["workflow"]["history"].insert(0, log_entry)
-                with open(COMMANDS_LOG, 'a') as f:
-                    f.write(f"{datetime.now().isoformat()} | {request.review_id} | {request.action} | {found_review['title']}\n")
-                msg = f"✅ [DASHBOARD ACTION] User has {request.action.upper()}ED the deployment: {found_review['title']}"
-                subprocess.run(["openclaw", "message", "send", "--to", "1707270118", "--message", msg])
-        with open(STATUS_PATH, 'w') as f:
-            json.dump(data, f, indent=4)
+        found_review = (await asyncio.to_thread(store.apply, [{"op": "resolve_review", "review_id": request.review_id, "action": request.action}]))[0]
+        if found_review:
+            with open(COMMANDS_LOG, 'a') as f:
+                f.write(f"{datetime.now().isoformat()} | {request.review_id} | {request.action} | {found_review['title']}\n")
+            msg = f"✅ [DASHBOARD ACTION] User has {request.action.upper()}ED the deployment: {found_review['title']}"
+            subprocess.run(["openclaw", "message", "send", "--to", "1707270118", "--message", msg])
         return {"status": "success", "message": f"Action {request.action} processed for {request.review_id}"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _etag(version):
+    return f'"{version}"'
+
+def _not_modified(request: Request, etag):
+    """True if the client's If-None-Match already names this version."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+@app.get("/state")
+async def get_state(request: Request):
+    """Full state. Carries its version as ETag; answers If-None-Match with 304 while unchanged."""
+    version, body = store.serialized()
+    headers = {"ETag": _etag(version), "Cache-Control": "no-cache"}
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/state/changes")
+async def get_state_changes(request: Request, since: Optional[int] = None):
+    """Only the top-level sections changed after version `since` (all of them if it is omitted or unknown)."""
+    etag = _etag(store.seq)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    changes = store.changes_since(since)
+    headers["ETag"] = _etag(changes["version"])
+    return Response(content=json.dumps(changes), media_type="application/json", headers=headers)
+
+@app.post("/state/mutations")
+async def mutate_state(request: MutationRequest):
+    try:
+        return {"results": await asyncio.to_thread(store.apply, request.ops)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/state/stream")
+async def stream_state(request: Request):
+    """Server-Sent Events: a 'snapshot' event on connect, then 'patch' events (JSON Patch) as the state changes."""
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(broadcaster.stream(request), media_type="text/event-stream", headers=headers)
+
+@app.post("/state/compact")
+async def compact_state():
+    seq = await asyncio.to_thread(store.compact)
+    return {"status": "success", "event_seq": seq}
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "message": "Universal Neural Bridge is operational"}
@@ -228,9 +261,16 @@ async def nonstop_loop():
 
 @app.on_event("startup")
 async def startup_event():
+    store.start()
+    broadcaster.start()
     # Start the Nonstop background loop
     asyncio.create_task(nonstop_loop())
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    broadcaster.stop()
+    store.stop()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=35002)
@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import datetime
+
+from json_recovery import atomic_write
+
+# Write-ahead log of dashboard state mutations. Every batch of mutations is
+# appended as one JSON line ({"seq": n, "ts": ..., "ops": [...]}), so a write
+# costs the size of the event rather than the whole document. Snapshots record
+# the last seq they include; on restart the records after it are replayed.
+# Each append is fsync'd before it returns, so an acknowledged mutation
+# survives a crash or power loss; that costs one disk sync per batch.
+
+
+def event_log_path(status_path):
+    """Log file kept next to a status file (status.json -> status.events.jsonl)."""
+    return os.path.splitext(status_path)[0] + ".events.jsonl"
+
+
+class EventLog:
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def append(self, seq, ops):
+        """Append one batch of mutations and sync it to disk."""
+        record = json.dumps({"seq": seq, "ts": datetime.now().isoformat(), "ops": ops}, ensure_ascii=False, separators=(",", ":"))
+        f = self._open()
+        f.write(record.encode("utf-8") + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    def tell(self):
+        """Current end of the log, to pass to discard_before() once a snapshot covers it."""
+        return self._open().tell()
+
+    def _scan(self):
+        """Complete records as (seq, ops, end offset), the offset reading stopped at, and the file size."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0, 0
+
+        records = []
+        pos = 0
+        while pos < len(data):
+            end = data.find(b"\n", pos)
+            if end == -1:
+                break
+            try:
+                record = json.loads(data[pos:end])
+                records.append((record["seq"], record["ops"], end + 1))
+            except (ValueError, KeyError, TypeError):
+                break
+            pos = end + 1
+        return records, pos, len(data)
+
+    def records(self, repair=False):
+        """
+        Read every complete record in order, as (seq, ops) pairs.
+
+        Reading stops at the first torn or unparsable line, which is what a
+        crash in the middle of an append leaves behind. With repair=True that
+        tail is cut off so new records are not appended after it.
+        """
+        records, pos, size = self._scan()
+        if pos < size:
+            print(f"Event log {self.path} has a damaged tail after {len(records)} records ({size - pos} bytes).")
+            if repair:
+                self.close()
+                os.truncate(self.path, pos)
+        return [(seq, ops) for seq, ops, _ in records]
+
+    def discard_before(self, offset):
+        """Drop the records before a log offset, keeping any appended after it."""
+        f = self._open()
+        f.flush()
+        with open(self.path, 'rb') as src:
+            src.seek(offset)
+            tail = src.read()
+        self.close()
+        atomic_write(self.path, tail)
+
+    def discard_through(self, seq):
+        """Drop the records up to and including seq."""
+        offset = 0
+        for record_seq, _, end in self._scan()[0]:
+            if record_seq > seq:
+                break
+            offset = end
+        if offset:
+            self.discard_before(offset)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
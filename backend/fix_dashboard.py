@@ -1,32 +1,27 @@
 import json
-import os
 
-STATUS_PATH = "/Users/psiadmin/clawd/workspace/whitebox-dashboard/public/status.json"
+from json_recovery import atomic_write_json, load_json
+from status_store import STATUS_PATH
 
 def fix_it():
     try:
-        with open(STATUS_PATH, 'r') as f:
-            raw = f.read()
-        
-        # Look for the double closing brace at the very end
-        if raw.endswith('}\n}'):
-            fixed = raw[:-2]
-            with open(STATUS_PATH, 'w') as f:
-                f.write(fixed)
-            print("SUCCESS: Fixed trailing extra data in status.json")
-        elif raw.count('}') > raw.count('{'):
-            # More aggressive search for the break point
-            fixed = raw.strip()
-            while fixed.endswith('}') and fixed.count('}') > fixed.count('{'):
-                fixed = fixed[:-1].strip()
-            
-            # Verify valid JSON
-            json.loads(fixed)
-            with open(STATUS_PATH, 'w') as f:
-                f.write(fixed)
-            print("SUCCESS: Repaired JSON structure in status.json")
-        else:
+        try:
+            with open(STATUS_PATH, 'r') as f:
+                json.load(f)
             print("INFO: JSON structure appears balanced.")
+            return
+        except (OSError, ValueError) as e:
+            print(f"status.json is damaged or missing ({e}).")
+
+        # Last complete status object in the file (trailing extra braces, concatenated
+        # writes), or the newest usable backup generation
+        data = load_json(STATUS_PATH, validate=lambda d: "agents" in d)
+        if data is None:
+            print("ERROR: No usable status object in status.json or its backups.")
+            return
+
+        atomic_write_json(STATUS_PATH, data)
+        print("SUCCESS: Repaired JSON structure in status.json")
     except Exception as e:
         print(f"ERROR: {e}")
 
@@ -1,68 +1,34 @@
 import sys
 import os
 import asyncio
-import json
 import subprocess
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from status_client import mutate
+
 # Setup environment
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STATUS_PATH = os.path.join(BASE_DIR, "../frontend/public/status.json")
 AGENTS_DIR = os.path.join(BASE_DIR, "agents/mind")
 ENV_PATH = os.path.join(BASE_DIR, "../../simpliautomate_new/.env")
 
 load_dotenv(ENV_PATH)
 
-def repair_json(p):
-    try:
-        with open(p, 'r') as f:
-            c = f.read()
-        for i in range(len(c), 0, -1):
-            try:
-                data = json.loads(c[:i])
-                with open(p, 'w') as f:
-                    json.dump(data, f, indent=4)
-                return data
-            except:
-                continue
-    except:
-        return None
-
 def update_status(topic, target_agent=None, status="processing", scraped_raw=None, learnings=None):
     try:
-        data = repair_json(STATUS_PATH)
-        if not data: return
-        
-        if "learning_missions" not in data:
-            data["learning_missions"] = []
-            
-        found = False
-        for m in data["learning_missions"]:
-            if m["topic"] == topic:
-                m["status"] = status
-                if target_agent: m["target_agent"] = target_agent
-                if scraped_raw: m["scraped_raw"] = scraped_raw
-                if learnings: m["learnings"] = learnings
-                found = True
-                break
-        
-        if not found:
-            data["learning_missions"].insert(0, {
-                "topic": topic,
-                "status": status,
-                "target_agent": target_agent,
-                "scraped_raw": scraped_raw,
-                "learnings": learnings,
-                "timestamp": datetime.now().isoformat()
-            })
-        
-        data["learning_missions"] = data["learning_missions"][:5]
+        mission = {"topic": topic, "status": status}
+        if target_agent: mission["target_agent"] = target_agent
+        if scraped_raw: mission["scraped_raw"] = scraped_raw
+        if learnings: mission["learnings"] = learnings
         
-        with open(STATUS_PATH, 'w') as f:
-            json.dump(data, f, indent=4)
+        mutate({"op": "upsert_learning_mission", "mission": mission, "defaults": {
+            "target_agent": target_agent,
+            "scraped_raw": scraped_raw,
+            "learnings": learnings,
+            "timestamp": datetime.now().isoformat()
+        }})
     except Exception as e:
         print(f"Status update failed: {e}")
 
@@ -127,11 +93,7 @@ async def execute_mission(payload):
             
         update_status(topic, target_agent=best_agent, status="completed")
         
-        data = repair_json(STATUS_PATH)
-        if data:
-            data["workflow"]["history"].insert(0, f"AGENT {best_agent} UPGRADED: {topic}")
-            with open(STATUS_PATH, 'w') as f:
-                json.dump(data, f, indent=4)
+        mutate({"op": "add_history", "entry": f"AGENT {best_agent} UPGRADED: {topic}"})
         print(f"✅ Mission Complete: {topic} ingested into {best_agent}")
     except Exception as e:
         print(f"Final ingestion failed: {e}")
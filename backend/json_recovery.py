@@ -0,0 +1,216 @@
+import json
+import os
+import re
+import shutil
+import stat
+import tempfile
+import threading
+import uuid
+
+# Crash-safe reading and writing of JSON state files.
+#
+# Writes go to a temporary file that is fsync'd and renamed over the target,
+# after the previous version is kept as a backup generation (status.json.1,
+# status.json.2, ...). Reads that hit a damaged file recover the last complete
+# top-level object in one linear pass, then fall back to the backups. Nothing
+# is rewritten on read.
+
+BACKUP_GENERATIONS = 3
+
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+
+# Shifting backup generations takes several renames; writers in this process take turns
+_rotate_lock = threading.Lock()
+
+
+def backup_path(path, generation):
+    return f"{path}.{generation}"
+
+
+def document_spans(text):
+    """
+    (start, end) offsets of the balanced top-level objects/arrays in text, in order.
+
+    One pass: the scan jumps between brackets and quotes, skips string
+    contents (and the brackets inside them) whole, and ignores stray closing
+    brackets such as a duplicated trailing '}'. A document cut off mid-way
+    has no span.
+    """
+    spans = []
+    depth = 0
+    start = 0
+    pos = 0
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            return spans
+        i = match.start()
+        char = text[i]
+
+        if char == '"':
+            # Find the closing quote: the next one not preceded by an odd number of backslashes
+            end = i + 1
+            while True:
+                end = text.find('"', end)
+                if end == -1:
+                    return spans
+                backslashes = end - 1
+                while text[backslashes] == '\\':
+                    backslashes -= 1
+                if (end - 1 - backslashes) % 2 == 0:
+                    break
+                end += 1
+            pos = end + 1
+            continue
+
+        if char in '{[':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i + 1))
+        pos = i + 1
+
+
+def recover_json(text, validate=None):
+    """
+    Last complete top-level object in text that parses (and passes validate), or None.
+
+    Handles trailing junk, duplicated closing braces and several concatenated
+    documents (a second writer appending). Each candidate span is parsed at
+    most once and spans do not overlap, so the total work is linear in the
+    size of the text.
+    """
+    for start, end in reversed(document_spans(text)):
+        try:
+            data = json.loads(text[start:end])
+        except ValueError:
+            continue
+        if isinstance(data, dict) and (validate is None or validate(data)):
+            return data
+    return None
+
+
+def _read_document(path, validate):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict) and (validate is None or validate(data)):
+            return data, False
+    except ValueError:
+        pass
+    return recover_json(text, validate), True
+
+
+def load_json(path, validate=None, backups=BACKUP_GENERATIONS):
+    """
+    Read a JSON object from a file, recovering from damage.
+
+    Tries the file itself (recovering the last complete object if it does not
+    parse), then each backup generation, newest first.
+
+    Args:
+        path: File to read
+        validate: Optional check a recovered object must pass, e.g. that required keys exist
+        backups: Number of backup generations to fall back to
+
+    Returns:
+        The object, or None if neither the file nor any backup holds a usable one.
+        A missing file with no backups also gives None.
+    """
+    for generation in range(backups + 1):
+        candidate = path if generation == 0 else backup_path(path, generation)
+        try:
+            data, recovered = _read_document(candidate, validate)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            print(f"Could not read {candidate}: {e}")
+            continue
+        if data is not None:
+            if recovered or generation:
+                print(f"Recovered {path} from {'damaged ' if recovered else ''}{candidate}.")
+            return data
+        print(f"{candidate} holds no usable JSON object.")
+    return None
+
+
+def _fsync_directory(path):
+    try:
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _rotate_backups(path, backups):
+    """Shift path.1 -> path.2 ... and keep the current file as path.1, without ever removing path."""
+    for generation in range(backups, 1, -1):
+        try:
+            os.replace(backup_path(path, generation - 1), backup_path(path, generation))
+        except FileNotFoundError:
+            # Not there yet, or just shifted by a writer in another process
+            pass
+    newest = backup_path(path, 1)
+    # Unique per call, so concurrent writers never share a temporary name
+    tmp_link = f"{newest}.{uuid.uuid4().hex}.tmp"
+    try:
+        try:
+            os.link(path, tmp_link)
+        except OSError:
+            # No hard links on this filesystem
+            shutil.copy2(path, tmp_link)
+        os.replace(tmp_link, newest)
+    finally:
+        if os.path.exists(tmp_link):
+            os.remove(tmp_link)
+
+
+def atomic_write(path, data, backups=0):
+    """
+    Replace a file so that readers and crashes only ever see the old or the new content.
+
+    The new content goes to a temporary file unique to this call, which is
+    fsync'd before the rename; the directory is fsync'd after it.
+
+    Args:
+        path: File to write
+        data: str or bytes
+        backups: Number of previous versions to keep as path.1 ... path.N
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            # mkstemp creates the file private to its owner; keep the mode the file had
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o644
+            os.fchmod(f.fileno(), mode)
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+            f.flush()
+            os.fsync(f.fileno())
+        with _rotate_lock:
+            if backups and os.path.exists(path):
+                _rotate_backups(path, backups)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(path)
+
+
+def atomic_write_json(path, data, backups=BACKUP_GENERATIONS):
+    """Serialize data (unless it already is a JSON string) and write it with atomic_write()."""
+    atomic_write(path, data if isinstance(data, str) else json.dumps(data), backups)
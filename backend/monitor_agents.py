@@ -7,8 +7,8 @@ import os
 import signal
 from datetime import datetime
 
-# Dashboard and monitor both read from this root-level status file.
-STATUS_PATH = "/Users/psiadmin/clawd/workspace/whitebox-dashboard/frontend/public/status.json"
+from status_client import get_state, mutate
+
 ALERT_STATE_PATH = "/Users/psiadmin/clawd/memory/token_alerts.json"
 DAILY_LIMIT = 1000000 # Default 1M tokens, can be adjusted
 
@@ -112,7 +112,8 @@ def get_actual_tokens():
     return round(total / 1000, 1), agent_map
 
 def generate_chatter_event(data):
-    """Generates a chatter event directly into the data object."""
+    """Generates a chatter event as state mutations."""
+    ops = []
     try:
         tasks = data.get("tasks", [])
         executions = data.get("executions", [])
@@ -168,7 +169,7 @@ def generate_chatter_event(data):
             if random.random() < 0.5:
                 vibe = random.choice(SQUAD_VIBES)
                 log_entry = f"✨ [VIBE CHECK]: {vibe}"
-                data["head"]["squad_vibe"] = vibe
+                ops.append({"op": "set_head", "fields": {"squad_vibe": vibe}})
             else:
                 facts = [
                     "Fact: Cortex is processing neural maps for the next expansion mission.",
@@ -178,164 +179,96 @@ def generate_chatter_event(data):
                 ]
                 log_entry = f"💡 [SQUAD INTEL]: {random.choice(facts)}"
 
-        # Add to history
-        if "workflow" not in data: data["workflow"] = {"history": []}
-        data["workflow"]["history"].insert(0, log_entry)
-        
-        # Keep history manageable
-        data["workflow"]["history"] = data["workflow"]["history"][:25]
+        # Add to history (the store keeps it to the latest 25 entries)
+        ops.append({"op": "add_history", "entry": log_entry})
         
         print(f"Live Event: {log_entry}")
-        return data
+        return ops
         
     except Exception as e:
         print(f"Chatter generation failed: {e}")
-        return data
+        return []
 
 def reset_status_file():
-    """Resets the status file to a default valid state if corrupted."""
+    """Resets the dashboard state to its defaults if it is unusable."""
     print("⚠️ Resetting status.json to default state...")
-    default_data = {
-        "head": {
-            "last_active": datetime.now().isoformat(),
-            "daily_mvp": "Pilot",
-            "squad_vibe": "SYSTEM ONLINE"
-        },
-        "agents": [
-            {"name": "White Box", "role": "Coordinator", "status": "active", "metrics": {"success_rate": 99, "tokens": 0, "points": 500}, "enhancements": {"fidelity": 100, "efficiency": 100, "autonomy": 100}},
-            {"name": "Cortex", "role": "Brain", "status": "active", "metrics": {"success_rate": 98, "tokens": 0}, "enhancements": {"fidelity": 95, "efficiency": 90, "autonomy": 92}},
-            {"name": "COUNCIL", "role": "Meeting Sentry", "status": "idle", "metrics": {"success_rate": 97, "tokens": 0}, "enhancements": {"fidelity": 90, "efficiency": 85, "autonomy": 88}},
-            {"name": "Pilot", "role": "Implementation", "status": "active", "metrics": {"success_rate": 96, "tokens": 0}, "enhancements": {"fidelity": 88, "efficiency": 95, "autonomy": 90}},
-            {"name": "Correspondent", "role": "Ghostwriter", "status": "active", "metrics": {"success_rate": 95, "tokens": 0}, "enhancements": {"fidelity": 92, "efficiency": 89, "autonomy": 85}},
-            {"name": "Strategist", "role": "Market Intel", "status": "idle", "metrics": {"success_rate": 94, "tokens": 0}, "enhancements": {"fidelity": 91, "efficiency": 87, "autonomy": 86}},
-            {"name": "Auditor", "role": "Integrity & QA", "status": "active", "metrics": {"success_rate": 99, "tokens": 0}, "enhancements": {"fidelity": 98, "efficiency": 85, "autonomy": 95}},
-            {"name": "Enhancer", "role": "UX/UI Design", "status": "idle", "metrics": {"success_rate": 93, "tokens": 0}, "enhancements": {"fidelity": 89, "efficiency": 90, "autonomy": 87}},
-            {"name": "Insight", "role": "Data Analyst", "status": "idle", "metrics": {"success_rate": 96, "tokens": 0}, "enhancements": {"fidelity": 94, "efficiency": 92, "autonomy": 91}},
-            {"name": "Promoter", "role": "Social Media", "status": "idle", "metrics": {"success_rate": 92, "tokens": 0}, "enhancements": {"fidelity": 85, "efficiency": 88, "autonomy": 84}},
-            {"name": "Nonstop", "role": "Data Maintenance", "status": "active", "metrics": {"success_rate": 100, "tokens": 0}, "enhancements": {"fidelity": 99, "efficiency": 100, "autonomy": 100}}
-        ],
-        "workflow": {
-            "history": ["💡 [SYSTEM]: Dashboard monitor initialized. Waiting for agent pulse..."]
-        },
-        "tasks": [],
-        "executions": [],
-        "projects": []
-    }
     try:
-         with open(STATUS_PATH, 'w') as f:
-            json.dump(default_data, f, indent=4)
+        mutate({"op": "reset"})
     except Exception as e:
         print(f"Failed to reset status file: {e}")
 
 def update_status():
     print("🚀 Agent Monitor & Chatter System Started")
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(STATUS_PATH), exist_ok=True)
-    
-    # Initial file check
-    if not os.path.exists(STATUS_PATH):
-        reset_status_file()
 
     last_chatter_time = time.time()
     
     while True:
         try:
             # 1. READ STATUS
-            data = None
-            try:
-                with open(STATUS_PATH, 'r') as f:
-                    content = f.read().strip()
-                    if not content:
-                        raise ValueError("Empty file")
-                    data = json.loads(content)
-            except (json.JSONDecodeError, ValueError, FileNotFoundError) as e:
-                print(f"Status file corrupted or missing ({e}). Resetting...")
-                reset_status_file()
+            data = get_state()
+
+            if "agents" not in data:
+                reset_status_file() # Full structure reset strongly preferred
                 time.sleep(1)
                 continue
 
             # 2. UPDATE METRICS
             total_tokens, agent_token_map = get_actual_tokens()
-            data["head"]["last_active"] = datetime.now().isoformat()
+            ops = [{"op": "set_head", "fields": {"last_active": datetime.now().isoformat()}}]
             
             # Check thresholds and notify if needed
             check_token_thresholds(total_tokens)
 
-            # Update metrics for each agent with dynamic variation
-            mvp_candidate = None
-            max_score = -1
-
-            if "agents" not in data: 
-                data["agents"] = []
-                reset_status_file() # Full structure reset strongly preferred
-                continue
-
+            # Update metrics for each agent with dynamic variation.
+            # Only the fields computed here are sent, so concurrent status reports are kept.
             for agent in data["agents"]:
                 agent_name_lower = agent["name"].lower()
+                metrics = {}
+                enhancements = None
                 
                 if agent_name_lower in agent_token_map:
-                    agent["metrics"]["tokens"] = round(agent_token_map[agent_name_lower] / 1000, 1)
+                    metrics["tokens"] = round(agent_token_map[agent_name_lower] / 1000, 1)
                 elif agent["name"] == "White Box":
-                    agent["metrics"]["tokens"] = total_tokens
-                    agent["metrics"]["rating"] = 5.0
+                    metrics["tokens"] = total_tokens
+                    metrics["rating"] = 5.0
                 
                 # Random small fluctuations
                 if agent["name"] != "White Box":
-                    if "enhancements" not in agent: agent["enhancements"] = {"fidelity":85, "efficiency":85, "autonomy":85}
+                    enhancements = dict(agent.get("enhancements") or {"fidelity":85, "efficiency":85, "autonomy":85})
                     
                     floor = 70 if agent.get("status") == "idle" else 85
-                    agent["enhancements"]["fidelity"] = min(100, max(floor, agent["enhancements"]["fidelity"] + random.randint(-1, 1)))
-                    agent["enhancements"]["efficiency"] = min(100, max(floor, agent["enhancements"]["efficiency"] + random.randint(-1, 1)))
-                    agent["enhancements"]["autonomy"] = min(100, max(floor, agent["enhancements"]["autonomy"] + random.randint(-1, 1)))
+                    enhancements["fidelity"] = min(100, max(floor, enhancements["fidelity"] + random.randint(-1, 1)))
+                    enhancements["efficiency"] = min(100, max(floor, enhancements["efficiency"] + random.randint(-1, 1)))
+                    enhancements["autonomy"] = min(100, max(floor, enhancements["autonomy"] + random.randint(-1, 1)))
                     
-                    avg = (agent["enhancements"]["fidelity"] + agent["enhancements"]["efficiency"] + agent["enhancements"]["autonomy"]) / 3
-                    agent["metrics"]["rating"] = round((avg / 20), 1)
+                    avg = (enhancements["fidelity"] + enhancements["efficiency"] + enhancements["autonomy"]) / 3
+                    metrics["rating"] = round((avg / 20), 1)
 
                     # Update Leaderboard Points
-                    if "points" not in agent["metrics"]:
-                        agent["metrics"]["points"] = random.randint(100, 500)
+                    points = agent.get("metrics", {}).get("points", random.randint(100, 500))
                     
                     # Performance bonus: active agents gain points faster
                     bonus = 2 if agent.get("status") == "active" else 1
-                    agent["metrics"]["points"] += random.randint(0, bonus)
+                    metrics["points"] = points + random.randint(0, bonus)
 
-                    if avg > max_score:
-                        max_score = avg
-                        mvp_candidate = agent["name"]
-
-            # Sort agents by points (Leaderboard logic)
-            sub_agents = [a for a in data["agents"] if a["name"] != "White Box"]
-            sub_agents.sort(key=lambda x: x["metrics"].get("points", 0), reverse=True)
-            
-            # Re-assemble: White Box (Head) always at top, then sorted leaderboard
-            white_box_list = [a for a in data["agents"] if a["name"] == "White Box"]
-            white_box = white_box_list[0] if white_box_list else {"name": "White Box", "role": "Coordinator", "status": "active", "metrics": {}}
-            
-            data["agents"] = [white_box] + sub_agents
+                ops.append({"op": "update_agent", "name": agent["name"], "metrics": metrics, "enhancements": enhancements})
 
-            # Leaderboard #1 is automatically the MVP
-            if sub_agents:
-                data["head"]["daily_mvp"] = sub_agents[0]["name"]
+            # Sort agents by points (Leaderboard logic): White Box (Head) always at top,
+            # and leaderboard #1 is automatically the MVP
+            ops.append({"op": "rank_agents"})
 
             # Update executions with a "pulse" log
-            if "executions" in data:
-                for exe in data["executions"]:
-                    if exe["status"] == "Running":
-                        current_time = datetime.now().strftime("%H:%M:%S")
-                        exe["log"] = f"[{current_time}] Monitoring pulse active. Thread depth optimized."
+            current_time = datetime.now().strftime("%H:%M:%S")
+            ops.append({"op": "pulse_executions", "log": f"[{current_time}] Monitoring pulse active. Thread depth optimized."})
 
             # 3. GENERATE CHATTER (If enough time passed)
             # Chatter every 10-20 seconds for a more "live" feel
             if time.time() - last_chatter_time > random.randint(10, 20):
-                data = generate_chatter_event(data)
+                ops.extend(generate_chatter_event(data))
                 last_chatter_time = time.time()
 
             # 4. WRITE STATUS
-            tmp_path = STATUS_PATH + ".tmp"
-            with open(tmp_path, 'w') as f:
-                json.dump(data, f, indent=4)
-            os.rename(tmp_path, STATUS_PATH)
+            mutate(*ops)
                 
         except Exception as e:
             print(f"Monitor update failed: {e}")
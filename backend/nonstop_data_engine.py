@@ -1,10 +1,11 @@
 import os
 import subprocess
-import json
 import logging
 import sys
 from datetime import datetime
 
+from status_client import mutate
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - NONSTOP - %(message)s')
 logger = logging.getLogger("Nonstop")
@@ -75,43 +76,35 @@ def run_full_sync():
     }
     
     # Update Dashboard Status with Dummy Data
-    status_path = "/Users/psiadmin/clawd/workspace/whitebox-dashboard/frontend/public/status.json"
     try:
-        with open(status_path, 'r') as f:
-            data = json.load(f)
-            
         success_count = sum(1 for v in results.values() if v)
         msg = f"🔄 [NONSTOP]: Ecosystem data sync complete ({success_count}/3 services updated)."
-        data["workflow"]["history"].insert(0, msg)
-        
-        # 1. Add Dummy Tasks
-        data["tasks"] = [
-            {"id": "T_001", "title": "Neural Bridge Optimization", "assigned_to": "Cortex", "priority": "High", "status": "In Progress", "deadline": "2026-02-26T18:00:00"},
-            {"id": "T_002", "title": "Social Sentiment Analysis", "assigned_to": "Promoter", "priority": "Medium", "status": "Pending", "deadline": "2026-02-27T12:00:00"},
-            {"id": "T_003", "title": "Compliance Audit: Q1", "assigned_to": "Auditor", "priority": "Critical", "status": "Active", "deadline": "2026-02-25T20:00:00"}
-        ]
-
-        # 2. Add Dummy Executions
-        data["executions"] = [
-            {"id": "E_001", "agent": "Nonstop", "task": "DATA_SYNC", "status": "Success", "start_time": datetime.now().isoformat(), "log": "Full ecosystem synchronization finalized."},
-            {"id": "E_002", "agent": "Cortex", "task": "T_001", "status": "Running", "start_time": datetime.now().isoformat(), "log": "Mapping neural pathways for bridge optimization..."}
-        ]
-
-        # 3. Add Dummy Projects
-        data["projects"] = [
-            {"name": "Project Rift", "type": "Core Engine", "status": "LIVE"},
-            {"name": "Cyber Bridge", "type": "Integration", "status": "ACTIVE"},
-            {"name": "Nano Dashboard", "type": "UI/UX", "status": "READY"}
-        ]
-
-        # Mark Nonstop as active
-        for agent in data["agents"]:
-            if agent["name"] == "Nonstop":
-                agent["status"] = "success" if success_count == 3 else "warning"
-                agent["last_action"] = "Sync: {}/3 Successful".format(success_count)
         
-        with open(status_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        mutate(
+            {"op": "add_history", "entry": msg},
+            # 1. Add Dummy Tasks
+            {"op": "set_section", "section": "tasks", "value": [
+                {"id": "T_001", "title": "Neural Bridge Optimization", "assigned_to": "Cortex", "priority": "High", "status": "In Progress", "deadline": "2026-02-26T18:00:00"},
+                {"id": "T_002", "title": "Social Sentiment Analysis", "assigned_to": "Promoter", "priority": "Medium", "status": "Pending", "deadline": "2026-02-27T12:00:00"},
+                {"id": "T_003", "title": "Compliance Audit: Q1", "assigned_to": "Auditor", "priority": "Critical", "status": "Active", "deadline": "2026-02-25T20:00:00"}
+            ]},
+            # 2. Add Dummy Executions
+            {"op": "set_section", "section": "executions", "value": [
+                {"id": "E_001", "agent": "Nonstop", "task": "DATA_SYNC", "status": "Success", "start_time": datetime.now().isoformat(), "log": "Full ecosystem synchronization finalized."},
+                {"id": "E_002", "agent": "Cortex", "task": "T_001", "status": "Running", "start_time": datetime.now().isoformat(), "log": "Mapping neural pathways for bridge optimization..."}
+            ]},
+            # 3. Add Dummy Projects
+            {"op": "set_section", "section": "projects", "value": [
+                {"name": "Project Rift", "type": "Core Engine", "status": "LIVE"},
+                {"name": "Cyber Bridge", "type": "Integration", "status": "ACTIVE"},
+                {"name": "Nano Dashboard", "type": "UI/UX", "status": "READY"}
+            ]},
+            # Mark Nonstop as active
+            {"op": "update_agent", "name": "Nonstop", "fields": {
+                "status": "success" if success_count == 3 else "warning",
+                "last_action": "Sync: {}/3 Successful".format(success_count)
+            }}
+        )
             
     except Exception as e:
         logger.error(f"Status update failed: {e}")
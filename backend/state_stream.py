@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+
+# Pushes dashboard state changes to browsers over Server-Sent Events. A client
+# gets the full state once when it connects, then JSON Patch (RFC 6902) deltas
+# as the state changes. Nothing is sent while nothing changes, apart from a
+# keepalive comment.
+
+# Changes arriving within this window are sent as one patch
+BROADCAST_INTERVAL_MS = int(os.environ.get("WHITEBOX_STREAM_INTERVAL_MS", "100"))
+
+# Messages buffered per client. A client that falls this far behind is sent a
+# fresh snapshot instead of the backlog.
+CLIENT_QUEUE_SIZE = 32
+
+KEEPALIVE_SECONDS = 15
+
+# Lists where more than this fraction of the items changed are replaced whole
+LIST_REPLACE_RATIO = 0.5
+
+_RESYNC = object()
+
+
+def _pointer(path, key):
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+
+def _prepended(old, new):
+    """Number of items put in front of old to make new (dropping items off its end), or None."""
+    for count in range(1, len(new) // 2 + 1):
+        kept = len(new) - count
+        if kept <= len(old) and new[count:] == old[:kept]:
+            return count
+    return None
+
+
+def json_diff(old, new, path=""):
+    """
+    JSON Patch turning old into new.
+
+    Objects are compared key by key and equal-length lists item by item;
+    lists with items put in front (like the history) become adds and removes.
+    Other changes replace the value at their path.
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        patch = []
+        for key in old:
+            if key not in new:
+                patch.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                patch.append({"op": "add", "path": _pointer(path, key), "value": value})
+            else:
+                patch.extend(json_diff(old[key], value, _pointer(path, key)))
+        return patch
+    if isinstance(old, list) and isinstance(new, list) and new:
+        count = _prepended(old, new)
+        if count is not None:
+            kept = len(new) - count
+            patch = [{"op": "remove", "path": _pointer(path, i)} for i in range(len(old) - 1, kept - 1, -1)]
+            patch.extend({"op": "add", "path": _pointer(path, i), "value": new[i]} for i in range(count))
+            return patch
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changed = [i for i in range(len(new)) if old[i] != new[i]]
+        if len(changed) <= len(new) * LIST_REPLACE_RATIO:
+            patch = []
+            for i in changed:
+                patch.extend(json_diff(old[i], new[i], _pointer(path, i)))
+            return patch
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class StreamClient:
+    def __init__(self, queue_size=CLIENT_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def send(self, seq, message):
+        try:
+            self.queue.put_nowait((seq, message))
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog and resend the whole state instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait((None, _RESYNC))
+
+
+class StateBroadcaster:
+    """
+    Fans state changes out to connected stream clients.
+
+    Store mutations only wake the broadcaster; it then waits for the
+    broadcast interval, diffs the state against what clients already have,
+    and serializes the patch once for every client.
+    """
+
+    def __init__(self, store, interval_ms=BROADCAST_INTERVAL_MS):
+        self.store = store
+        self.interval = interval_ms / 1000.0
+        self.clients = set()
+        self.seq, self.state = store.versioned_snapshot()
+        self._loop = None
+        self._changed = None
+        self._task = None
+
+    def start(self):
+        """Start broadcasting; call from the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.store.add_listener(self._notify)
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self.store.remove_listener(self._notify)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _notify(self):
+        # Called from whichever thread applied the mutation
+        self._loop.call_soon_threadsafe(self._changed.set)
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            await asyncio.sleep(self.interval)
+            self._changed.clear()
+
+            seq, state = self.store.versioned_snapshot()
+            patch = json_diff(self.state, state)
+            if not patch:
+                continue
+            message = _event("patch", {"from": self.seq, "seq": seq, "patch": patch})
+            self.seq, self.state = seq, state
+            for client in list(self.clients):
+                client.send(seq, message)
+
+    def snapshot_event(self):
+        return self.seq, _event("snapshot", {"seq": self.seq, "state": self.state})
+
+    async def stream(self, request):
+        """SSE body for one client: a snapshot, then patches until the client disconnects."""
+        client = StreamClient()
+        self.clients.add(client)
+        try:
+            sent_seq, message = self.snapshot_event()
+            yield message
+            while True:
+                try:
+                    seq, message = await asyncio.wait_for(client.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if message is _RESYNC:
+                    sent_seq, message = self.snapshot_event()
+                elif seq <= sent_seq:
+                    # Already included in the snapshot this client was sent
+                    continue
+                else:
+                    sent_seq = seq
+                yield message
+        finally:
+            self.clients.discard(client)
@@ -0,0 +1,69 @@
+import copy
+import os
+import requests
+
+import status_store
+
+# Components outside the API server read and change dashboard state through
+# these helpers. When the API server is not running (the connection is
+# refused) they fall back to the status file, so scripts still work
+# standalone. Other errors, timeouts included, are raised: the server may
+# still apply a request it was slow to answer, so writing the file too could
+# apply a batch twice.
+
+STATUS_API_URL = os.environ.get("WHITEBOX_API_URL", "http://127.0.0.1:35002")
+REQUEST_TIMEOUT = 2
+
+# Last state fetched and its ETag, so unchanged state costs a 304 instead of a download
+_cached = {"etag": None, "state": None}
+
+
+def mutate(*ops):
+    """
+    Apply mutations (see status_store.MUTATIONS) in one atomic batch.
+
+    Example:
+        mutate({"op": "add_history", "entry": "..."}, {"op": "set_head", "fields": {...}})
+
+    Returns the value of each op.
+    """
+    try:
+        res = requests.post(f"{STATUS_API_URL}/state/mutations", json={"ops": list(ops)}, timeout=REQUEST_TIMEOUT)
+    except requests.ConnectionError:
+        return status_store.apply_to_file(list(ops))
+    if res.status_code == 400:
+        raise ValueError(res.json().get("detail"))
+    res.raise_for_status()
+    return res.json()["results"]
+
+
+def get_state():
+    """Current dashboard state."""
+    headers = {"If-None-Match": _cached["etag"]} if _cached["etag"] else {}
+    try:
+        res = requests.get(f"{STATUS_API_URL}/state", headers=headers, timeout=REQUEST_TIMEOUT)
+        if res.status_code == 304:
+            return copy.deepcopy(_cached["state"])
+        res.raise_for_status()
+        state = res.json()
+        _cached.update(etag=res.headers.get("ETag"), state=state)
+        return copy.deepcopy(state)
+    except requests.ConnectionError:
+        return status_store.read_status()
+
+
+def get_changes(since=None):
+    """
+    Sections changed after a version, for consumers that keep their own copy.
+
+    Returns the /state/changes response: 'version', 'full', 'sections' and
+    'removed'. Pass the returned version as since on the next call.
+    """
+    try:
+        res = requests.get(f"{STATUS_API_URL}/state/changes", params={} if since is None else {"since": since}, timeout=REQUEST_TIMEOUT)
+        res.raise_for_status()
+        return res.json()
+    except requests.ConnectionError:
+        # Versions are event seqs, which the files carry too
+        state, version = status_store.recover()
+        return {"version": version, "full": True, "sections": state, "removed": []}
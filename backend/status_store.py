@@ -0,0 +1,524 @@
+import copy
+import fcntl
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from event_log import EventLog, event_log_path
+from json_recovery import BACKUP_GENERATIONS, atomic_write_json, backup_path, load_json
+
+# Single owner of the dashboard state. The API server keeps one StatusStore in
+# memory; every other component changes it through typed mutations (see
+# status_client.py) instead of rewriting status.json itself. Mutations are
+# appended to an event log (see event_log.py) and status.json is a snapshot
+# compacted from it.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATUS_PATH = os.environ.get("WHITEBOX_STATUS_PATH", os.path.join(BASE_DIR, "../frontend/public/status.json"))
+
+# Snapshots are compacted from the event log at most this often, however many mutations arrive
+SNAPSHOT_INTERVAL_MS = int(os.environ.get("WHITEBOX_STATUS_SNAPSHOT_MS", "1000"))
+
+# Key in the snapshot holding the seq of the last event it includes
+SEQ_KEY = "event_seq"
+
+HISTORY_LIMIT = 25
+TASK_LIMIT = 10
+EXECUTION_LIMIT = 10
+LEARNING_MISSION_LIMIT = 5
+
+HEAD_AGENT = "White Box"
+
+# Top-level sections of the dashboard state
+STATUS_SECTIONS = ("head", "agents", "workflow", "tasks", "executions", "projects", "reviews", "learning_missions")
+
+# Sections set_section may replace whole
+REPLACEABLE_SECTIONS = ("tasks", "executions", "projects", "reviews")
+
+
+def default_status():
+    """Fresh dashboard state, used when there is no readable status file."""
+    return {
+        "head": {
+            "last_active": datetime.now().isoformat(),
+            "daily_mvp": "Pilot",
+            "squad_vibe": "SYSTEM ONLINE"
+        },
+        "agents": [
+            {"name": "White Box", "role": "Coordinator", "status": "active", "metrics": {"success_rate": 99, "tokens": 0, "points": 500}, "enhancements": {"fidelity": 100, "efficiency": 100, "autonomy": 100}},
+            {"name": "Cortex", "role": "Brain", "status": "active", "metrics": {"success_rate": 98, "tokens": 0}, "enhancements": {"fidelity": 95, "efficiency": 90, "autonomy": 92}},
+            {"name": "COUNCIL", "role": "Meeting Sentry", "status": "idle", "metrics": {"success_rate": 97, "tokens": 0}, "enhancements": {"fidelity": 90, "efficiency": 85, "autonomy": 88}},
+            {"name": "Pilot", "role": "Implementation", "status": "active", "metrics": {"success_rate": 96, "tokens": 0}, "enhancements": {"fidelity": 88, "efficiency": 95, "autonomy": 90}},
+            {"name": "Correspondent", "role": "Ghostwriter", "status": "active", "metrics": {"success_rate": 95, "tokens": 0}, "enhancements": {"fidelity": 92, "efficiency": 89, "autonomy": 85}},
+            {"name": "Strategist", "role": "Market Intel", "status": "idle", "metrics": {"success_rate": 94, "tokens": 0}, "enhancements": {"fidelity": 91, "efficiency": 87, "autonomy": 86}},
+            {"name": "Auditor", "role": "Integrity & QA", "status": "active", "metrics": {"success_rate": 99, "tokens": 0}, "enhancements": {"fidelity": 98, "efficiency": 85, "autonomy": 95}},
+            {"name": "Enhancer", "role": "UX/UI Design", "status": "idle", "metrics": {"success_rate": 93, "tokens": 0}, "enhancements": {"fidelity": 89, "efficiency": 90, "autonomy": 87}},
+            {"name": "Insight", "role": "Data Analyst", "status": "idle", "metrics": {"success_rate": 96, "tokens": 0}, "enhancements": {"fidelity": 94, "efficiency": 92, "autonomy": 91}},
+            {"name": "Promoter", "role": "Social Media", "status": "idle", "metrics": {"success_rate": 92, "tokens": 0}, "enhancements": {"fidelity": 85, "efficiency": 88, "autonomy": 84}},
+            {"name": "Nonstop", "role": "Data Maintenance", "status": "active", "metrics": {"success_rate": 100, "tokens": 0}, "enhancements": {"fidelity": 99, "efficiency": 100, "autonomy": 100}}
+        ],
+        "workflow": {
+            "history": ["💡 [SYSTEM]: Dashboard monitor initialized. Waiting for agent pulse..."]
+        },
+        "tasks": [],
+        "executions": [],
+        "projects": []
+    }
+
+
+def load_status(path=STATUS_PATH):
+    """
+    Read a status file, or return the default state if neither it nor a backup is usable.
+
+    A damaged file is recovered in linear time (see json_recovery.py) and is not rewritten here.
+    """
+    data = load_json(path, validate=lambda d: "agents" in d)
+    if data is None:
+        if os.path.exists(path):
+            print(f"Status file {path} and its backups are unusable. Starting from defaults.")
+        return default_status()
+    return data
+
+
+def write_status(data, path=STATUS_PATH):
+    """Atomically replace the status file (fsync'd), keeping the previous versions as backups."""
+    atomic_write_json(path, data, BACKUP_GENERATIONS)
+
+
+# --- Mutations -------------------------------------------------------------
+# Each mutation changes one part of the state in place and may return a value
+# to the caller. They are the only way state changes, so concurrent producers
+# never overwrite each other's sections.
+
+def _agent_key(name):
+    return name.lower().replace(" ", "")
+
+
+def _upsert(items, key, item, limit, defaults=None, updates=None):
+    for existing in items:
+        if existing.get(key) == item.get(key):
+            existing.update(item)
+            existing.update(updates or {})
+            return existing
+    item = {**item, **{k: v for k, v in (defaults or {}).items() if k not in item}}
+    items.insert(0, item)
+    del items[limit:]
+    return item
+
+
+def add_history(state, entry):
+    """Put an entry at the top of the workflow history."""
+    history = state.setdefault("workflow", {}).setdefault("history", [])
+    history.insert(0, entry)
+    del history[HISTORY_LIMIT:]
+
+
+def set_head(state, fields):
+    """Merge fields into the head section (last_active, daily_mvp, squad_vibe)."""
+    state.setdefault("head", {}).update(fields)
+
+
+def update_agent(state, name, fields=None, metrics=None, enhancements=None):
+    """
+    Merge fields, metrics and enhancements into an agent.
+
+    Agents are matched by name ignoring case and spaces. Returns False if there
+    is no such agent.
+    """
+    for agent in state.get("agents", []):
+        if _agent_key(agent["name"]) == _agent_key(name):
+            agent.update(fields or {})
+            if metrics:
+                agent.setdefault("metrics", {}).update(metrics)
+            if enhancements:
+                agent.setdefault("enhancements", {}).update(enhancements)
+            return True
+    return False
+
+
+def rank_agents(state):
+    """Order agents as a leaderboard: the head agent first, then by points. The leader becomes MVP."""
+    agents = state.get("agents", [])
+    head = [a for a in agents if a["name"] == HEAD_AGENT] or [{"name": HEAD_AGENT, "role": "Coordinator", "status": "active", "metrics": {}}]
+    others = sorted((a for a in agents if a["name"] != HEAD_AGENT), key=lambda a: a.get("metrics", {}).get("points", 0), reverse=True)
+    state["agents"] = head[:1] + others
+    if others:
+        state.setdefault("head", {})["daily_mvp"] = others[0]["name"]
+
+
+def upsert_task(state, task, defaults=None, updates=None):
+    """Merge task and updates into a task by id, or add task at the top with defaults filled in."""
+    _upsert(state.setdefault("tasks", []), "id", task, TASK_LIMIT, defaults, updates)
+
+
+def upsert_execution(state, execution, defaults=None, updates=None):
+    """Merge execution and updates into an execution by id, or add execution at the top with defaults filled in."""
+    _upsert(state.setdefault("executions", []), "id", execution, EXECUTION_LIMIT, defaults, updates)
+
+
+def pulse_executions(state, log):
+    """Set the log line of every running execution."""
+    for execution in state.get("executions", []):
+        if execution.get("status") == "Running":
+            execution["log"] = log
+
+
+def upsert_learning_mission(state, mission, defaults=None):
+    """Merge into a learning mission by topic, or add it at the top with defaults filled in."""
+    _upsert(state.setdefault("learning_missions", []), "topic", mission, LEARNING_MISSION_LIMIT, defaults)
+
+
+def remove_review(state, review_id):
+    """Remove a pending review. Returns the removed review, or None."""
+    reviews = state.get("reviews", [])
+    for review in reviews:
+        if review["id"] == review_id:
+            state["reviews"] = [r for r in reviews if r["id"] != review_id]
+            return review
+    return None
+
+
+def resolve_review(state, review_id, action):
+    """Remove a pending review and log the user's decision on it. Returns the removed review, or None."""
+    review = remove_review(state, review_id)
+    if review:
+        add_history(state, f"User {action.upper()}ED: {review['title']}")
+    return review
+
+
+def set_section(state, section, value):
+    """Replace a whole list section (tasks, executions, projects, reviews)."""
+    if section not in REPLACEABLE_SECTIONS:
+        raise ValueError(f"Section {section} cannot be replaced")
+    state[section] = value
+
+
+def reset(state):
+    """Replace the whole state with the defaults."""
+    state.clear()
+    state.update(default_status())
+
+
+MUTATIONS = {
+    fn.__name__: fn for fn in (
+        add_history, set_head, update_agent, rank_agents, upsert_task, upsert_execution,
+        pulse_executions, upsert_learning_mission, remove_review, resolve_review, set_section, reset
+    )
+}
+
+# Top-level sections each mutation can change, for /state/changes
+MUTATION_SECTIONS = {
+    "add_history": ("workflow",),
+    "set_head": ("head",),
+    "update_agent": ("agents",),
+    "rank_agents": ("agents", "head"),
+    "upsert_task": ("tasks",),
+    "upsert_execution": ("executions",),
+    "pulse_executions": ("executions",),
+    "upsert_learning_mission": ("learning_missions",),
+    "remove_review": ("reviews",),
+    "resolve_review": ("reviews", "workflow"),
+}
+
+
+def _touched_sections(state, fn, args):
+    if fn is set_section:
+        return (args["section"],)
+    if fn is reset:
+        return tuple(state)
+    return MUTATION_SECTIONS[fn.__name__]
+
+
+def _bind_mutations(ops):
+    """Check that every op of a batch names a mutation with valid arguments and return the calls to make."""
+    calls = []
+    for op in ops:
+        args = dict(op)
+        name = args.pop("op", None)
+        fn = MUTATIONS.get(name)
+        if fn is None:
+            raise ValueError(f"Unknown mutation: {name}")
+        try:
+            inspect.signature(fn).bind(None, **args)
+        except TypeError as e:
+            raise ValueError(f"Bad arguments for {name}: {e}")
+        calls.append((fn, args))
+    return calls
+
+
+def _apply_batch(state, ops):
+    """
+    Run a batch of mutations on a copy of state.
+
+    Raises ValueError if any op fails, leaving state untouched.
+
+    Returns:
+        (new_state, results, sections) with sections the top-level sections the batch changed
+    """
+    calls = _bind_mutations(ops)
+    new_state = copy.deepcopy(state)
+    results = []
+    sections = set()
+    for fn, args in calls:
+        touched = _touched_sections(new_state, fn, args)
+        try:
+            results.append(fn(new_state, **args))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            raise ValueError(f"{fn.__name__} failed: {e}")
+        sections.update(touched)
+    # reset() can add sections the old state did not have
+    sections.update(section for section in new_state if section not in state)
+    return new_state, results, sections
+
+
+def apply_mutations(state, ops):
+    """
+    Apply a list of mutations, e.g. [{"op": "add_history", "entry": "..."}], in order.
+
+    The batch is all or nothing: if any op fails, ValueError is raised and
+    state is left unchanged. Returns the value of each op.
+    """
+    new_state, results, _ = _apply_batch(state, ops)
+    state.clear()
+    state.update(new_state)
+    return results
+
+
+def recover(path=STATUS_PATH, log=None, repair=False):
+    """
+    Rebuild the state from the last snapshot plus the events logged after it.
+
+    Mutations are deterministic and only batches that succeeded are logged,
+    so replaying reproduces exactly the state the live store had.
+
+    Returns:
+        (state, seq) with seq the last event applied
+    """
+    state = load_status(path)
+    seq = state.pop(SEQ_KEY, 0)
+    log = log or EventLog(event_log_path(path))
+    replayed = 0
+    for record_seq, ops in log.records(repair=repair):
+        if record_seq <= seq:
+            continue
+        try:
+            apply_mutations(state, ops)
+        except ValueError as e:
+            print(f"Replaying event {record_seq} failed: {e}")
+        seq = record_seq
+        replayed += 1
+    if replayed:
+        print(f"Recovered dashboard state: replayed {replayed} events after the snapshot.")
+    return state, seq
+
+
+def read_status(path=STATUS_PATH):
+    """Current state as a reader outside the API server sees it: the snapshot plus unsnapshotted events."""
+    return recover(path)[0]
+
+
+class StatusStore:
+    """
+    In-memory dashboard state backed by an event log and periodic snapshots.
+
+    Every batch of mutations is appended to the log before it is applied. A
+    background thread compacts the log into a snapshot at most once per
+    snapshot interval; compact() does it on demand.
+    """
+
+    def __init__(self, path=STATUS_PATH, snapshot_interval_ms=SNAPSHOT_INTERVAL_MS):
+        self.path = path
+        self.snapshot_interval = snapshot_interval_ms / 1000.0
+        self.log = EventLog(event_log_path(path))
+        self.state, self.seq = recover(path, self.log, repair=True)
+        self._lock = threading.Lock()
+        # Held through a whole compaction, from copying the state to cutting the log
+        self._compact_lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._last_compact = 0.0
+        self._snapshot_seq = None
+        # Log offsets at the current snapshot and each backup generation
+        self._snapshot_offsets = deque()
+        self._listeners = []
+        # Seq of the last event that changed each top-level section
+        self.section_versions = {section: self.seq for section in self.state}
+        self._serialized = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._compact_loop, name="status-compact", daemon=True)
+            self._thread.start()
+        # Write a snapshot of what was replayed at startup
+        self._dirty.set()
+
+    def stop(self):
+        """Stop the compaction thread and snapshot any pending events."""
+        self._stopping = True
+        self._dirty.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.compact()
+        self.log.close()
+
+    def add_listener(self, listener):
+        """Call listener() after every applied batch of mutations."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def apply(self, ops):
+        """
+        Log and apply a batch of mutations atomically. Returns the value of each op.
+
+        The batch runs on a copy of the state and is only logged, applied and
+        published if every op succeeds; otherwise ValueError is raised and
+        nothing changes.
+        """
+        with self._lock:
+            state, results, sections = _apply_batch(self.state, ops)
+            self.log.append(self.seq + 1, ops)
+            self.seq += 1
+            self.state = state
+            for section in sections:
+                # Only sections of the schema, or ones the state already had, are reported to pollers
+                if section in STATUS_SECTIONS or section in self.section_versions:
+                    self.section_versions[section] = self.seq
+        self._dirty.set()
+        for listener in list(self._listeners):
+            listener()
+        return results
+
+    def snapshot(self):
+        """Deep copy of the current state."""
+        with self._lock:
+            return copy.deepcopy(self.state)
+
+    def versioned_snapshot(self):
+        """Deep copy of the current state with the seq of the last event it includes."""
+        with self._lock:
+            return self.seq, copy.deepcopy(self.state)
+
+    def serialized(self):
+        """
+        The current state as JSON with its seq.
+
+        Serialized once per version, so repeated reads of an unchanged state are free.
+        """
+        with self._lock:
+            if self._serialized is None or self._serialized[0] != self.seq:
+                self._serialized = (self.seq, json.dumps(self.state, separators=(",", ":")))
+            return self._serialized
+
+    def changes_since(self, since):
+        """
+        Top-level sections changed after a version.
+
+        Returns:
+            Dictionary with 'version' (current seq), 'full' (True when every
+            section is included because since is unknown, e.g. newer than the
+            current version after a reset), 'sections' (name -> value) and
+            'removed' (names of sections that no longer exist)
+        """
+        with self._lock:
+            full = since is None or since < 0 or since > self.seq
+            changed = [name for name, version in self.section_versions.items() if full or version > since]
+            return {
+                "version": self.seq,
+                "full": full,
+                "sections": {name: copy.deepcopy(self.state[name]) for name in changed if name in self.state},
+                "removed": [name for name in changed if name not in self.state]
+            }
+
+    def compact(self):
+        """
+        Write a snapshot of the current state and drop the events it includes.
+
+        Compactions run one at a time, so an older snapshot never replaces a
+        newer one and the log is cut against the offsets of the snapshot just
+        written. Returns the seq of the last event in the snapshot.
+        """
+        with self._compact_lock:
+            with self._lock:
+                self._dirty.clear()
+                seq = self.seq
+                if seq == self._snapshot_seq:
+                    return seq
+                serialized = json.dumps({**self.state, SEQ_KEY: seq})
+                offset = self.log.tell()
+            try:
+                write_status(serialized, self.path)
+            except OSError as e:
+                print(f"Status snapshot failed: {e}")
+                self._dirty.set()
+                return self._snapshot_seq
+            finally:
+                self._last_compact = time.monotonic()
+            with self._lock:
+                # Keep the events after the oldest backup generation, so recovering
+                # from any backup can still replay up to the latest state. Events
+                # appended while the snapshot was written stay in the log too.
+                self._snapshot_offsets.append(offset)
+                while len(self._snapshot_offsets) > BACKUP_GENERATIONS + 1:
+                    self._snapshot_offsets.popleft()
+                cut = self._snapshot_offsets[0] if len(self._snapshot_offsets) > BACKUP_GENERATIONS else 0
+                if cut:
+                    self.log.discard_before(cut)
+                    self._snapshot_offsets = deque(o - cut for o in self._snapshot_offsets)
+                self._snapshot_seq = seq
+            return seq
+
+    def _compact_loop(self):
+        while not self._stopping:
+            self._dirty.wait()
+            # Let events arriving within the interval share one snapshot
+            delay = self._last_compact + self.snapshot_interval - time.monotonic()
+            if delay > 0 and not self._stopping:
+                time.sleep(delay)
+            if not self._stopping:
+                self.compact()
+
+
+@contextmanager
+def _file_lock(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def apply_to_file(ops, path=STATUS_PATH):
+    """
+    Apply mutations directly to the status files, for when the API server is not running.
+
+    The batch is logged and compacted right away, since there is no server
+    to do it: the snapshot is rewritten and the log cut back to the events
+    after the oldest backup, as StatusStore.compact() does, so each call
+    only replays a few events. Writers going through this path are
+    serialized by a lock file.
+    """
+    with _file_lock(path):
+        log = EventLog(event_log_path(path))
+        try:
+            state, seq = recover(path, log, repair=True)
+            state, results, _ = _apply_batch(state, ops)
+            log.append(seq + 1, ops)
+            write_status({**state, SEQ_KEY: seq + 1}, path)
+            oldest = load_json(backup_path(path, BACKUP_GENERATIONS), backups=0)
+            if oldest is not None:
+                log.discard_through(oldest.get(SEQ_KEY, 0))
+        finally:
+            log.close()
+    return results